@@ -0,0 +1,68 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
+
+import argparse
+import json
+from dotenv import load_dotenv
+from container import ApplicationContainer
+from services.backtester import Backtester, BacktestRun
+
+load_dotenv()
+
+crypto_currency_code = 'FX_BTC_JPY'
+
+def main(args: argparse.Namespace) -> None:
+    """
+    Evaluate one run per checkpoint (or `--runs` seeded runs of the agent) on a recording and print the results.
+    :param args: The parsed command line arguments.
+    """
+    params = json.loads(args.params) if args.params else {}
+    if args.checkpoints:
+        runs = [BacktestRun(os.path.basename(path), args.agent, {**params, 'model_path': path}, seed=args.seed) for path in args.checkpoints]
+    else:
+        runs = [BacktestRun(f"{args.agent}#{seed}", args.agent, params, seed=seed) for seed in range(args.seed, args.seed + args.runs)]
+
+    backtester = Backtester(
+        directory=args.directory,
+        channel=f"lightning_board_snapshot_{crypto_currency_code}",
+        diff_channel=f"lightning_board_{crypto_currency_code}",
+        depth=args.depth,
+        window=args.window,
+        order_size=args.order_size,
+        max_position=args.max_position,
+        fee_rate=args.fee_rate,
+        latency=args.latency,
+        processes=args.processes,
+        normalizer={'state_path': args.normalizer_state, 'frozen': True} if args.normalizer_state else None
+    )
+    results = backtester.run(runs)
+
+    print(f"{'run':<40} {'pnl':>12} {'max dd':>12} {'turnover':>14} {'fills':>7} {'buys':>6} {'sells':>6} {'position':>10}")
+    for result in sorted(results, key=lambda result: result['pnl'], reverse=True):
+        print(f"{result['name']:<40} {result['pnl']:>12.2f} {result['max_drawdown']:>12.2f} {result['turnover']:>14.2f} "
+              f"{result['fills']:>7} {result['buys']:>6} {result['sells']:>6} {result['final_position']:>10.4f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest agents on recorded market data.')
+    parser.add_argument('--directory', default='recordings', help='The recording directory.')
+    parser.add_argument('--agent', default='agents.sample:Random', help="The agent class as 'module:Class'.")
+    parser.add_argument('--params', help='JSON keyword arguments for the agent.')
+    parser.add_argument('--checkpoints', nargs='*', help='Model checkpoints to compare, passed to the agent as `model_path`.')
+    parser.add_argument('--runs', type=int, default=1, help='The number of seeded runs when no checkpoints are given.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes; 0 runs sequentially.')
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--window', type=int, default=100)
+    parser.add_argument('--order-size', type=float, default=0.001)
+    parser.add_argument('--max-position', type=float, default=0.01)
+    parser.add_argument('--fee-rate', type=float, default=0.0)
+    parser.add_argument('--latency', type=int, default=1, help='Snapshots between a decision and its fill.')
+    parser.add_argument('--normalizer-state', help='A saved normalizer state to normalize the features with, frozen.')
+
+    container = ApplicationContainer()
+    container.config.from_dict({'crypto_currency_code': crypto_currency_code})
+    container.wire()
+
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark of the per-message overhead of the WebSocket receive path.
+Measures JSON decoding with every available decoder, and channel routing with the
+legacy scan-and-gather dispatch versus the precomputed routing table.
+
+Usage: python benchmarks/dispatch_benchmark.py [--messages N]
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from services import json_codec
+from services.handler_dispatcher import HandlerDispatcher
+
+class NoopHandler:
+    queue_policy = 'fifo'
+
+    def __init__(self, channel_names):
+        self.channel_names = channel_names
+
+    async def handle_message(self, data, channel):
+        pass
+
+    def reset(self):
+        pass
+
+async def legacy_dispatch(handlers, data, channel):
+    tasks = []
+    for handler in handlers:
+        if hasattr(handler, 'handle_message'):
+            if channel in handler.channel_names:
+                tasks.append(handler.handle_message(data, channel))
+    if tasks:
+        await asyncio.gather(*tasks)
+
+def make_frame(channel: str, levels: int) -> str:
+    mid = 10_000_000.0
+    return json.dumps({
+        'jsonrpc': '2.0',
+        'method': 'channelMessage',
+        'params': {
+            'channel': channel,
+            'message': {
+                'mid_price': mid,
+                'bids': [{'price': mid - i, 'size': round(random.random(), 8)} for i in range(1, levels + 1)],
+                'asks': [{'price': mid + i, 'size': round(random.random(), 8)} for i in range(1, levels + 1)],
+            },
+        },
+    })
+
+def bench(label: str, count: int, fn) -> None:
+    start = time.perf_counter_ns()
+    fn()
+    elapsed = time.perf_counter_ns() - start
+    print(f"{label:<48} {elapsed / count / 1000:>10.2f} us/msg")
+
+def main(messages: int) -> None:
+    random.seed(0)
+    frames = {
+        'snapshot (500 levels/side)': make_frame('lightning_board_snapshot_FX_BTC_JPY', 500),
+        'diff (5 levels/side)': make_frame('lightning_board_FX_BTC_JPY', 5),
+    }
+
+    print('== decode ==')
+    for label, frame in frames.items():
+        count = messages if 'diff' in label else max(messages // 20, 1)
+        for name in json_codec.DECODERS:
+            try:
+                loads = json_codec.get_loads(name)
+            except ImportError:
+                print(f"{label + ' / ' + name:<48} {'not installed':>13}")
+                continue
+            bench(f"{label} / {name}", count, lambda: [loads(frame) for _ in range(count)])
+
+    print('== dispatch ==')
+    handlers = [
+        NoopHandler(['lightning_board_snapshot_FX_BTC_JPY']),
+        NoopHandler(['lightning_board_FX_BTC_JPY']),
+        NoopHandler(['lightning_executions_FX_BTC_JPY']),
+        NoopHandler(['child_order_events']),
+    ]
+    dispatcher = HandlerDispatcher(handlers=handlers)
+    channel = 'lightning_board_FX_BTC_JPY'
+
+    async def run_legacy():
+        for _ in range(messages):
+            await legacy_dispatch(handlers, None, channel)
+
+    async def run_routed():
+        for _ in range(messages):
+            await dispatcher.dispatch(None, channel)
+
+    bench('legacy scan + gather', messages, lambda: asyncio.run(run_legacy()))
+    bench('routing table, direct call', messages, lambda: asyncio.run(run_routed()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100_000)
+    main(parser.parse_args().messages)
@@ -0,0 +1,94 @@
+"""
+Per-snapshot cost of the incremental feature engine against recomputing the same features over the
+whole window on every tick, as `extract_features` had to. Also checks that both agree.
+
+Usage: python benchmarks/feature_engine_benchmark.py [--snapshots N] [--window N] [--depth N]
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import argparse
+import time
+import numpy as np
+from services.data_buffer import BoardDataBuffer
+from services.feature_engine import FeatureEngine
+
+def recompute(window: dict, depth: int, span_spread: int, span_imbalance: int) -> np.ndarray:
+    """
+    The default features computed from scratch over the window.
+    """
+    mid = window['mid_price']
+    spread = window['best_ask'] - window['best_bid']
+    bid_depth = window['bid_sizes'][:, :depth].sum(axis=1)
+    ask_depth = window['ask_sizes'][:, :depth].sum(axis=1)
+    imbalance = (bid_depth - ask_depth) / (bid_depth + ask_depth)
+    bid_size, ask_size = window['bid_sizes'][:, 0], window['ask_sizes'][:, 0]
+    microprice = (window['best_bid'] * ask_size + window['best_ask'] * bid_size) / (bid_size + ask_size)
+    returns = np.diff(np.log(mid))
+    total_depth = bid_depth + ask_depth
+
+    def ewma(values: np.ndarray, span: int) -> float:
+        alpha = 2.0 / (span + 1.0)
+        value = values[0]
+        for item in values[1:]:
+            value += alpha * (item - value)
+        return value
+
+    return np.array([
+        spread[-1], ewma(spread, span_spread), imbalance[-1], ewma(imbalance, span_imbalance),
+        microprice[-1] - mid[-1], returns[-1], returns.std(ddof=1),
+        (mid * total_depth).sum() / total_depth.sum(), mid.max(), mid.min(),
+    ])
+
+def main(snapshots: int, window: int, depth: int) -> None:
+    rng = np.random.default_rng(0)
+    mid = 10_000_000.0 + np.cumsum(rng.normal(0.0, 50.0, snapshots))
+    boards = [{
+        'mid_price': price,
+        'bids': [{'price': price - 5 * (i + 1), 'size': float(size)} for i, size in enumerate(rng.uniform(0.01, 1.0, depth))],
+        'asks': [{'price': price + 5 * (i + 1), 'size': float(size)} for i, size in enumerate(rng.uniform(0.01, 1.0, depth))],
+    } for price in mid]
+
+    features = [
+        {'name': 'spread', 'input': 'spread'},
+        {'name': 'spread_ewma', 'input': 'spread', 'operator': 'ewma', 'span': 20},
+        {'name': 'imbalance', 'input': 'imbalance'},
+        {'name': 'imbalance_ewma', 'input': 'imbalance', 'operator': 'ewma', 'span': 10},
+        {'name': 'microprice_offset', 'input': 'microprice_offset'},
+        {'name': 'log_return', 'input': 'log_return'},
+        {'name': 'volatility', 'input': 'log_return', 'operator': 'std', 'window': window - 1},
+        {'name': 'rolling_vwap', 'input': 'mid_price', 'operator': 'vwap', 'weight': 'depth', 'window': window},
+        {'name': 'rolling_high', 'input': 'mid_price', 'operator': 'max', 'window': window},
+        {'name': 'rolling_low', 'input': 'mid_price', 'operator': 'min', 'window': window},
+    ]
+    engine = FeatureEngine(features, depth=depth)
+
+    incremental_ns = 0
+    recompute_ns = 0
+    buffer = BoardDataBuffer(max_size=window, depth=depth)
+    for board in boards:
+        buffer.append(board)
+        started_at = time.perf_counter_ns()
+        vector = engine.update(buffer.get_latest())
+        incremental_ns += time.perf_counter_ns() - started_at
+        if len(buffer) == window:
+            started_at = time.perf_counter_ns()
+            expected = recompute(buffer.get_data(), depth, 20, 10)
+            recompute_ns += time.perf_counter_ns() - started_at
+
+    # The EWMAs of the engine run over the whole history rather than the window, so only the windowed features are compared.
+    windowed = [0, 2, 4, 5, 6, 7, 8, 9]
+    error = np.max(np.abs(vector[windowed] - expected[windowed]) / np.maximum(np.abs(expected[windowed]), 1e-12))
+    print(f"{'incremental update':<30} {incremental_ns / snapshots / 1000:>10.2f} us/snapshot")
+    print(f"{'recompute over the window':<30} {recompute_ns / (snapshots - window + 1) / 1000:>10.2f} us/snapshot")
+    print(f"{'max relative difference':<30} {error:>10.2e}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--snapshots', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=10)
+    args = parser.parse_args()
+    main(args.snapshots, args.window, args.depth)
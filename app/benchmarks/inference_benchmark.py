@@ -0,0 +1,61 @@
+"""
+`get_action` latency of the Q-network agent on CPU for each backend of the inference runtime: the eager
+module, the TorchScript export and the int8 dynamically quantized export. Reports the first call of a
+cold runtime, the warm-up time, p50/p99/max over warm calls, and the largest Q-value difference to the
+eager module. Needs torch.
+
+Usage: python benchmarks/inference_benchmark.py [--features N] [--hidden N [N ...]] [--calls N] [--threads N]
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+import torch
+from services.inference_runtime import InferenceRuntime, build_q_network
+from agents.q_network import QNetwork
+
+def main(features: int, hidden: list, calls: int, threads: int) -> None:
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    inputs = rng.standard_normal((calls, features)).astype(np.float32)
+    path = os.path.join(tempfile.mkdtemp(), 'q_network.pth')
+    torch.save(build_q_network([features, *hidden, 3]).state_dict(), path)
+
+    reference = InferenceRuntime(path, backend='eager', threads=threads)
+    expected = np.array([reference(row).copy() for row in inputs[:100]])
+
+    print(f"{'backend':<12} {'first call':>12} {'warm-up':>12} {'p50':>10} {'p99':>10} {'max':>10} {'max |dq|':>10}")
+    for backend in InferenceRuntime.backends:
+        cold = QNetwork(path, backend=backend, threads=threads)
+        started_at = time.perf_counter_ns()
+        cold.get_action(inputs[0])
+        first_call_ns = time.perf_counter_ns() - started_at
+
+        agent = QNetwork(path, backend=backend, threads=threads)
+        started_at = time.perf_counter_ns()
+        agent.warmup()
+        warmup_ns = time.perf_counter_ns() - started_at
+
+        latencies = np.empty(calls)
+        for index, row in enumerate(inputs):
+            started_at = time.perf_counter_ns()
+            agent.get_action(row)
+            latencies[index] = time.perf_counter_ns() - started_at
+        error = np.max(np.abs(np.array([agent.runtime(row).copy() for row in inputs[:100]]) - expected))
+        p50, p99 = np.percentile(latencies, [50, 99]) / 1000
+        print(f"{backend:<12} {first_call_ns / 1e6:>9.2f} ms {warmup_ns / 1e6:>9.2f} ms "
+              f"{p50:>7.1f} us {p99:>7.1f} us {latencies.max() / 1000:>7.1f} us {error:>10.2e}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--hidden', type=int, nargs='+', default=[128, 128])
+    parser.add_argument('--calls', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+    main(args.features, args.hidden, args.calls, args.threads)
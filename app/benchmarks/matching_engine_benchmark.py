@@ -0,0 +1,70 @@
+"""
+Throughput benchmark of the simulated exchange's matching engine.
+Measures top-of-book updates that do not trade (the common case while orders rest), updates
+that fill resting orders, and full board snapshots.
+
+Usage: python benchmarks/matching_engine_benchmark.py [--updates N] [--orders N]
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import argparse
+import random
+import time
+from services.matching_engine import MatchingEngine, SimulatedOrder
+
+def bench(label: str, count: int, fn) -> None:
+    start = time.perf_counter_ns()
+    fn()
+    elapsed = time.perf_counter_ns() - start
+    print(f"{label:<40} {count / elapsed * 1e9:>14,.0f} updates/s")
+
+def rest_orders(engine: MatchingEngine, count: int, mid: float, sequence: int = 0) -> int:
+    for _ in range(count):
+        sequence += 1
+        side = 'BUY' if sequence % 2 else 'SELL'
+        offset = random.randint(50, 500)
+        engine.submit(SimulatedOrder(f"JRF{sequence}", f"JOR{sequence}", side, 'LIMIT',
+                                     mid - offset if side == 'BUY' else mid + offset, 0.01, sequence))
+    return sequence
+
+def main(updates: int, orders: int) -> None:
+    random.seed(0)
+    mid = 10_000_000.0
+    walk = [mid + random.randint(-20, 20) for _ in range(updates)]
+
+    engine = MatchingEngine(fee_rate=0.0)
+    rest_orders(engine, orders, mid)
+    bench('top of book, no trades', updates,
+          lambda: [engine.update_top(price - 1, 0.5, price + 1, 0.5) for price in walk])
+
+    engine = MatchingEngine(fee_rate=0.0)
+    sequence = rest_orders(engine, orders, mid)
+    swings = [mid + random.randint(-600, 600) for _ in range(updates)]
+
+    def trading():
+        nonlocal sequence
+        for index, price in enumerate(swings):
+            if engine.update_top(price - 1, 0.05, price + 1, 0.05) and index % 10 == 0:
+                sequence = rest_orders(engine, 2, price, sequence)
+
+    bench('top of book, with fills', updates, trading)
+
+    boards = [{
+        'mid_price': price,
+        'bids': [{'price': price - i, 'size': 0.1} for i in range(1, 51)],
+        'asks': [{'price': price + i, 'size': 0.1} for i in range(1, 51)],
+    } for price in walk[:max(updates // 10, 1)]]
+    engine = MatchingEngine(fee_rate=0.0)
+    rest_orders(engine, orders, mid)
+    bench('board snapshot (50 levels/side)', len(boards),
+          lambda: [engine.update_board(board) for board in boards])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=500_000)
+    parser.add_argument('--orders', type=int, default=100)
+    args = parser.parse_args()
+    main(args.updates, args.orders)
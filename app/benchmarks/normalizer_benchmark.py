@@ -0,0 +1,54 @@
+"""
+Per-update and per-observe cost of each normalization method, the throughput of `transform_many` on a matrix, and a
+check that the offline results are bit-identical to the live, per-update ones.
+
+Usage: python benchmarks/normalizer_benchmark.py [--rows N] [--features N]
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import argparse
+import time
+import numpy as np
+from services.normalizer import Normalizer
+
+def main(rows: int, features: int) -> None:
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_t(4, (rows, features)) * rng.uniform(1e-4, 1e4, features) + rng.uniform(-1e6, 1e6, features)
+    matrix[rng.random((rows, features)) < 0.01] = np.nan
+
+    print(f"{'method':<10} {'update':>14} {'observe':>14} {'transform_many':>18} {'frozen':>16} {'identical':>10}")
+    for method in Normalizer.methods:
+        live = Normalizer(method)
+        started_at = time.perf_counter_ns()
+        expected = np.array([live.update(row).copy() for row in matrix])
+        update_ns = (time.perf_counter_ns() - started_at) / rows
+
+        # The live path: the statistics are advanced per row and the vector is only normalized when read.
+        observed = Normalizer(method)
+        started_at = time.perf_counter_ns()
+        for row in matrix:
+            observed.observe(row)
+        observe_ns = (time.perf_counter_ns() - started_at) / rows
+
+        offline = Normalizer(method)
+        started_at = time.perf_counter_ns()
+        result = offline.transform_many(matrix)
+        many_ns = (time.perf_counter_ns() - started_at) / rows
+
+        offline.freeze()
+        started_at = time.perf_counter_ns()
+        frozen = offline.transform_many(matrix)
+        frozen_ns = (time.perf_counter_ns() - started_at) / rows
+        identical = (np.array_equal(expected, result) and np.array_equal(observed.transform(matrix[-1]), expected[-1])
+                     and np.array_equal(frozen, np.array([offline.update(row).copy() for row in matrix])))
+        print(f"{method:<10} {update_ns / 1000:>11.2f} us {observe_ns / 1000:>11.2f} us {many_ns / 1000:>15.2f} us {frozen_ns:>13.1f} ns {str(identical):>10}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=10)
+    args = parser.parse_args()
+    main(args.rows, args.features)
@@ -1,14 +1,14 @@
 from dependency_injector import containers, providers
 import exceptions
 import services
-from services import batch, data_buffer, handler_dispatcher, health_check, logger, notification, s3client, portfolio, order_book, position_book
-from services.exchange_clients import bitflyer_lightning_client
-from services.streams import bitflyer_lightning_wsclient
+from services import clock, batch, data_buffer, handler_dispatcher, health_check, logger, notification, s3client, portfolio, order_book, position_book, local_board, inference_executor, recorder, tracer, metrics, request_scheduler, order_manager, feature_engine, normalizer, artifact_store, state_checkpoint, startup_report
+from services.exchange_clients import bitflyer_lightning_client, simulated_exchange_client
+from services.streams import bitflyer_lightning_wsclient, replay_stream
 from services.exchanges import bitflyer
 import message_handlers
-from message_handlers import board_event_handler, child_order_event_handler
+from message_handlers import board_event_handler, board_diff_event_handler, child_order_event_handler, simulated_exchange_handler
 import agents
-from agents import sample
+from agents import sample, q_network
 
 class ApplicationContainer(containers.DeclarativeContainer):
     """Dependency Injection Container for the application."""
@@ -20,17 +20,50 @@ class ApplicationContainer(containers.DeclarativeContainer):
 
     # Services
     logger = providers.Singleton(logger.Logger)
-    stream = providers.Singleton(
-        bitflyer_lightning_wsclient.BitflyerLightningWsclient,
-        url=config.bitflyer_websocket_url,
-        api_key=config.bitflyer_api_key,
-        api_secret=config.bitflyer_api_secret,
-        public_channels=config.public_channels,
-        private_channels=config.private_channels
+    metrics = providers.Singleton(
+        metrics.MetricsRegistry,
+        enabled=config.metrics_enabled,
+        host=config.metrics_host,
+        port=config.metrics_port,
+        lag_interval=config.metrics_lag_interval
+    )
+    # Replays run on the recorded time, so that they are deterministic whatever their pace.
+    clock = providers.Selector(
+        config.stream_mode,
+        live=providers.Singleton(clock.Clock),
+        replay=providers.Singleton(clock.ReplayClock)
+    )
+    tracer = providers.Singleton(
+        tracer.Tracer,
+        enabled=config.tracing_enabled,
+        sample_interval=config.tracing_sample_interval,
+        clock=clock
+    )
+    startup_report = providers.Singleton(startup_report.StartupReport)
+    stream = providers.Selector(
+        config.stream_mode,
+        live=providers.Singleton(
+            bitflyer_lightning_wsclient.BitflyerLightningWsclient,
+            url=config.bitflyer_websocket_url,
+            api_key=config.bitflyer_api_key,
+            api_secret=config.bitflyer_api_secret,
+            public_channels=config.public_channels,
+            private_channels=config.private_channels,
+            json_decoder=config.json_decoder
+        ),
+        replay=providers.Singleton(
+            replay_stream.ReplayStream,
+            directory=config.recording_directory,
+            mode=config.replay_mode,
+            speed=config.replay_speed,
+            seed=config.replay_seed,
+            json_decoder=config.json_decoder
+        )
     )
     batch = providers.Singleton(
         batch.Batch,
-        interval=config.batch_interval
+        interval=config.batch_interval,
+        reconcile_interval=config.portfolio_reconcile_interval
     )
     health_check = providers.Singleton(
         health_check.HealthCheck,
@@ -46,31 +79,138 @@ class ApplicationContainer(containers.DeclarativeContainer):
         s3client.S3Client,
         bucket=config.s3_bucket
     )
-    exchange_client = providers.Factory(
-        bitflyer_lightning_client.BitflyerLightningClient,
-        base_url=config.bitflyer_api_base_url,
-        api_key=config.bitflyer_api_key,
-        api_secret=config.bitflyer_api_secret
+    artifact_store = providers.Singleton(
+        artifact_store.ArtifactStore,
+        directory=config.artifact_directory,
+        refresh_interval=config.artifact_refresh_interval,
+        max_size=config.artifact_cache_size
+    )
+    simulated_exchange_client = providers.Singleton(
+        simulated_exchange_client.SimulatedExchangeClient,
+        initial_collateral=config.simulation_initial_collateral,
+        fee_rate=config.simulation_fee_rate,
+        rest_latency=config.simulation_rest_latency,
+        event_latency=config.simulation_event_latency,
+        latency_jitter=config.simulation_latency_jitter,
+        seed=config.replay_seed
+    )
+    raw_exchange_client = providers.Selector(
+        config.exchange_mode,
+        live=providers.Singleton(
+            bitflyer_lightning_client.BitflyerLightningClient,
+            base_url=config.bitflyer_api_base_url,
+            api_key=config.bitflyer_api_key,
+            api_secret=config.bitflyer_api_secret,
+            timeout=config.rest_timeout,
+            connect_timeout=config.rest_connect_timeout,
+            max_connections=config.rest_max_connections,
+            keepalive_expiry=config.rest_keepalive_expiry,
+            http2=config.rest_http2
+        ),
+        simulated=simulated_exchange_client
+    )
+    exchange_client = providers.Singleton(
+        request_scheduler.ScheduledExchangeClient,
+        client=raw_exchange_client
+    )
+    request_scheduler = providers.Singleton(
+        request_scheduler.RequestScheduler,
+        limits=config.request_limits,
+        reserves=config.request_reserves
     )
     exchange = providers.Singleton(bitflyer.Bitflyer)
     portfolio = providers.Singleton(portfolio.Portfolio)
-    order_book = providers.Singleton(order_book.OrderBook)
+    order_book = providers.Singleton(
+        order_book.OrderBook,
+        archive_size=config.order_book_archive_size,
+        archive_age=config.order_book_archive_age,
+        pending_timeout=config.order_ack_timeout
+    )
     position_book = providers.Singleton(position_book.PositionBook)
-    data_buffer = providers.Singleton(
-        data_buffer.DataBuffer,
-        max_size=config.data_buffer_size
+    order_manager = providers.Singleton(
+        order_manager.OrderManager,
+        order_size=config.order_size,
+        order_type=config.order_type,
+        ack_timeout=config.order_ack_timeout
+    )
+    data_buffer = providers.Selector(
+        config.data_buffer_mode,
+        list=providers.Singleton(
+            data_buffer.DataBuffer,
+            max_size=config.data_buffer_size
+        ),
+        array=providers.Singleton(
+            data_buffer.BoardDataBuffer,
+            max_size=config.data_buffer_size,
+            depth=config.data_buffer_depth
+        )
+    )
+    recorder = providers.Singleton(
+        recorder.Recorder,
+        directory=config.recording_directory,
+        enabled=config.recording_enabled,
+        codec=config.recording_codec,
+        segment_size=config.recording_segment_size,
+        segment_duration=config.recording_segment_duration,
+        s3_prefix=config.recording_s3_prefix
+    )
+    feature_engine = providers.Singleton(
+        feature_engine.FeatureEngine,
+        features=config.features,
+        depth=config.feature_depth
+    )
+    normalizer = providers.Singleton(
+        normalizer.Normalizer,
+        method=config.normalizer_method,
+        alpha=config.normalizer_alpha,
+        clip=config.normalizer_clip,
+        frozen=config.normalizer_frozen,
+        state_path=config.normalizer_state_path
+    )
+    local_board = providers.Singleton(
+        local_board.LocalBoard,
+        resync_interval=config.local_board_resync_interval
     )
 
     # Message Handlers
     handler_dispatcher = providers.Singleton(
         handler_dispatcher.HandlerDispatcher,
+        queue_size=config.channel_queue_size,
+        # A replay dispatches every message as it is submitted, so that it does not depend on scheduling.
+        inline=providers.Selector(config.stream_mode, live=providers.Object(False), replay=providers.Object(True)),
+        logger=logger,
+        metrics=metrics,
         handlers=providers.List(
             providers.Factory(board_event_handler.BoardEventHandler),
-            providers.Factory(child_order_event_handler.ChildOrderEventHandler)
+            providers.Factory(board_diff_event_handler.BoardDiffEventHandler),
+            providers.Factory(child_order_event_handler.ChildOrderEventHandler),
+            providers.Factory(simulated_exchange_handler.SimulatedExchangeHandler)
         )
     )
 
     # Agent to select action
-    agent = providers.Singleton(
-        sample.Random,
+    agent = providers.Selector(
+        config.agent,
+        random=providers.Singleton(sample.Random),
+        q_network=providers.Singleton(
+            q_network.QNetwork,
+            model_path=config.agent_model_path,
+            backend=config.agent_backend,
+            warmup_iterations=config.agent_warmup_iterations
+        )
+    )
+    inference_executor = providers.Singleton(
+        inference_executor.InferenceExecutor,
+        # A worker would let inference finish at a wall-clock dependent point of a replay.
+        mode=providers.Selector(config.stream_mode, live=config.inference_mode, replay=providers.Object('inline')),
+        torch_threads=config.inference_torch_threads,
+        stale_policy=config.inference_stale_policy,
+        max_stale_runs=config.inference_max_stale_runs
+    )
+    state_checkpoint = providers.Singleton(
+        state_checkpoint.StateCheckpoint,
+        path=config.checkpoint_path,
+        interval=config.checkpoint_interval,
+        max_age=config.checkpoint_max_age,
+        max_gap=config.checkpoint_max_gap
     )
\ No newline at end of file
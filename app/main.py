@@ -17,28 +17,168 @@ async def main(container: ApplicationContainer) -> None:
     Main entry point for the application.
     This function initializes the application container, synchronizes the portfolio,
     and starts the stream and batch services.
+    The portfolio, order book and position book are synchronized concurrently. In `fast_start` mode,
+    the state checkpoint is restored and the stream starts while they are, and decisions are held
+    until they are reconciled. With `flatten_on_shutdown`, every order is canceled and the position
+    closed before the checkpoint is written on shutdown.
     :param container: The application container that holds all services and configurations.
     """
-    await container.portfolio().sync()
-    await container.order_book().sync(order_state='ACTIVE')
-    await container.position_book().sync()
-    await asyncio.gather(
-        container.stream().run(),
-        container.batch().run(),
-        container.health_check().run()
-    )
+    startup_report = container.startup_report()
+    container.recorder().start()
+    data_buffer = container.data_buffer()
+    container.metrics().gauge('data_buffer_fill_ratio', 'The fill level of the data buffer.').set_function(lambda: len(data_buffer) / data_buffer.max_size)
+    model_key = container.config.agent_model_key()
+    if model_key:
+        # The cached checkpoint is reused when its ETag is unchanged, and newer versions are swapped in while running.
+        container.config.agent_model_path.from_value(await container.artifact_store().fetch(model_key))
+        container.artifact_store().watch(model_key, container.inference_executor().swap_model)
+    # Created up front so that the agent is warmed up while the books are synchronized.
+    inference_executor = container.inference_executor()
+    startup_report.mark('services')
+    fast_start = container.config.fast_start()
+    try:
+        if fast_start:
+            await container.state_checkpoint().restore()
+            startup_report.mark('checkpoint_restore')
+            inference_executor.hold()
+
+        async def reconcile() -> None:
+            portfolio = container.portfolio()
+            await asyncio.gather(
+                portfolio.sync(),
+                container.order_book().sync(order_state='ACTIVE'),
+                container.position_book().sync()
+            )
+            # Decisions stay held until the portfolio has a base, which a sync deferred by executions does not set.
+            while portfolio.synced_at is None:
+                container.logger().system.info("The portfolio is not synchronized yet; decisions stay held.")
+                await portfolio.sync()
+            startup_report.mark('reconciliation')
+            inference_executor.release()
+
+        if not fast_start:
+            await reconcile()
+        await asyncio.gather(
+            *([reconcile()] if fast_start else []),
+            container.stream().run(),
+            container.handler_dispatcher().run(),
+            container.batch().run(),
+            container.health_check().run(),
+            container.metrics().run(),
+            container.artifact_store().run(),
+            container.state_checkpoint().run()
+        )
+    finally:
+        if container.config.flatten_on_shutdown():
+            try:
+                await container.order_manager().flatten()
+            except Exception as e:
+                container.logger().system.error("Flattening on shutdown failed: %s", e)
+        try:
+            await container.state_checkpoint().save()
+        except Exception as e:
+            container.logger().system.error("Writing the checkpoint on shutdown failed: %s", e)
+        await container.exchange_client().close()
+        container.recorder().stop()
+        if container.config.tracing_export_path():
+            container.tracer().export(container.config.tracing_export_path())
+        container.logger().close()
 
 if __name__ == '__main__':
     container = ApplicationContainer()
 
     container.config.from_dict({
         'batch_interval': 10,
+        'portfolio_reconcile_interval': 60,
         'health_check_interval': 10,
         'legal_currency_code': legal_currency_code,
         'crypto_currency_code': crypto_currency_code,
         'data_buffer_size': 100,
-        'public_channels': [f"lightning_board_snapshot_{crypto_currency_code}"],
+        'data_buffer_mode': 'array',
+        'data_buffer_depth': 10,
+        # None computes services.feature_engine.DEFAULT_FEATURES.
+        'features': None,
+        'feature_depth': 5,
+        'normalizer_method': 'welford',
+        'normalizer_alpha': 0.01,
+        'normalizer_clip': 5.0,
+        # Set to the state a model was trained with, and freeze it, to feed the model the inputs it was trained on.
+        'normalizer_state_path': None,
+        'normalizer_frozen': False,
+        'local_board_resync_interval': 1.0,
+        'recording_enabled': False,
+        'recording_directory': 'recordings',
+        'recording_codec': 'auto',
+        'recording_segment_size': 256 << 20,
+        'recording_segment_duration': 3600,
+        'recording_s3_prefix': None,
+        'stream_mode': 'live',
+        'replay_mode': 'fast',
+        'replay_speed': 1.0,
+        'replay_seed': 0,
+        'exchange_mode': 'live',
+        'simulation_initial_collateral': 1_000_000.0,
+        'simulation_fee_rate': 0.0,
+        'simulation_rest_latency': 0.0,
+        'simulation_event_latency': 0.0,
+        'simulation_latency_jitter': 0.0,
+        # bitFlyer allows about 500 requests per 5 minutes per IP and per API key, 300 order requests per 5 minutes,
+        # and about 100 orders of 0.1 or less per minute.
+        'request_limits': {
+            'ip': [500, 300],
+            'private': [500, 300],
+            'orders': [300, 300],
+            'small_orders': [100, 60],
+        },
+        'request_reserves': {'cancel': 0.0, 'order': 0.05, 'read': 0.2, 'health': 0.4},
+        'rest_timeout': 10.0,
+        'rest_connect_timeout': 5.0,
+        'rest_max_connections': 10,
+        'rest_keepalive_expiry': 60.0,
+        'rest_http2': False,
+        'order_book_archive_size': 1000,
+        'order_book_archive_age': 3600,
+        'order_size': 0.001,
+        'order_type': 'MARKET',
+        'order_ack_timeout': 30.0,
+        # The board is kept locally from the diff channel. Subscribe to the snapshot channel as well only to feed
+        # full boards to the simulated exchange ('exchange_mode': 'simulated'); its snapshots re-seed the local board.
+        'public_channels': [f"lightning_board_{crypto_currency_code}"],
         'private_channels': ["child_order_events"],
+        'json_decoder': 'auto',
+        'channel_queue_size': 1000,
+        'inference_mode': 'thread',
+        'inference_torch_threads': 1,
+        'inference_stale_policy': 'drop',
+        # Set to act on the result of that many stale runs in a row, so that slow inference still acts; None never acts on stale results.
+        'inference_max_stale_runs': None,
+        # 'random', or 'q_network' to run the checkpoint at `agent_model_path` on CPU.
+        'agent': 'random',
+        'agent_model_path': None,
+        'agent_backend': 'torchscript',
+        'agent_warmup_iterations': 10,
+        # An S3 key to fetch the checkpoint from instead of `agent_model_path`; new versions are hot-swapped.
+        'agent_model_key': None,
+        'artifact_directory': 'artifacts',
+        'artifact_refresh_interval': 60,
+        'artifact_cache_size': 2 << 30,
+        'metrics_enabled': True,
+        'metrics_host': '127.0.0.1',
+        'metrics_port': 9100,
+        'metrics_lag_interval': 0.5,
+        'tracing_enabled': True,
+        'tracing_sample_interval': 1,
+        'tracing_export_path': 'logs/trace.json',
+        # Cancel every order and close the position when the bot stops.
+        'flatten_on_shutdown': False,
+        # Restore the checkpoint and start the stream while reconciling with the exchange.
+        'fast_start': True,
+        # The state checkpoint written while running and restored on restart; None disables it.
+        'checkpoint_path': 'checkpoints/state.pkl',
+        'checkpoint_interval': 10,
+        'checkpoint_max_age': 300,
+        # The checkpoint's window is only restored if it is younger than this fraction of the time the window spans.
+        'checkpoint_max_gap': 0.1,
     })
 
     container.config.bitflyer_websocket_url.from_env('BITFLYER_WEBSOCKET_URL')
@@ -46,10 +186,12 @@ if __name__ == '__main__':
     container.config.bitflyer_api_key.from_env('BITFLYER_API_KEY')
     container.config.bitflyer_api_secret.from_env('BITFLYER_API_SECRET')
     container.config.s3_bucket.from_env('S3_BUCKET')
+    container.config.recording_enabled.from_env('RECORDING_ENABLED', as_=lambda value: value.lower() in ('1', 'true', 'yes'), default='false')
     container.config.line_messaging_api_base_url.from_env('LINE_MESSAGING_API_BASE_URL')
     container.config.line_messaging_api_channel_token.from_env('LINE_MESSAGING_API_CHANNEL_TOKEN')
     container.config.line_messaging_api_destination_user_id.from_env('LINE_MESSAGING_API_DESTINATION_USER_ID')
 
     container.wire()
+    container.startup_report().mark('imports_and_configuration')
 
     asyncio.run(main(container))
\ No newline at end of file
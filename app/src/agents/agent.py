@@ -24,10 +24,29 @@ class Agent(ABC):
         pass
 
     @abstractmethod
-    def extract_features(self, data: list) -> list:
+    def extract_features(self, data: list|dict) -> list:
         """
         Extract features from the given data.
-        :param data: The data from which to extract features.
+        :param data: The data from which to extract features. This is a list of raw snapshots for
+                     `DataBuffer`, or a dictionary of read-only NumPy columns for `BoardDataBuffer`,
+                     in which case 'raw_features' holds the current `FeatureEngine` vector and
+                     'features' the same vector normalized by the `Normalizer`.
         :return: A list of features extracted from the data.
         """
+        pass
+
+    def warmup(self) -> None:
+        """
+        Prepare the agent for its first decision, e.g. load a model and run it once.
+        Called once by the `InferenceExecutor`, in the worker that runs inference, before the first decision.
+        """
+        pass
+
+    def swap_model(self, model_path: str) -> None:
+        """
+        Replace the agent's model with another checkpoint, e.g. a newer version, and warm it up.
+        Called by the `InferenceExecutor` in the worker that runs inference, between two decisions.
+        Agents without a model ignore the checkpoint.
+        :param model_path: The path of the checkpoint.
+        """
         pass
\ No newline at end of file
@@ -0,0 +1,63 @@
+from typing import Literal
+import numpy as np
+from dependency_injector.wiring import inject, Provide
+from services.order_manager import OrderManager
+from services.inference_runtime import InferenceRuntime
+from .agent import Agent
+from .sample import Action
+
+class QNetwork(Agent):
+    """
+    Selects the action with the highest Q-value of a trained Q-network, run on CPU by the `InferenceRuntime`.
+    The network's inputs are the causally normalized features of the array buffer ('features'), so its
+    checkpoint must be paired with the normalizer state it was trained with (`normalizer_state_path`).
+    Its outputs are the Q-values of DO_NOTHING, BUY and SELL.
+    """
+    def get_action(self, state: np.ndarray) -> Action:
+        return Action(int(self.runtime(state).argmax()))
+
+    @inject
+    def action(self, action: Action, order_manager: OrderManager = Provide['order_manager']) -> None:
+        """
+        Schedule an order for the action without waiting for it.
+        Orders on a side that still has one in flight are skipped by the order manager.
+        :param action: The action to be executed.
+        :param order_manager: The order manager sending the orders.
+        """
+        match action:
+            case Action.DO_NOTHING:
+                pass
+            case Action.BUY:
+                order_manager.submit('BUY')
+            case Action.SELL:
+                order_manager.submit('SELL')
+
+    def extract_features(self, data: list|dict) -> np.ndarray:
+        if not isinstance(data, dict):
+            raise TypeError("The Q-network agent needs the array data buffer ('data_buffer_mode': 'array').")
+        return data['features']
+
+    def warmup(self) -> None:
+        self.runtime.warmup()
+
+    def swap_model(self, model_path: str) -> None:
+        """
+        Load and warm up the checkpoint in a new runtime, then replace the current one with it.
+        """
+        runtime = InferenceRuntime(model_path, backend=self.runtime.backend, threads=self.runtime.threads, warmup_iterations=self.runtime.warmup_iterations)
+        runtime.warmup()
+        self.runtime = runtime
+
+    def __init__(self,
+                 model_path: str,
+                 backend: Literal['eager', 'torchscript', 'quantized'] = 'torchscript',
+                 threads: int = None,
+                 warmup_iterations: int = 10):
+        """
+        Initialize the agent; the network is loaded when the agent is warmed up.
+        :param model_path: The checkpoint: a TorchScript archive or a state dict of a perceptron.
+        :param backend: 'eager', 'torchscript' or 'quantized'; see `InferenceRuntime`.
+        :param threads: The intra-op thread count; None leaves it to the `InferenceExecutor`.
+        :param warmup_iterations: The number of runs on zeros before the first decision.
+        """
+        self.runtime = InferenceRuntime(model_path, backend=backend, threads=threads, warmup_iterations=warmup_iterations)
@@ -1,5 +1,7 @@
 from enum import Enum
 import random
+from dependency_injector.wiring import inject, Provide
+from services.order_manager import OrderManager
 from .agent import Agent
 
 class Action(Enum):
@@ -11,16 +13,23 @@ class Random(Agent):
     def get_action(self, state: list) -> Action:
         return random.choice(list(Action))
 
-    def action(self, action: Action) -> None:
+    @inject
+    def action(self, action: Action, order_manager: OrderManager = Provide['order_manager']) -> None:
+        """
+        Schedule an order for the action without waiting for it.
+        Orders on a side that still has one in flight are skipped by the order manager.
+        :param action: The action to be executed.
+        :param order_manager: The order manager sending the orders.
+        """
         match action:
             case Action.DO_NOTHING:
-                print("Doing nothing.")
+                pass
             case Action.BUY:
-                print("Executing buy action.")
+                order_manager.submit('BUY')
             case Action.SELL:
-                print("Executing sell action.")
+                order_manager.submit('SELL')
             case _:
                 print("Unknown action.")
 
-    def extract_features(self, data: list) -> list:
-        return []
\ No newline at end of file
+    def extract_features(self, data: list|dict) -> list:
+        return []
@@ -11,7 +11,7 @@ class BaseException(Exception):
                  logger: logger.Logger = Provide['logger']):
         super().__init__(message)
         self.message = f"{self._title} - {message}"
-        logger.system.error(self.message)
+        logger.system.error('%s', self.message)
 
     def __str__(self):
         return f"{self.__class__.__name__}: {self.message}"
@@ -0,0 +1,50 @@
+from dependency_injector.wiring import inject, Provide
+from services.local_board import LocalBoard
+from services.handler_dispatcher import HandlerDispatcher
+from services.tracer import current_trace
+from message_handlers.message_handler import MessageHandler
+
+class BoardDiffEventHandler(MessageHandler):
+    """
+    Handles board diff events for a specific cryptocurrency.
+    This handler applies messages from the lightning board diff channel to the local order book, and
+    signals the internal `local_board_{product}` channel once the book is consistent. That channel is
+    conflated, so its consumers render the book once per burst of diffs rather than once per diff.
+    A backlog of diffs never holds up the socket reader: when the queue is full, diffs are dropped and
+    the book is resynchronized.
+    """
+    channel_names = []
+    queue_policy = 'drop'
+
+    @inject
+    async def handle_message(self,
+                             data: list|dict,
+                             channel: str,
+                             local_board: LocalBoard = Provide['local_board'],
+                             handler_dispatcher: HandlerDispatcher = Provide['handler_dispatcher']) -> None:
+        """
+        Handles the incoming message by applying the diff to the local board.
+        :param data: The data received from the WebSocket message.
+        :param channel: The channel from which the message was received.
+        :param local_board: The local order book to update.
+        :param handler_dispatcher: The dispatcher the local board channel is signalled through.
+        """
+        if local_board.apply(data):
+            await handler_dispatcher.submit(None, self.local_board_channel, current_trace.get())
+
+    @inject
+    def reset(self,
+              local_board: LocalBoard = Provide['local_board']) -> None:
+        """
+        Invalidates the local board, since diffs may have been missed while disconnected or dropped.
+        :param local_board: The local order book to invalidate.
+        """
+        local_board.invalidate()
+
+    def __init__(self):
+        """
+        Initializes the BoardDiffEventHandler with the cryptocurrency code.
+        """
+        super().__init__()
+        self.local_board_channel = f'local_board_{self.crypto_currency_code}'
+        self.channel_names.append(f'lightning_board_{self.crypto_currency_code}')
\ No newline at end of file
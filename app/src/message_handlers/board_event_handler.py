@@ -1,37 +1,63 @@
 from dependency_injector.wiring import inject, Provide
-from services import data_buffer, portfolio
+from services import data_buffer, feature_engine, inference_executor, normalizer, startup_report, tracer
+from services.data_buffer import BoardDataBuffer
+from services.local_board import LocalBoard
 from message_handlers.message_handler import MessageHandler
-from agents.agent import Agent
 
 class BoardEventHandler(MessageHandler):
     """
     Handles board events for a specific cryptocurrency.
-    This handler processes messages related to the lightning board snapshot for the specified cryptocurrency.
+    This handler appends the top of the local board to the data buffer whenever the book changes, as
+    signalled on the internal `local_board_{product}` channel by the `BoardDiffEventHandler`. Board
+    snapshot messages, when subscribed or replayed from a recording, re-seed the local board first.
     """
     channel_names = []
+    queue_policy = 'conflate'
 
     @inject
     async def handle_message(self,
                              data: list|dict,
                              channel: str,
-                             agent: Agent = Provide['agent'],
-                             data_buffer: data_buffer.DataBuffer = Provide['data_buffer']) -> None:
+                             data_buffer: data_buffer.DataBuffer = Provide['data_buffer'],
+                             feature_engine: feature_engine.FeatureEngine = Provide['feature_engine'],
+                             normalizer: normalizer.Normalizer = Provide['normalizer'],
+                             inference_executor: inference_executor.InferenceExecutor = Provide['inference_executor'],
+                             tracer: tracer.Tracer = Provide['tracer'],
+                             startup_report: startup_report.StartupReport = Provide['startup_report'],
+                             local_board: LocalBoard = Provide['local_board']) -> None:
         """
-        Handles the incoming message by checking the channel and appending data to the buffer if it matches.
-        :param data: The data received from the WebSocket message.
+        Handles the incoming message by appending the top levels of the local board to the buffer.
+        :param data: A board snapshot, or None for a change of the local board.
         :param channel: The channel from which the message was received.
         :param data_buffer: The data buffer service to append data to.
-        :param portfolio: The portfolio service (not used in this handler but can be extended).
+        :param feature_engine: The feature engine advanced with each snapshot of the array buffer.
+        :param normalizer: The normalizer whose running statistics are advanced with each feature vector.
+        :param inference_executor: The executor that runs the agent on the buffer window.
+        :param tracer: The tracer stamping the message's progress.
+        :param startup_report: The startup report recording the first snapshot.
+        :param local_board: The local order book the buffered levels are read from.
         """
-        data_buffer.append(data)
+        if channel == self.snapshot_channel:
+            local_board.seed(data)
+        if not local_board.ready:
+            return
+        startup_report.milestone('first_snapshot')
+        # The array buffer keeps `depth` levels per side; the list buffer keeps the whole book.
+        data_buffer.append(local_board.to_snapshot(getattr(data_buffer, 'depth', None)))
+        tracer.stamp('buffer_append')
+        if isinstance(data_buffer, BoardDataBuffer):
+            # Only the statistics are advanced per tick; the vector is normalized when a decision reads it.
+            normalizer.observe(feature_engine.update(data_buffer.get_latest()))
+            tracer.stamp('feature_update')
 
         if (len(data_buffer) >= data_buffer.max_size):
-            action = agent.get_action(agent.extract_features(data_buffer.get_data()))
-            agent.action(action)
+            inference_executor.request(data_buffer)
 
     def __init__(self):
         """
         Initializes the BoardEventHandler with the cryptocurrency code.
         """
         super().__init__()
-        self.channel_names.append(f'lightning_board_snapshot_{self.crypto_currency_code}')
\ No newline at end of file
+        self.snapshot_channel = f'lightning_board_snapshot_{self.crypto_currency_code}'
+        self.channel_names.append(self.snapshot_channel)
+        self.channel_names.append(f'local_board_{self.crypto_currency_code}')
\ No newline at end of file
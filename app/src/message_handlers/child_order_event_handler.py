@@ -1,8 +1,10 @@
+from typing import List
 import asyncio
 from dependency_injector.wiring import inject, Provide
 import exceptions
-from services import portfolio
+from services import portfolio, tracer
 from services.order_book import Order, OrderBook
+from services.order_manager import OrderManager
 from services.position_book import Position, PositionBook
 from message_handlers.message_handler import MessageHandler
 
@@ -13,18 +15,66 @@ class ChildOrderEventHandler(MessageHandler):
     """
     channel_names = ['child_order_events']
 
-    @inject
-    async def handle_message(self,
-                             data: list|dict,
-                             channel: str,
-                             order_book: OrderBook = Provide['order_book'],
-                             position_book: PositionBook = Provide['position_book'],
-                             portfolio: portfolio.Portfolio = Provide['portfolio']) -> None:
+    async def handle_message(self, data: list|dict, channel: str) -> None:
         """
         Handles the incoming message by checking the channel and processing child order data.
+        bitFlyer delivers child order events as a list, so each event is processed in order.
+        Consecutive CANCEL events, such as those following a cancel-all, are applied to the order book together.
         :param data: The data received from the WebSocket message.
         :param channel: The channel from which the message was received.
-        :param portfolio: The portfolio service to synchronize the portfolio.
+        """
+        cancels = []
+        for event in (data if isinstance(data, list) else [data]):
+            if event.get('event_type') == 'CANCEL':
+                cancels.append(event)
+                continue
+            if cancels:
+                await self.handle_cancel_events(cancels)
+                cancels = []
+            await self.handle_event(event)
+        if cancels:
+            await self.handle_cancel_events(cancels)
+
+    @inject
+    async def handle_cancel_events(self,
+                                   events: List[dict],
+                                   order_book: OrderBook = Provide['order_book'],
+                                   order_manager: OrderManager = Provide['order_manager']) -> None:
+        """
+        Handles CANCEL events under one order book lock acquisition.
+        :param events: The cancel events.
+        :param order_book: The order book service to track the order state.
+        :param order_manager: The order manager tracking the orders in flight.
+        """
+        order_ids = [event['child_order_acceptance_id'] if 'child_order_acceptance_id' in event else None for event in events]
+        if None in order_ids:
+            raise exceptions.TransactionException('Invalid cancel event data received. Missing required field: child_order_acceptance_id.')
+
+        await order_book.cancel_many(order_ids)
+
+        for child_order_acceptance_id in order_ids:
+            order_manager.release(child_order_acceptance_id)
+            self.logger.transaction.info('Cancel event received, Order ID: %s', child_order_acceptance_id,
+                                         extra={'fields': {'event_type': 'CANCEL', 'child_order_acceptance_id': child_order_acceptance_id}})
+
+    @inject
+    async def handle_event(self,
+                           data: dict,
+                           order_book: OrderBook = Provide['order_book'],
+                           position_book: PositionBook = Provide['position_book'],
+                           portfolio: portfolio.Portfolio = Provide['portfolio'],
+                           tracer: tracer.Tracer = Provide['tracer'],
+                           order_manager: OrderManager = Provide['order_manager'],
+                           config: dict = Provide['config']) -> None:
+        """
+        Handles a single child order event.
+        :param data: The child order event.
+        :param order_book: The order book service to track the order state.
+        :param position_book: The position book service to settle executions.
+        :param portfolio: The portfolio service whose local ledger is updated by executions.
+        :param tracer: The tracer correlating the event with the message that led to the order.
+        :param order_manager: The order manager tracking the orders in flight.
+        :param config: Configuration dictionary containing currency codes.
         """
         if 'event_type' in data and data['event_type'] == 'ORDER':
             """Handles order events for child orders.
@@ -38,24 +88,25 @@ class ChildOrderEventHandler(MessageHandler):
             price = data['price'] if 'price' in data else None
             size = data['size'] if 'size' in data else None
 
-            if (not product_code or not child_order_id or not child_order_acceptance_id or not child_order_type or not expire_date or not side or not price or not size):
+            if (not product_code or not child_order_id or not child_order_acceptance_id or not child_order_type or not expire_date or not side or price is None or not size):
                 raise exceptions.TransactionException('Invalid order event data received. Missing required fields: product_code, child_order_id, child_order_acceptance_id, child_order_type, expire_date, side, price, or size.')
 
-            await asyncio.gather(
-                order_book.add(Order(
-                    product_code=product_code,
-                    side=side,
-                    child_order_type=child_order_type,
-                    price=price,
-                    size=size,
-                    child_order_acceptance_id=child_order_acceptance_id,
-                    child_order_id=child_order_id,
-                    expire_date=expire_date
-                )),
-                portfolio.sync()
-            )
+            await order_book.add(Order(
+                product_code=product_code,
+                side=side,
+                child_order_type=child_order_type,
+                price=price,
+                size=size,
+                child_order_acceptance_id=child_order_acceptance_id,
+                child_order_id=child_order_id,
+                expire_date=expire_date
+            ))
 
-            self.logger.transaction.info(f'Order event received, Order ID: {child_order_acceptance_id}, Side: {size}, Price: {price}, Size: {size}')
+            tracer.acknowledge(child_order_acceptance_id, 'order_ack')
+            order_manager.acknowledge(child_order_acceptance_id)
+
+            self.logger.transaction.info('Order event received, Order ID: %s, Side: %s, Price: %s, Size: %s', child_order_acceptance_id, side, price, size,
+                                         extra={'fields': {'event_type': 'ORDER', 'child_order_acceptance_id': child_order_acceptance_id, 'side': side, 'price': price, 'size': size}})
 
         elif 'event_type' in data and data['event_type'] == 'EXECUTION':
             """Handles execution events for child orders.
@@ -64,41 +115,62 @@ class ChildOrderEventHandler(MessageHandler):
             side = data['side'] if 'side' in data else None
             price = data['price'] if 'price' in data else None
             size = data['size'] if 'size' in data else None
+            commission = data['commission'] if 'commission' in data else 0.0
 
             if child_order_acceptance_id is None or side is None or price is None or size is None:
                 raise exceptions.TransactionException('Invalid execution event data received. Missing required field: child_order_acceptance_id.')
 
-            completed, pnl, _ = await asyncio.gather(
-                order_book.execute(child_order_acceptance_id),
+            tracer.acknowledge(child_order_acceptance_id, 'execution_ack')
+
+            completed, pnl = await asyncio.gather(
+                order_book.execute(child_order_acceptance_id, size=size),
                 position_book.add_and_settle(Position(
-                    child_order_acceptance_id=child_order_acceptance_id,
+                    product_code=data.get('product_code', config.get('crypto_currency_code')),
                     side=side,
                     price=price,
-                    size=size
-                )),
-                portfolio.sync()
+                    size=size,
+                    commission=commission
+                ))
             )
+            portfolio.apply_execution(side=side, price=price, size=size, commission=commission, realized_pnl=pnl)
+            # Unknown orders are released too: their execution may overtake both the ORDER event and the REST response.
+            if completed is None or completed.child_order_state == 'COMPLETED':
+                order_manager.release(child_order_acceptance_id)
 
-            self.logger.transaction.info(f'Execution event received, Order ID: {child_order_acceptance_id}, PnL: {pnl}')
+            self.logger.transaction.info('Execution event received, Order ID: %s, PnL: %s', child_order_acceptance_id, pnl,
+                                         extra={'fields': {'event_type': 'EXECUTION', 'child_order_acceptance_id': child_order_acceptance_id, 'side': side, 'price': price, 'size': size, 'commission': commission, 'pnl': pnl}})
 
         elif 'event_type' in data and data['event_type'] == 'CANCEL':
             """Handles cancel events for child orders.
             This method processes cancel events and logs the cancellation."""
+            await self.handle_cancel_events([data])
+
+        elif 'event_type' in data and data['event_type'] == 'ORDER_FAILED':
+            """Handles order failed events for child orders.
+            This method processes order failed events and logs the failure."""
+            child_order_acceptance_id = data['child_order_acceptance_id'] if 'child_order_acceptance_id' in data else None
+            if child_order_acceptance_id is not None:
+                await order_book.reject(child_order_acceptance_id)
+                order_manager.release(child_order_acceptance_id)
+            self.logger.transaction.info('Order failed event received.', extra={'fields': {'event_type': 'ORDER_FAILED', 'child_order_acceptance_id': child_order_acceptance_id}})
+
+        elif 'event_type' in data and data['event_type'] == 'EXPIRE':
+            """Handles expire events for child orders.
+            This method processes expire events and logs the expiry."""
             child_order_acceptance_id = data['child_order_acceptance_id'] if 'child_order_acceptance_id' in data else None
 
             if child_order_acceptance_id is None:
-                raise exceptions.TransactionException('Invalid cancel event data received. Missing required field: child_order_acceptance_id.')
+                raise exceptions.TransactionException('Invalid expire event data received. Missing required field: child_order_acceptance_id.')
 
-            await order_book.cancel(child_order_acceptance_id)
+            await order_book.expire(child_order_acceptance_id)
+            order_manager.release(child_order_acceptance_id)
 
-            self.logger.transaction.info(f'Cancel event received, Order ID: {child_order_acceptance_id}')
-
-        elif 'event_type' in data and data['event_type'] == 'ORDER_FAILED':
-            """Handles order failed events for child orders.
-            This method processes order failed events and logs the failure."""
-            self.logger.transaction.info('Order failed event received.')
+            self.logger.transaction.info('Expire event received, Order ID: %s', child_order_acceptance_id,
+                                         extra={'fields': {'event_type': 'EXPIRE', 'child_order_acceptance_id': child_order_acceptance_id}})
 
         elif 'event_type' in data and data['event_type'] == 'CANCEL_FAILED':
             """Handles cancel failed events for child orders.
             This method processes cancel failed events and logs the failure."""
-            self.logger.transaction.info(f'Cancel failed event received, Order ID: {child_order_acceptance_id}')
\ No newline at end of file
+            child_order_acceptance_id = data['child_order_acceptance_id'] if 'child_order_acceptance_id' in data else None
+            self.logger.transaction.info('Cancel failed event received, Order ID: %s', child_order_acceptance_id,
+                                         extra={'fields': {'event_type': 'CANCEL_FAILED', 'child_order_acceptance_id': child_order_acceptance_id}})
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 from abc import ABC, abstractmethod
 from dependency_injector.wiring import inject, Provide
 from services import logger
@@ -11,6 +11,9 @@ class MessageHandler(ABC):
     """
     legal_currency_code: str = None
     crypto_currency_code: str = None
+    # 'conflate' if only the latest message matters, 'fifo' if every message must be processed in order, and
+    # 'drop' if messages are processed in order but the handler recovers from a gap in `reset`, e.g. market data.
+    queue_policy: Literal['conflate', 'fifo', 'drop'] = 'fifo'
 
     @property
     @abstractmethod
@@ -27,6 +30,12 @@ class MessageHandler(ABC):
         """
         pass
 
+    def reset(self) -> None:
+        """
+        Reset any state derived from the stream, e.g. after a reconnection.
+        """
+        pass
+
     @inject
     def __init__(self,
                  config: dict = Provide['config'],
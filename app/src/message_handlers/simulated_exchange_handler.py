@@ -0,0 +1,34 @@
+from dependency_injector.wiring import inject, Provide
+from services.exchange_clients.simulated_exchange_client import SimulatedExchangeClient
+from message_handlers.message_handler import MessageHandler
+
+class SimulatedExchangeHandler(MessageHandler):
+    """
+    Feeds board snapshots to the simulated exchange.
+    This handler only subscribes to a channel when the simulated exchange is in use.
+    """
+    channel_names = []
+    queue_policy = 'conflate'
+
+    @inject
+    async def handle_message(self,
+                             data: list|dict,
+                             channel: str,
+                             simulated_exchange_client: SimulatedExchangeClient = Provide['simulated_exchange_client']) -> None:
+        """
+        Handles the incoming message by matching resting simulated orders against the board.
+        :param data: The data received from the WebSocket message.
+        :param channel: The channel from which the message was received.
+        :param simulated_exchange_client: The simulated exchange to feed.
+        """
+        simulated_exchange_client.on_board(data)
+
+    @inject
+    def __init__(self,
+                 config: dict = Provide['config']):
+        """
+        Initializes the SimulatedExchangeHandler with the cryptocurrency code.
+        """
+        super().__init__()
+        if config.get('exchange_mode') == 'simulated':
+            self.channel_names.append(f'lightning_board_snapshot_{self.crypto_currency_code}')
@@ -0,0 +1,179 @@
+from typing import Awaitable, Callable, Dict, List, Sequence
+import os
+import json
+import time
+import threading
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.s3client import S3Client
+
+class ArtifactStore:
+    """
+    A local, content-addressed disk cache of S3 artifacts such as model checkpoints.
+    Each object is stored once, under its ETag, in `directory/objects`, and `directory/index.json` maps the
+    keys to their current ETags and records the size and last use of every stored object. `get` validates the cached copy with a HEAD request and only downloads the object
+    when its ETag changed, in concurrent ranged parts streamed to disk, so a restart reuses the local file
+    instead of downloading it again. If S3 cannot be reached, the cached copy is used as it is.
+    Cached files are meant to be loaded memory-mapped (`torch.load(mmap=True)`), which pages the weights in
+    from the page cache instead of reading and copying them. Keys registered with `watch` are polled by
+    `run`; a new version is prefetched in a worker thread and handed to the callback, e.g. to hot-swap the
+    agent's model, without blocking the event loop. Least recently used objects are evicted past `max_size` bytes.
+    """
+    directory: str
+    refresh_interval: float
+    max_size: int
+
+    def get(self, key: str) -> str:
+        """
+        Return the path of the cached object, downloading it first if it is missing or outdated. Blocks.
+        :param key: The key of the object.
+        :return: The path of the local file.
+        """
+        with self._lock:
+            cached = self._keys.get(key)
+        try:
+            metadata = self.s3client.head_object(key)
+        except Exception as e:
+            if cached is None or not os.path.exists(self._path(cached)):
+                raise
+            self.logger.system.warning("Using the cached %s, as it could not be validated: %s", key, e)
+            return self._path(cached)
+
+        etag, size = metadata['ETag'].strip('"'), metadata['ContentLength']
+        path = self._path(etag)
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            self.hit_count += 1
+        else:
+            self.miss_count += 1
+            started_at = time.perf_counter()
+            partial = f"{path}.{threading.get_ident()}.part"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                self.s3client.download_file(key, partial, etag=metadata['ETag'], size=size)
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+            self.logger.system.info("Downloaded %s (%d bytes) in %.2f seconds.", key, size, time.perf_counter() - started_at)
+
+        with self._lock:
+            self._keys[key] = etag
+            self._objects[etag] = {'size': size, 'used_at': time.time()}
+            self._evict(etag)
+            self._save_index()
+        return path
+
+    async def fetch(self, key: str) -> str:
+        """
+        `get` in a worker thread.
+        """
+        return await asyncio.to_thread(self.get, key)
+
+    async def prefetch(self, keys: Sequence[str]) -> List[str]:
+        """
+        Bring several objects into the cache at once.
+        :return: The paths of the local files, in the order of the keys.
+        """
+        return await asyncio.gather(*(self.fetch(key) for key in keys))
+
+    def watch(self, key: str, callback: Callable[[str], Awaitable[None] | None]) -> None:
+        """
+        Poll an object every `refresh_interval` seconds and call back with the path of each new version.
+        :param key: The key of the object.
+        :param callback: A function or coroutine function receiving the path of the new version.
+        """
+        with self._lock:
+            cached = self._keys.get(key)
+        self._watches[key] = (callback, self._path(cached) if cached else None)
+
+    async def run(self) -> None:
+        """
+        Prefetch new versions of the watched objects and hand them over. Returns at once when no object is watched.
+        """
+        while self._watches:
+            await asyncio.sleep(self.refresh_interval)
+            for key, (callback, current) in list(self._watches.items()):
+                try:
+                    # Objects are stored under their ETag, so a new version has a new path.
+                    path = await self.fetch(key)
+                    if path == current:
+                        continue
+                    self._watches[key] = (callback, path)
+                    self.logger.system.info("A new version of %s was prefetched to %s.", key, path)
+                    result = callback(path)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    self.logger.system.error("Refreshing %s failed: %s", key, e)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the cache hits and misses, the number of keys and the bytes taken by the cached objects.
+        """
+        with self._lock:
+            return {'hits': self.hit_count, 'misses': self.miss_count, 'keys': len(self._keys), 'objects': len(self._objects),
+                    'size': sum(item['size'] for item in self._objects.values())}
+
+    def _path(self, etag: str) -> str:
+        return os.path.join(self.directory, 'objects', etag)
+
+    def _evict(self, keep: str) -> None:
+        """
+        Remove the least recently used objects, other than `keep`, until the cache fits in `max_size`.
+        Previous versions of a key are kept until then. The caller holds the lock.
+        """
+        total = sum(item['size'] for item in self._objects.values())
+        for etag, item in sorted(self._objects.items(), key=lambda pair: pair[1]['used_at']):
+            if total <= self.max_size:
+                break
+            if etag == keep:
+                continue
+            path = self._path(etag)
+            if os.path.exists(path):
+                # A file that is still memory-mapped stays readable until it is unmapped.
+                os.remove(path)
+            del self._objects[etag]
+            for key in [key for key, current in self._keys.items() if current == etag]:
+                del self._keys[key]
+            total -= item['size']
+
+    def _save_index(self) -> None:
+        """
+        Write the index atomically. The caller holds the lock.
+        """
+        path = os.path.join(self.directory, 'index.json')
+        with open(f"{path}.tmp", 'w') as file:
+            json.dump({'keys': self._keys, 'objects': self._objects}, file)
+        os.replace(f"{path}.tmp", path)
+
+    @inject
+    def __init__(self,
+                 directory: str = 'artifacts',
+                 refresh_interval: float = 60.0,
+                 max_size: int = 2 << 30,
+                 s3client: S3Client = Provide['s3client'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the artifact store.
+        :param directory: The cache directory.
+        :param refresh_interval: The number of seconds between polls of the watched objects.
+        :param max_size: The number of bytes the cached objects may take.
+        :param s3client: The S3 client the objects are fetched with.
+        :param logger: The logger service.
+        """
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.max_size = max_size
+        self.s3client = s3client
+        self.logger = logger
+        self.hit_count = 0
+        self.miss_count = 0
+        self._lock = threading.Lock()
+        self._watches: Dict[str, tuple] = {}
+        self._keys: Dict[str, str] = {}
+        self._objects: Dict[str, dict] = {}
+        if os.path.exists(os.path.join(directory, 'index.json')):
+            with open(os.path.join(directory, 'index.json')) as file:
+                index = json.load(file)
+            self._keys, self._objects = index['keys'], index['objects']
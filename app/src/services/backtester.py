@@ -0,0 +1,357 @@
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import importlib
+import random
+import time
+import numpy as np
+from dependency_injector.wiring import inject, Provide
+from services import json_codec
+from services.logger import Logger
+from services.feature_engine import FeatureEngine
+from services.normalizer import Normalizer
+from services.local_board import PriceLadder
+from services.recorder import SegmentReader, list_segments
+
+def decode_dataset(directory: str,
+                   channel: str,
+                   depth: int = 10,
+                   start_ts: int = None,
+                   end_ts: int = None,
+                   json_decoder: str = 'auto',
+                   diff_channel: str = None) -> Dict[str, np.ndarray]:
+    """
+    Decode the board snapshots of a recording into columnar arrays, once.
+    The columns match `BoardDataBuffer`, plus the receive timestamp of each snapshot. With `diff_channel`,
+    the book is rebuilt as the `LocalBoard` keeps it: each snapshot (e.g. a recorded REST seed) re-seeds it,
+    each diff is applied to it, and a row is decoded after each of them, except while the book is crossed.
+    :param directory: The recording directory holding the segments.
+    :param channel: The board snapshot channel to decode.
+    :param depth: The number of price levels kept per side.
+    :param start_ts: The earliest receive timestamp to decode, in ns.
+    :param end_ts: The latest receive timestamp to decode, in ns.
+    :param json_decoder: The JSON decoder for recorded frames ('auto', 'orjson', 'msgspec' or 'json').
+    :param diff_channel: The board diff channel applied between snapshots, if any.
+    :return: A dictionary mapping each column name to an array whose first axis is time.
+    """
+    loads = json_codec.get_loads(json_decoder)
+    timestamps, mid_prices, bid_levels, ask_levels = [], [], [], []
+    bids, asks = PriceLadder(descending=True), PriceLadder(descending=False)
+    mid_price, seeded = np.nan, False
+    for path in list_segments(directory):
+        with SegmentReader(path) as reader:
+            for received_at, record_channel, payload in reader.records(start_ts, end_ts, {channel, diff_channel} - {None}):
+                params = loads(payload).get('params')
+                if params is None or 'message' not in params:
+                    continue
+                board = params['message']
+                if diff_channel is None:
+                    # Snapshots list each side best first.
+                    timestamps.append(received_at)
+                    mid_prices.append(board.get('mid_price', np.nan))
+                    bid_levels.append(_pad([(level['price'], level['size']) for level in board.get('bids', ())[:depth]], depth))
+                    ask_levels.append(_pad([(level['price'], level['size']) for level in board.get('asks', ())[:depth]], depth))
+                    continue
+
+                if record_channel == channel:
+                    bids.clear()
+                    asks.clear()
+                    seeded = True
+                elif not seeded:
+                    continue
+                if board.get('mid_price') is not None:
+                    mid_price = board['mid_price']
+                for level in board.get('bids', ()):
+                    bids.set(level['price'], level['size'])
+                for level in board.get('asks', ()):
+                    asks.set(level['price'], level['size'])
+                if bids.best() is not None and asks.best() is not None and bids.best() >= asks.best():
+                    # As the local board does, wait for the next seed.
+                    seeded = False
+                    continue
+                timestamps.append(received_at)
+                mid_prices.append(mid_price)
+                bid_levels.append(_pad(bids.depth(depth), depth))
+                ask_levels.append(_pad(asks.depth(depth), depth))
+
+    bids = np.array(bid_levels, dtype=np.float64).reshape(len(timestamps), depth, 2)
+    asks = np.array(ask_levels, dtype=np.float64).reshape(len(timestamps), depth, 2)
+    return {
+        'timestamp': np.array(timestamps, dtype=np.int64),
+        'mid_price': np.array(mid_prices, dtype=np.float64),
+        'best_bid': np.ascontiguousarray(bids[:, 0, 0]),
+        'best_ask': np.ascontiguousarray(asks[:, 0, 0]),
+        'bid_prices': np.ascontiguousarray(bids[:, :, 0]),
+        'bid_sizes': np.ascontiguousarray(bids[:, :, 1]),
+        'ask_prices': np.ascontiguousarray(asks[:, :, 0]),
+        'ask_sizes': np.ascontiguousarray(asks[:, :, 1]),
+    }
+
+def _pad(levels: List[Tuple[float, float]], depth: int) -> List[Tuple[float, float]]:
+    return levels + [(np.nan, 0.0)] * (depth - len(levels))
+
+class SharedDataset:
+    """
+    Columnar arrays placed in shared memory, so that every worker process maps the same pages
+    instead of holding its own copy. The owner creates the blocks; workers attach to them by name.
+    """
+    spec: Dict[str, Tuple[str, tuple, str]]
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray]) -> 'SharedDataset':
+        """
+        Copy arrays into newly allocated shared memory blocks.
+        :param arrays: The columns to share.
+        """
+        blocks, spec = {}, {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            blocks[name] = block
+            spec[name] = (block.name, array.shape, array.dtype.str)
+        return cls(spec, blocks, owner=True)
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Tuple[str, tuple, str]]) -> 'SharedDataset':
+        """
+        Attach to the blocks of a dataset created by another process.
+        :param spec: The `spec` of the owning dataset.
+        """
+        blocks = {}
+        for name, (block_name, _, _) in spec.items():
+            # Pool workers share the owner's resource tracker, so the blocks are unlinked once, by the owner.
+            blocks[name] = shared_memory.SharedMemory(name=block_name)
+        return cls(spec, blocks, owner=False)
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Read-only array views of the shared blocks.
+        """
+        return self._arrays
+
+    def close(self) -> None:
+        """
+        Release the views and the mappings, and free the blocks if this process owns them.
+        """
+        self._arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = {}
+
+    def __len__(self):
+        return len(self._arrays['timestamp']) if 'timestamp' in self._arrays else 0
+
+    def __init__(self, spec: Dict[str, Tuple[str, tuple, str]], blocks: Dict[str, shared_memory.SharedMemory], owner: bool):
+        self.spec = spec
+        self._blocks = blocks
+        self._owner = owner
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, (_, shape, dtype) in spec.items():
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+            view.flags.writeable = False
+            self._arrays[name] = view
+
+class BacktestRun:
+    """
+    One agent configuration to evaluate.
+    The agent is named by import path so that it can be constructed inside a worker process.
+    """
+    def __init__(self, name: str, agent: str, params: dict = None, seed: int = 0):
+        """
+        :param name: The label of the run in the results.
+        :param agent: The agent class as 'module:Class', e.g. 'agents.sample:Random'.
+        :param params: Keyword arguments passed to the agent's constructor.
+        :param seed: The seed of the random generators for this run.
+        """
+        self.name = name
+        self.agent = agent
+        self.params = params or {}
+        self.seed = seed
+
+class Backtester:
+    """
+    Evaluates agents over a recorded dataset.
+    The recording is decoded once into columnar arrays in shared memory, and each run replays the
+    agent's decisions over a sliding window of those arrays in a process pool. Actions (1 = buy,
+    2 = sell, anything else = hold) are filled as market orders of `order_size` at the touch, after
+    `latency` snapshots, within `max_position`. As in live trading, each window is passed with the
+    'raw_features' vector of a `FeatureEngine` and the 'features' of a `Normalizer`, both advanced row
+    by row with the same code, so the agent sees bit-identical inputs. PnL, drawdown, turnover and fill
+    statistics are then computed from the fills with vectorized NumPy operations.
+    """
+    columns = ('mid_price', 'best_bid', 'best_ask', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes')
+
+    def run(self, runs: List[BacktestRun], arrays: Dict[str, np.ndarray] = None) -> List[dict]:
+        """
+        Evaluate the runs and return their statistics in the order they were given.
+        :param runs: The agent configurations to evaluate.
+        :param arrays: A dataset already decoded with `decode_dataset`; the recording is decoded if omitted.
+        """
+        if arrays is None:
+            started_at = time.perf_counter()
+            arrays = decode_dataset(self.directory, self.channel, self.depth, self.start_ts, self.end_ts, self.json_decoder, self.diff_channel)
+            self.logger.system.info("Decoded %d snapshots from %s in %.3fs.", len(arrays['timestamp']), self.directory, time.perf_counter() - started_at)
+
+        options = {
+            'window': self.window,
+            'order_size': self.order_size,
+            'max_position': self.max_position,
+            'fee_rate': self.fee_rate,
+            'latency': self.latency,
+            'features': self.features,
+            'feature_depth': self.feature_depth,
+            'normalizer': self.normalizer,
+        }
+        started_at = time.perf_counter()
+        if self.processes == 0:
+            results = [_evaluate(arrays, run, options) for run in runs]
+        else:
+            dataset = SharedDataset.create(arrays)
+            try:
+                with ProcessPoolExecutor(max_workers=self.processes, initializer=_attach_worker, initargs=(dataset.spec,)) as executor:
+                    results = list(executor.map(_evaluate_shared, runs, [options] * len(runs)))
+            finally:
+                dataset.close()
+        self.logger.system.info("Evaluated %d runs in %.3fs.", len(runs), time.perf_counter() - started_at)
+        return results
+
+    @inject
+    def __init__(self,
+                 directory: str,
+                 channel: str,
+                 depth: int = 10,
+                 window: int = 100,
+                 order_size: float = 0.001,
+                 max_position: float = 0.01,
+                 fee_rate: float = 0.0,
+                 latency: int = 1,
+                 processes: int = None,
+                 start_ts: int = None,
+                 end_ts: int = None,
+                 json_decoder: str = 'auto',
+                 features: List[dict] = None,
+                 feature_depth: int = 5,
+                 normalizer: dict = None,
+                 diff_channel: str = None,
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the backtester.
+        :param directory: The recording directory holding the segments.
+        :param channel: The board snapshot channel to evaluate on.
+        :param depth: The number of price levels kept per side.
+        :param window: The number of snapshots passed to the agent, as in `data_buffer_size`.
+        :param order_size: The size of each simulated order.
+        :param max_position: The maximum absolute position; orders beyond it are skipped.
+        :param fee_rate: The commission charged as a fraction of the executed size.
+        :param latency: The number of snapshots between a decision and its fill.
+        :param processes: The number of worker processes; None uses every CPU and 0 runs sequentially in process.
+        :param start_ts: The earliest receive timestamp to evaluate, in ns.
+        :param end_ts: The latest receive timestamp to evaluate, in ns.
+        :param json_decoder: The JSON decoder for recorded frames.
+        :param features: The feature declarations, as in the `features` setting.
+        :param feature_depth: The number of levels per side of the imbalance and depth features.
+        :param normalizer: The keyword arguments of the `Normalizer`, as in the `normalizer_*` settings.
+        :param diff_channel: The board diff channel applied between snapshots, for recordings of the local board.
+        :param logger: The logger service.
+        """
+        self.directory = directory
+        self.channel = channel
+        self.diff_channel = diff_channel
+        self.depth = depth
+        self.window = window
+        self.order_size = order_size
+        self.max_position = max_position
+        self.fee_rate = fee_rate
+        self.latency = max(latency, 0)
+        self.processes = processes
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.json_decoder = json_decoder
+        self.features = features
+        self.feature_depth = feature_depth
+        self.normalizer = normalizer
+        self.logger = logger
+
+_dataset: SharedDataset = None
+
+def _attach_worker(spec: Dict[str, Tuple[str, tuple, str]]) -> None:
+    """
+    Pool initializer: attach to the shared dataset once per worker process.
+    """
+    global _dataset
+    _dataset = SharedDataset.attach(spec)
+
+def _evaluate_shared(run: BacktestRun, options: dict) -> dict:
+    return _evaluate(_dataset.arrays, run, options)
+
+def _evaluate(arrays: Dict[str, np.ndarray], run: BacktestRun, options: dict) -> dict:
+    """
+    Replay one agent over the dataset and compute its statistics.
+    """
+    random.seed(run.seed)
+    np.random.seed(run.seed)
+    module_name, class_name = run.agent.split(':')
+    agent = getattr(importlib.import_module(module_name), class_name)(**run.params)
+    agent.warmup()
+
+    window, order_size, max_position = options['window'], options['order_size'], options['max_position']
+    length = len(arrays['mid_price'])
+    columns = [(name, arrays[name]) for name in Backtester.columns]
+    feature_engine = FeatureEngine(options.get('features'), options.get('feature_depth', 5))
+    normalizer = Normalizer(**(options.get('normalizer') or {}))
+    trades = np.zeros(length)
+    position = 0.0
+    decisions = 0
+    started_at = time.perf_counter()
+
+    for row in range(length - options['latency']):
+        normalized = normalizer.update(feature_engine.update({name: column[row] for name, column in columns}))
+        if row < window - 1:
+            continue
+        view = {name: column[row - window + 1:row + 1] for name, column in columns}
+        view['raw_features'] = feature_engine.get_vector()
+        view['features'] = normalized.copy()
+        action = agent.get_action(agent.extract_features(view))
+        action = int(getattr(action, 'value', action))
+        decisions += 1
+        if action == 1 and position + order_size <= max_position + 1e-12:
+            trades[row + options['latency']] += order_size
+            position += order_size
+        elif action == 2 and position - order_size >= -max_position - 1e-12:
+            trades[row + options['latency']] -= order_size
+            position -= order_size
+
+    return {'name': run.name, 'decisions': decisions, 'elapsed': time.perf_counter() - started_at,
+            **_statistics(arrays, trades, options['fee_rate'])}
+
+def _statistics(arrays: Dict[str, np.ndarray], trades: np.ndarray, fee_rate: float) -> dict:
+    """
+    PnL, drawdown, turnover and fill statistics of a series of signed market fills.
+    Buys fill at the best ask and sells at the best bid; equity is marked at the mid price.
+    """
+    mid = arrays['mid_price']
+    prices = np.where(trades > 0, arrays['best_ask'], arrays['best_bid'])
+    filled = trades != 0
+    notional = np.abs(trades) * np.where(filled, prices, 0.0)
+    fees = np.abs(trades) * fee_rate
+    position = np.cumsum(trades)
+    cash = -np.cumsum(np.where(filled, trades * prices, 0.0))
+    # Fees are charged in the base currency, as on bitFlyer, and valued at the mid price.
+    equity = cash + (position - np.cumsum(fees)) * mid
+    equity = equity[~np.isnan(equity)]
+    drawdown = np.maximum.accumulate(equity) - equity if len(equity) else np.zeros(1)
+    fill_count = int(filled.sum())
+    return {
+        'pnl': float(equity[-1]) if len(equity) else 0.0,
+        'max_drawdown': float(drawdown.max()),
+        'turnover': float(notional.sum()),
+        'fills': fill_count,
+        'buys': int((trades > 0).sum()),
+        'sells': int((trades < 0).sum()),
+        'average_fill_size': float(np.abs(trades[filled]).mean()) if fill_count else 0.0,
+        'average_spread_cost': float((np.abs(prices - mid) * np.abs(trades))[filled].sum() / np.abs(trades[filled]).sum()) if fill_count else 0.0,
+        'final_position': float(position[-1]) if len(position) else 0.0,
+    }
@@ -1,24 +1,31 @@
 from typing import List, Callable, Awaitable
+import time
 import asyncio
 from dependency_injector.wiring import inject, Provide
 from services.logger import Logger
+from services.portfolio import Portfolio
 from services.exchanges.exchange import Exchange
 
 class Batch:
     tasks: List[Callable[[], Awaitable[None]]]
     interval: int
+    reconcile_interval: int
 
     @inject
     async def run(self,
-                  exchange: Exchange = Provide['exchange']):
+                  exchange: Exchange = Provide['exchange'],
+                  portfolio: Portfolio = Provide['portfolio']):
         """
         Start the batch service.
         This method starts the event loop and runs the tasks at the specified interval.
+        The portfolio ledger is reconciled against the exchange at most once per `reconcile_interval`.
         """
         self.logger.system.info("The batch service is started.")
         while True:
             if not self.paused:
-                await asyncio.gather(exchange.sync(), asyncio.sleep(self.interval))
+                await asyncio.gather(exchange.sync(),
+                                     portfolio.sync(fresh_as_of=time.monotonic() - self.reconcile_interval),
+                                     asyncio.sleep(self.interval))
             else:
                 await asyncio.sleep(1)
 
@@ -41,13 +48,16 @@ class Batch:
     @inject
     def __init__(self,
                  interval: int,
+                 reconcile_interval: int = 60,
                  logger: Logger = Provide['logger']):
         """
         Initialize the Batch service with a list of tasks.
         :param interval: The interval in seconds at which to run the tasks.
+        :param reconcile_interval: The interval in seconds at which the portfolio is reconciled with the exchange.
         :param tasks: A list of asynchronous tasks to run at the specified interval.
         :param logger: The logger service to log messages.
         """
         self.interval = interval
+        self.reconcile_interval = reconcile_interval
         self.logger = logger
         self.paused = False
\ No newline at end of file
@@ -0,0 +1,95 @@
+from typing import Any, Literal
+import asyncio
+
+class ChannelQueue:
+    """
+    A bounded queue for the messages of one channel.
+    With the 'conflate' policy only the latest message is kept, so a slow consumer always sees fresh data
+    and superseded messages are counted as dropped. With the 'fifo' policy every message is delivered in
+    order, and the producer waits when the queue is full. The 'drop' policy delivers in order as well, but
+    never makes the producer wait: a message that does not fit is dropped, and the consumer must recover
+    from the gap, e.g. by resynchronizing.
+    """
+    channel: str
+    policy: Literal['conflate', 'fifo', 'drop']
+    high_water_mark: int = 0
+    enqueued_count: int = 0
+    dropped_count: int = 0
+    # Whether the last message of a 'drop' queue was dropped.
+    overflowing: bool = False
+
+    async def put(self, item: Any) -> bool:
+        """
+        Enqueue a message according to the queue policy.
+        :param item: The message to enqueue.
+        :return: False if the message was dropped because a 'drop' queue was full.
+        """
+        self.enqueued_count += 1
+        if self.policy == 'conflate':
+            if self._has_latest:
+                self.dropped_count += 1
+            self._latest = item
+            self._has_latest = True
+            self._ready.set()
+            if self.high_water_mark < 1:
+                self.high_water_mark = 1
+        elif self.policy == 'drop':
+            self.overflowing = self._queue.full()
+            if self.overflowing:
+                self.dropped_count += 1
+                return False
+            self._queue.put_nowait(item)
+            if self._queue.qsize() > self.high_water_mark:
+                self.high_water_mark = self._queue.qsize()
+        else:
+            await self._queue.put(item)
+            if self._queue.qsize() > self.high_water_mark:
+                self.high_water_mark = self._queue.qsize()
+        return True
+
+    async def get(self) -> Any:
+        """
+        Wait for and remove the next message.
+        :return: The next message.
+        """
+        if self.policy == 'conflate':
+            while not self._has_latest:
+                self._ready.clear()
+                await self._ready.wait()
+            item = self._latest
+            self._latest = None
+            self._has_latest = False
+            return item
+        return await self._queue.get()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the queue metrics.
+        :return: A dictionary with the policy, current depth, high-water mark, enqueued and dropped counts.
+        """
+        return {
+            'policy': self.policy,
+            'depth': len(self),
+            'high_water_mark': self.high_water_mark,
+            'enqueued': self.enqueued_count,
+            'dropped': self.dropped_count,
+        }
+
+    def __len__(self):
+        if self.policy == 'conflate':
+            return 1 if self._has_latest else 0
+        return self._queue.qsize()
+
+    def __init__(self, channel: str, policy: Literal['conflate', 'fifo', 'drop'] = 'fifo', maxsize: int = 1000):
+        """
+        :param channel: The channel whose messages are queued.
+        :param policy: 'conflate' to keep only the latest message, 'fifo' for lossless delivery,
+                       or 'drop' for in-order delivery that drops messages rather than wait.
+        :param maxsize: The capacity of a 'fifo' or 'drop' queue.
+        """
+        self.channel = channel
+        self.policy = policy
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._latest = None
+        self._has_latest = False
+        self._ready = asyncio.Event()
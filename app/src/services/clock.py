@@ -0,0 +1,94 @@
+from typing import Any, Callable, List, Tuple
+import heapq
+import time
+import asyncio
+
+class Clock:
+    """
+    The time source of the services that simulate or measure latency.
+    This is the wall clock; a replay uses the `ReplayClock` instead, so that simulated latencies and traces
+    follow the recorded time rather than how fast the replay runs.
+    """
+    # Whether time only moves when it is set, i.e. it stands still while a message is handled.
+    simulated: bool = False
+
+    def time_ns(self) -> int:
+        return time.time_ns()
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic_ns(self) -> int:
+        return time.monotonic_ns()
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> None:
+        """
+        Call `callback(*args)` on the event loop after `delay` seconds.
+        """
+        asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+class ReplayClock(Clock):
+    """
+    A clock that follows the receive timestamps of the replayed frames instead of the wall clock.
+    Its timers fire when the replay reaches their due time, in due time order, before the frame that
+    passes it is dispatched, so the interleaving of simulated events with market data does not depend on
+    how fast the replay runs.
+    """
+    simulated = True
+
+    def time_ns(self) -> int:
+        return self._now
+
+    def time(self) -> float:
+        return self._now / 1e9
+
+    def monotonic_ns(self) -> int:
+        return self._now
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> None:
+        heapq.heappush(self._timers, (self._now + int(delay * 1e9), self._sequence, callback, args))
+        self._sequence += 1
+
+    async def sleep(self, delay: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self.call_later(delay, self._wake, future)
+        await future
+
+    def set(self, timestamp: int) -> int:
+        """
+        Advance the clock, firing the timers due by then.
+        :param timestamp: The new time in nanoseconds since the epoch.
+        :return: The number of timers fired.
+        """
+        fired = 0
+        while self._timers and self._timers[0][0] <= timestamp:
+            due, _, callback, args = heapq.heappop(self._timers)
+            self._now = max(due, self._now)
+            callback(*args)
+            fired += 1
+        self._now = timestamp
+        return fired
+
+    def drain(self) -> int:
+        """
+        Fire every pending timer, e.g. once the replay has ended.
+        :return: The number of timers fired.
+        """
+        if not self._timers:
+            return 0
+        return self.set(max(max(timer[0] for timer in self._timers), self._now))
+
+    def _wake(self, future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def __init__(self, start: int = 0):
+        """
+        :param start: The initial time in nanoseconds since the epoch.
+        """
+        self._now = start
+        self._sequence = 0
+        self._timers: List[Tuple[int, int, Callable, tuple]] = []
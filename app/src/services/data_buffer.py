@@ -1,4 +1,6 @@
+from typing import Dict
 from collections import deque
+import numpy as np
 
 class DataBuffer:
     """
@@ -6,10 +8,12 @@ class DataBuffer:
     When the buffer reaches its maximum size, the oldest data is discarded.
     """
     max_size: int
+    sequence: int
     _buffer: deque
 
     def __init__(self, max_size: int = 100):
         self.max_size = max_size
+        self.sequence = 0
         self._buffer = deque(maxlen=max_size)
 
     def append(self, data) -> None:
@@ -18,13 +22,140 @@ class DataBuffer:
         :param data: The data to be appended to the buffer.
         """
         self._buffer.append(data)
+        self.sequence += 1
 
-    def get_data(self):
+    def get_data(self, copy: bool = True):
         """
         Returns a copy of the current data in the buffer.
+        :param copy: Ignored; the list buffer always returns a copy.
         :return: A list containing the data in the buffer.
         """
         return list(self._buffer)
 
+    def state_dict(self) -> dict:
+        """
+        Returns the buffered data, to be restored with `load_state_dict`.
+        """
+        return {'max_size': self.max_size, 'sequence': self.sequence, 'buffer': list(self._buffer)}
+
+    def load_state_dict(self, state: dict) -> None:
+        """
+        Restore the data returned by `state_dict`.
+        """
+        self.sequence = state['sequence']
+        self._buffer = deque(state['buffer'], maxlen=self.max_size)
+
+    def __len__(self):
+        return len(self._buffer)
+
+class BoardDataBuffer(DataBuffer):
+    """
+    An array-backed ring buffer of board snapshots.
+    Each snapshot is parsed once into preallocated NumPy columns (mid price, best bid/ask and the
+    top `depth` level prices and sizes on each side). Every row is written twice, at `i` and
+    `i + max_size`, so the latest window is always one contiguous slice that can be returned as a
+    read-only view without copying.
+    """
+    depth: int
+    columns = ('mid_price', 'best_bid', 'best_ask', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes')
+
+    def __init__(self, max_size: int = 100, depth: int = 10):
+        """
+        :param max_size: The number of snapshots in the window.
+        :param depth: The number of price levels kept per side.
+        """
+        self.max_size = max_size
+        self.depth = depth
+        self.sequence = 0
+        self._arrays: Dict[str, np.ndarray] = {
+            'mid_price': np.full(2 * max_size, np.nan),
+            'best_bid': np.full(2 * max_size, np.nan),
+            'best_ask': np.full(2 * max_size, np.nan),
+            'bid_prices': np.full((2 * max_size, depth), np.nan),
+            'bid_sizes': np.zeros((2 * max_size, depth)),
+            'ask_prices': np.full((2 * max_size, depth), np.nan),
+            'ask_sizes': np.zeros((2 * max_size, depth)),
+        }
+        self._bid_levels = np.full((depth, 2), np.nan)
+        self._ask_levels = np.full((depth, 2), np.nan)
+
+    def append(self, data: dict) -> None:
+        """
+        Parses a board snapshot into the next row of the ring buffer.
+        :param data: A board snapshot with `mid_price`, `bids` and `asks`, each sorted best first as bitFlyer
+                     sends them, so only the first `depth` levels of each side are read.
+        """
+        self._fill_levels(self._bid_levels, data.get('bids', ())[:self.depth])
+        self._fill_levels(self._ask_levels, data.get('asks', ())[:self.depth])
+
+        position = self.sequence % self.max_size
+        for row in (position, position + self.max_size):
+            self._arrays['mid_price'][row] = data.get('mid_price', np.nan)
+            self._arrays['best_bid'][row] = self._bid_levels[0, 0]
+            self._arrays['best_ask'][row] = self._ask_levels[0, 0]
+            self._arrays['bid_prices'][row] = self._bid_levels[:, 0]
+            self._arrays['bid_sizes'][row] = self._bid_levels[:, 1]
+            self._arrays['ask_prices'][row] = self._ask_levels[:, 0]
+            self._arrays['ask_sizes'][row] = self._ask_levels[:, 1]
+        self.sequence += 1
+
+    def get_data(self, copy: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Returns the current window, oldest snapshot first.
+        :param copy: When False, the columns are read-only views into the ring buffer that are
+                     overwritten by later appends. Pass True to keep the window beyond the next append.
+        :return: A dictionary mapping each column name to an array whose first axis is time.
+        """
+        length = len(self)
+        end = self.sequence % self.max_size or self.max_size
+        if self.sequence > self.max_size:
+            end += self.max_size
+        window = {}
+        for name, array in self._arrays.items():
+            view = array[end - length:end]
+            if copy:
+                view = view.copy()
+            else:
+                view.flags.writeable = False
+            window[name] = view
+        return window
+
+    def get_latest(self) -> Dict[str, float | np.ndarray]:
+        """
+        Returns the newest snapshot as one row of the columns.
+        :return: A dictionary mapping each column name to a scalar, or to a level array that is a view
+                 overwritten by later appends.
+        """
+        row = (self.sequence - 1) % self.max_size
+        return {name: array[row] for name, array in self._arrays.items()}
+
+    def state_dict(self) -> dict:
+        """
+        Returns a copy of the ring buffer, to be restored with `load_state_dict`.
+        """
+        return {'max_size': self.max_size, 'depth': self.depth, 'sequence': self.sequence,
+                'arrays': {name: array.copy() for name, array in self._arrays.items()}}
+
+    def load_state_dict(self, state: dict) -> None:
+        """
+        Restore the ring buffer returned by `state_dict`.
+        """
+        if (state['max_size'], state['depth']) != (self.max_size, self.depth):
+            raise ValueError(f"The state holds {state['max_size']} snapshots of depth {state['depth']}, "
+                             f"the buffer {self.max_size} of depth {self.depth}.")
+        for name, array in state['arrays'].items():
+            self._arrays[name][...] = array
+        self.sequence = state['sequence']
+
+    def _fill_levels(self, levels: np.ndarray, source: list) -> None:
+        """
+        Copies price levels into a preallocated (depth, 2) array, padding missing levels.
+        """
+        levels[:, 0] = np.nan
+        levels[:, 1] = 0.0
+        for index, level in enumerate(source):
+            levels[index, 0] = level['price']
+            levels[index, 1] = level['size']
+
     def __len__(self):
-        return len(self._buffer)
\ No newline at end of file
+        return min(self.sequence, self.max_size)
\ No newline at end of file
@@ -1,16 +1,25 @@
-from typing import Literal
+from typing import List, Literal
 import datetime
+import time
 import json
-import requests
+import httpx
 import hashlib
 import hmac
 from urllib.parse import urlencode
+from dependency_injector.wiring import inject, Provide
+from services.tracer import Tracer
+from services.metrics import MetricsRegistry
 from services.exchange_clients.exchange_client import ExchangeClient
 
 class BitflyerLightningClient(ExchangeClient):
+    """
+    Asynchronous REST client for bitFlyer Lightning.
+    All requests share one pooled `httpx.AsyncClient`, so connections (and their TLS sessions)
+    are kept alive and reused instead of being re-established on every call.
+    """
     exchange_name = "bitflyer Lightning"
 
-    def get_ticker(self, symbol: str) -> dict:
+    async def get_ticker(self, symbol: str) -> dict:
         """
         Fetches the ticker information for a given symbol.
         :param symbol: The product code for which to fetch the ticker.
@@ -18,10 +27,19 @@ class BitflyerLightningClient(ExchangeClient):
         """
         path = "/v1/getticker"
         params = {"product_code": symbol}
-        response = requests.get(self.base_url + path, params=params)
-        return response.json()
+        return await self._request('get', path, params=params)
 
-    def get_health(self, symbol: str) -> dict:
+    async def get_board(self, symbol: str) -> dict:
+        """
+        Fetches the order book for a given symbol.
+        :param symbol: The product code for which to fetch the order book.
+        :return: A dictionary containing `mid_price`, `bids` and `asks`.
+        """
+        path = "/v1/getboard"
+        params = {"product_code": symbol}
+        return await self._request('get', path, params=params)
+
+    async def get_health(self, symbol: str) -> dict:
         """
         Fetches the health status of the exchange for a given symbol.
         :param symbol: The product code for which to fetch the health status.
@@ -29,30 +47,25 @@ class BitflyerLightningClient(ExchangeClient):
         """
         path = "/v1/getboardstate"
         params = {"product_code": symbol}
-        response = requests.get(self.base_url + path, params=params)
-        return response.json()
+        return await self._request('get', path, params=params)
 
-    def get_balance(self) -> list:
+    async def get_balance(self) -> list:
         """
         Fetches the balance of the account.
         :return: A dictionary containing the account balance.
         """
         path = "/v1/me/getbalance"
-        headers = self._get_auth_headers('get', path)
-        response = requests.get(self.base_url + path, headers=headers)
-        return response.json()
+        return await self._request('get', path, private=True)
 
-    def get_collateral(self) -> dict:
+    async def get_collateral(self) -> dict:
         """
         Fetches the collateral information of the account.
         :return: A dictionary containing the collateral information.
         """
         path = "/v1/me/getcollateral"
-        headers = self._get_auth_headers('get', path)
-        response = requests.get(self.base_url + path, headers=headers)
-        return response.json()
+        return await self._request('get', path, private=True)
 
-    def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
+    async def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
         """
         Creates a new order.
         :param symbol: The product code for the order.
@@ -70,11 +83,13 @@ class BitflyerLightningClient(ExchangeClient):
             "price": price,
             "size": size,
         })
-        headers = self._get_auth_headers('post', path, data=data)
-        response = requests.post(self.base_url + path, data=data, headers=headers)
-        return response.json()
+        self.tracer.stamp('order_request')
+        response = await self._request('post', path, data=data, private=True)
+        self.tracer.stamp('order_response')
+        self.tracer.bind(response.get('child_order_acceptance_id'))
+        return response
 
-    def cancel_order(self, order_id: str, symbol: str = None) -> dict:
+    async def cancel_order(self, order_id: str, symbol: str = None) -> dict:
         """
         Cancels an existing order.
         :param order_id: The ID of the order to cancel.
@@ -86,11 +101,54 @@ class BitflyerLightningClient(ExchangeClient):
             "product_code": symbol,
             "child_order_id": order_id,
         })
-        headers = self._get_auth_headers('post', path, data=data)
-        response = requests.post(self.base_url + path, data=data, headers=headers)
-        return response.json()
+        return await self._request('post', path, data=data, private=True)
+
+    async def cancel_all_orders(self, symbol: str) -> dict:
+        """
+        Cancels every open order for a given symbol in one request.
+        :param symbol: The product code of the orders to cancel.
+        :return: A dictionary containing the cancellation response.
+        """
+        path = '/v1/me/cancelallchildorders'
+        data = json.dumps({
+            "product_code": symbol,
+        })
+        return await self._request('post', path, data=data, private=True)
 
-    def get_orders(self, symbol: str, order_state: str = None) -> list:
+    async def create_parent_order(self,
+                                  symbol: str,
+                                  order_method: Literal["SIMPLE", "IFD", "OCO", "IFDOCO"],
+                                  parameters: List[dict],
+                                  minute_to_expire: int = None,
+                                  time_in_force: Literal["GTC", "IOC", "FOK"] = None) -> dict:
+        """
+        Creates a parent order of linked legs (IFD, OCO or IFDOCO).
+        :param symbol: The product code of every leg.
+        :param order_method: How the legs are linked.
+        :param parameters: The legs, each with `condition_type`, `side`, `size` and, depending on the
+                           condition type, `price`, `trigger_price` or `offset`.
+        :param minute_to_expire: The expiry of the order in minutes.
+        :param time_in_force: The execution condition of the order.
+        :return: A dictionary containing the `parent_order_acceptance_id`.
+        """
+        path = "/v1/me/sendparentorder"
+        body = {
+            "order_method": order_method.upper(),
+            "parameters": [
+                {"product_code": symbol, **{key: value.upper() if key in ('condition_type', 'side') else value for key, value in leg.items()}}
+                for leg in parameters
+            ],
+        }
+        if minute_to_expire is not None:
+            body["minute_to_expire"] = minute_to_expire
+        if time_in_force is not None:
+            body["time_in_force"] = time_in_force
+        self.tracer.stamp('order_request')
+        response = await self._request('post', path, data=json.dumps(body), private=True)
+        self.tracer.stamp('order_response')
+        return response
+
+    async def get_orders(self, symbol: str, order_state: str = None) -> list:
         """
         Fetches all orders or orders for a specific symbol.
         :param symbol: The product code for which to fetch the orders.
@@ -98,11 +156,9 @@ class BitflyerLightningClient(ExchangeClient):
         """
         path = "/v1/me/getchildorders"
         params = {"product_code": symbol, "child_order_state": order_state}
-        headers = self._get_auth_headers('get', path, params=params)
-        response = requests.get(self.base_url + path, params=params, headers=headers)
-        return response.json()
+        return await self._request('get', path, params=params, private=True)
 
-    def get_positions(self, symbol: str) -> dict:
+    async def get_positions(self, symbol: str) -> dict:
         """
         Fetches the positions for a given symbol.
         :param symbol: The product code for which to fetch positions.
@@ -110,9 +166,46 @@ class BitflyerLightningClient(ExchangeClient):
         """
         path = "/v1/me/getpositions"
         params = {"product_code": symbol}
-        headers = self._get_auth_headers('get', path, params=params)
-        response = requests.get(self.base_url + path, params=params, headers=headers)
-        return response.json()
+        return await self._request('get', path, params=params, private=True)
+
+    async def close(self) -> None:
+        """
+        Closes the pooled connections held by the client.
+        """
+        await self._client.aclose()
+
+    async def _request(self, method: Literal["post", "get"], path: str, params: dict = None, data: str = '', private: bool = False):
+        """
+        Sends a request through the shared connection pool and decodes the JSON response.
+        :param method: The HTTP method (e.g., 'post', 'get').
+        :param path: The API endpoint path.
+        :param params: The query parameters, if applicable. Parameters set to None are omitted.
+        :param data: The request body data, if applicable.
+        :param private: Whether the endpoint requires authentication headers.
+        :return: The decoded JSON response.
+        """
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        headers = self._get_auth_headers(method, path, params=params, data=data) if private else None
+        duration, errors = self._endpoint_metrics.get(path) or self._register_endpoint(path)
+        started_at = time.perf_counter_ns()
+        try:
+            response = await self._client.request(method.upper(), path, params=params, content=data or None, headers=headers)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe((time.perf_counter_ns() - started_at) / 1e9)
+        if response.status_code >= 400:
+            errors.inc()
+        # Cancel endpoints answer with an empty body.
+        return response.json() if response.content else {}
+
+    def _register_endpoint(self, path: str) -> tuple:
+        """
+        Resolve the latency histogram and error counter of an endpoint once.
+        """
+        self._endpoint_metrics[path] = (self._request_duration.labels(path), self._request_errors.labels(path))
+        return self._endpoint_metrics[path]
 
     def _get_auth_headers(self, method: Literal["post", "get"], path: str, params: dict = {}, data: str = '') -> dict:
         """
@@ -134,10 +227,45 @@ class BitflyerLightningClient(ExchangeClient):
             "Content-Type": 'application/json',
         }
 
-    def __init__(self, base_url: str, api_key: str, api_secret: str):
+    @inject
+    def __init__(self,
+                 base_url: str,
+                 api_key: str,
+                 api_secret: str,
+                 timeout: float = 10.0,
+                 connect_timeout: float = 5.0,
+                 max_connections: int = 10,
+                 keepalive_expiry: float = 60.0,
+                 http2: bool = False,
+                 tracer: Tracer = Provide['tracer'],
+                 metrics: MetricsRegistry = Provide['metrics']):
         """
         Initializes the BitflyerApiClient with API credentials and base URL.
+        :param base_url: The base URL of the REST API.
+        :param api_key: The API key for authentication.
+        :param api_secret: The API secret for authentication.
+        :param timeout: The read/write/pool timeout in seconds.
+        :param connect_timeout: The timeout in seconds for establishing a new connection.
+        :param max_connections: The maximum number of pooled connections, all of which are kept alive.
+        :param keepalive_expiry: The number of seconds an idle connection is kept in the pool.
+        :param http2: Whether to negotiate HTTP/2 (requires the `h2` package).
+        :param tracer: The tracer that times order requests and correlates their acks.
+        :param metrics: The metrics registry recording the latency and errors of each endpoint.
         """
         self.base_url = base_url
         self.__api_key = api_key
-        self.__api_secret = api_secret
\ No newline at end of file
+        self.__api_secret = api_secret
+        self.tracer = tracer
+        self._request_duration = metrics.histogram('rest_request_duration_seconds', 'The latency of REST requests.', ['endpoint'])
+        self._request_errors = metrics.counter('rest_request_errors_total', 'The REST requests that failed or returned an error status.', ['endpoint'])
+        self._endpoint_metrics = {}
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=bool(http2),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            )
+        )
\ No newline at end of file
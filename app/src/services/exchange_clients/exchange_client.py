@@ -1,10 +1,12 @@
-from typing import Literal
+from typing import Iterable, List, Literal
 from abc import ABC, abstractmethod
+import asyncio
 
 class ExchangeClient(ABC):
     """
     Abstract base class for exchange APIs.
     This class defines the interface for interacting with different exchange APIs.
+    All request methods are coroutines so that REST round-trips never block the event loop.
     """
 
     @property
@@ -16,14 +18,21 @@ class ExchangeClient(ABC):
         pass
 
     @abstractmethod
-    def get_ticker(self, symbol: str) -> dict:
+    async def get_ticker(self, symbol: str) -> dict:
         """
         Fetches the ticker information for a given symbol.
         """
         pass
 
     @abstractmethod
-    def get_health(self, symbol: str) -> dict:
+    async def get_board(self, symbol: str) -> dict:
+        """
+        Fetches the order book for a given symbol.
+        """
+        pass
+
+    @abstractmethod
+    async def get_health(self, symbol: str) -> dict:
         """
         Fetches the health status of the exchange.
         This method can be extended to include more detailed health checks.
@@ -31,35 +40,77 @@ class ExchangeClient(ABC):
         pass
 
     @abstractmethod
-    def get_balance(self) -> list:
+    async def get_balance(self) -> list:
         """
         Fetches the balance of the account.
         """
         pass
 
     @abstractmethod
-    def get_collateral(self) -> dict:
+    async def get_collateral(self) -> dict:
         """
         Fetches the collateral information of the account.
         """
         pass
 
     @abstractmethod
-    def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
+    async def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
         """
         Creates a new order.
         """
         pass
 
     @abstractmethod
-    def cancel_order(self, order_id: str, symbol: str = None) -> dict:
+    async def cancel_order(self, order_id: str, symbol: str = None) -> dict:
         """
         Cancels an existing order by its ID.
         """
         pass
 
     @abstractmethod
-    def get_orders(self, symbol: str, order_state: str) -> list:
+    async def cancel_all_orders(self, symbol: str) -> dict:
+        """
+        Cancels every open order for a given symbol in one request.
+        """
+        pass
+
+    async def cancel_orders(self, order_ids: Iterable[str], symbol: str = None, concurrency: int = 5) -> List[dict | Exception]:
+        """
+        Cancels several orders concurrently, with at most `concurrency` requests in flight.
+        :param order_ids: The IDs of the orders to cancel.
+        :param symbol: The product code for the orders, if applicable.
+        :param concurrency: The maximum number of cancel requests sent at the same time.
+        :return: The response for each order, in order, or the exception raised for it.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def cancel(order_id: str) -> dict:
+            async with semaphore:
+                return await self.cancel_order(order_id, symbol)
+
+        return await asyncio.gather(*(cancel(order_id) for order_id in order_ids), return_exceptions=True)
+
+    @abstractmethod
+    async def create_parent_order(self,
+                                  symbol: str,
+                                  order_method: Literal["SIMPLE", "IFD", "OCO", "IFDOCO"],
+                                  parameters: List[dict],
+                                  minute_to_expire: int = None,
+                                  time_in_force: Literal["GTC", "IOC", "FOK"] = None) -> dict:
+        """
+        Creates a multi-leg (parent) order.
+        :param symbol: The product code of every leg.
+        :param order_method: How the legs are linked.
+        :param parameters: The legs, each with `condition_type`, `side`, `size` and, depending on the
+                           condition type, `price`, `trigger_price` or `offset`.
+        :param minute_to_expire: The expiry of the order in minutes.
+        :param time_in_force: The execution condition of the order.
+        :return: A dictionary containing the order response.
+        """
+        pass
+
+    @abstractmethod
+    async def get_orders(self, symbol: str, order_state: str) -> list:
         """
         Fetches all orders or orders for a specific symbol.
         :param symbol: The product code for which to fetch the orders.
@@ -68,10 +119,16 @@ class ExchangeClient(ABC):
         pass
 
     @abstractmethod
-    def get_positions(self, symbol: str) -> dict:
+    async def get_positions(self, symbol: str) -> dict:
         """
         Fetches the positions for a given symbol.
         :param symbol: The product code for which to fetch the positions.
         :return: A dictionary containing position information.
         """
+        pass
+
+    async def close(self) -> None:
+        """
+        Releases any resources (e.g. pooled connections) held by the client.
+        """
         pass
\ No newline at end of file
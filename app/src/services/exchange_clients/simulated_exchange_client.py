@@ -0,0 +1,336 @@
+from typing import Dict, List, Literal, Set
+import datetime
+import random
+import asyncio
+from dependency_injector.wiring import inject, Provide
+import exceptions
+from services.clock import Clock
+from services.matching_engine import Fill, MatchingEngine, SimulatedOrder
+from services.netting_engine import NettingEngine
+from services.tracer import Tracer
+from services.exchange_clients.exchange_client import ExchangeClient
+
+# The number of legs of each parent order method.
+PARENT_ORDER_LEGS = {'SIMPLE': 1, 'IFD': 2, 'OCO': 2, 'IFDOCO': 3}
+
+class SimulatedExchangeClient(ExchangeClient):
+    """
+    A local stand-in for bitFlyer Lightning backed by an in-process `MatchingEngine`.
+    Orders are matched against the board data fed through `on_board` (live, replayed or synthetic), the
+    account is settled with a `NettingEngine`, and ORDER/EXECUTION/CANCEL events shaped like the
+    `child_order_events` channel are submitted to the handler dispatcher after a configurable latency.
+    Latencies and timestamps follow the `clock`, which is the `ReplayClock` during a replay.
+    Parent orders are placed leg by leg as they are triggered: the second stage of an IFD once its first
+    leg is completed, and an OCO's legs together, the other leg being canceled once one executes.
+    """
+    exchange_name = "simulated"
+
+    async def get_ticker(self, symbol: str) -> dict:
+        """
+        Returns the top of book of the simulated market.
+        """
+        return {
+            'product_code': symbol,
+            'best_bid': self.engine.best_bid,
+            'best_bid_size': self.engine.best_bid_size,
+            'best_ask': self.engine.best_ask,
+            'best_ask_size': self.engine.best_ask_size,
+            'ltp': self.engine.mid_price,
+        }
+
+    async def get_board(self, symbol: str) -> dict:
+        """
+        Returns the last board fed to the simulated market.
+        """
+        return {
+            'mid_price': self.engine.mid_price,
+            'bids': [{'price': price, 'size': size} for price, size in self.engine._levels('BUY') if size > 0.0],
+            'asks': [{'price': price, 'size': size} for price, size in self.engine._levels('SELL') if size > 0.0],
+        }
+
+    async def get_health(self, symbol: str) -> dict:
+        return {'health': 'NORMAL', 'state': 'RUNNING'}
+
+    async def get_balance(self) -> list:
+        return [{'currency_code': self.legal_currency_code, 'amount': self._collateral(), 'available': self._collateral()}]
+
+    async def get_collateral(self) -> dict:
+        mid_price = self.engine.mid_price
+        return {
+            'collateral': self._collateral(),
+            'open_position_pnl': self.account.unrealized_pnl(mid_price) if mid_price is not None else 0.0,
+            'require_collateral': abs(self.account.net_size) * self.account.average_price,
+            'keep_rate': 0.0,
+        }
+
+    async def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
+        """
+        Submits an order to the matching engine and returns its acceptance ID.
+        """
+        self.tracer.stamp('order_request')
+        await self._rest_latency()
+        order, events = self._submit(side, size, price, order_type)
+        self._emit(events)
+        self.tracer.stamp('order_response')
+        self.tracer.bind(order.child_order_acceptance_id)
+        return {'child_order_acceptance_id': order.child_order_acceptance_id}
+
+    async def create_parent_order(self,
+                                  symbol: str,
+                                  order_method: Literal["SIMPLE", "IFD", "OCO", "IFDOCO"],
+                                  parameters: List[dict],
+                                  minute_to_expire: int = None,
+                                  time_in_force: Literal["GTC", "IOC", "FOK"] = None) -> dict:
+        """
+        Places the first stage of a parent order; the later legs are placed as they are triggered.
+        Only LIMIT and MARKET legs are simulated, and the expiry and execution condition are ignored.
+        """
+        order_method = order_method.upper()
+        legs = [{key: value.upper() if key in ('condition_type', 'side') else value for key, value in leg.items()} for leg in parameters]
+        if order_method not in PARENT_ORDER_LEGS or len(legs) != PARENT_ORDER_LEGS[order_method]:
+            raise exceptions.LogicException(f"A {order_method} parent order with {len(legs)} legs is not supported.")
+        for leg in legs:
+            if leg.get('condition_type') not in ('LIMIT', 'MARKET'):
+                raise exceptions.LogicException(f"The simulated exchange does not support {leg.get('condition_type')} legs.")
+        self.tracer.stamp('order_request')
+        await self._rest_latency()
+        self._sequence += 1
+        parent = {
+            'parent_order_acceptance_id': f"JRP{self._sequence:012d}",
+            # IFD stages follow each other; the legs of one stage are linked as an OCO.
+            'stages': [legs[:1], legs[1:]] if order_method in ('IFD', 'IFDOCO') else [legs],
+            'stage': 0,
+            'orders': [],
+            'executed': False,
+        }
+        self._emit(self._place_stage(parent))
+        self.tracer.stamp('order_response')
+        return {'parent_order_acceptance_id': parent['parent_order_acceptance_id']}
+
+    async def cancel_order(self, order_id: str, symbol: str = None) -> dict:
+        """
+        Cancels a resting order; a CANCEL_FAILED event is emitted if it is no longer active.
+        """
+        await self._rest_latency()
+        order = self.engine.cancel(order_id)
+        if order is None:
+            existing = self.engine.get_order(order_id)
+            self._emit([{
+                'product_code': self.product_code,
+                'child_order_id': existing.child_order_id if existing else order_id,
+                'child_order_acceptance_id': existing.child_order_acceptance_id if existing else order_id,
+                'event_date': self._now(),
+                'event_type': 'CANCEL_FAILED',
+            }])
+        else:
+            self._emit([self._event('CANCEL', order, price=order.price, size=order.outstanding_size)])
+        return {}
+
+    async def cancel_all_orders(self, symbol: str) -> dict:
+        """
+        Cancels every resting order and emits their CANCEL events together.
+        """
+        await self._rest_latency()
+        events = [
+            self._event('CANCEL', order, price=order.price, size=order.outstanding_size)
+            for order in self.engine.get_orders('ACTIVE')
+            if self.engine.cancel(order.child_order_acceptance_id) is not None
+        ]
+        if events:
+            self._emit(events)
+        return {}
+
+    async def get_orders(self, symbol: str, order_state: str = None) -> list:
+        return [
+            {
+                'product_code': self.product_code,
+                'side': order.side,
+                'child_order_type': order.child_order_type,
+                'price': order.price,
+                'size': order.size,
+                'child_order_acceptance_id': order.child_order_acceptance_id,
+                'child_order_id': order.child_order_id,
+                'average_price': order.average_price,
+                'child_order_state': order.child_order_state,
+                'child_order_date': order.child_order_date,
+                'outstanding_size': order.outstanding_size,
+                'executed_size': order.executed_size,
+                'total_commission': order.total_commission,
+            }
+            for order in self.engine.get_orders(order_state)
+        ]
+
+    async def get_positions(self, symbol: str) -> list:
+        return [
+            {'product_code': self.product_code, 'side': side, 'price': lot.price, 'size': lot.size, 'open_date': lot.open_date}
+            for side in ('BUY', 'SELL')
+            for lot in self.account.lots(side)
+        ]
+
+    def on_board(self, board: dict) -> None:
+        """
+        Feed a board snapshot to the matching engine and emit the executions it produces.
+        :param board: A board snapshot with `mid_price`, `bids` and `asks`.
+        """
+        fills = self.engine.update_board(board)
+        if fills:
+            self._emit(self._settle(fills))
+
+    def _settle(self, fills: List[Fill]) -> List[dict]:
+        events = []
+        for fill in fills:
+            self._exec_id += 1
+            self.account.add(fill.order.side, fill.price, fill.size, self._now())
+            # The commission is charged in crypto currency units, as bitFlyer reports it; the collateral is in the legal currency.
+            self._commission += fill.commission * fill.price
+            events.append(self._event('EXECUTION', fill.order, exec_id=self._exec_id, price=fill.price, size=fill.size, commission=fill.commission, sfd=0.0))
+        return events + self._trigger(fills)
+
+    def _submit(self, side: str, size: float, price: float, order_type: str, parent: dict = None) -> tuple:
+        """
+        Submit an order to the matching engine.
+        :param parent: The parent order the order is a leg of, if any.
+        :return: The order and its events: ORDER, the executions of its marketable part, and CANCEL for the unfilled rest of a market order.
+        """
+        self._sequence += 1
+        order = SimulatedOrder(
+            child_order_acceptance_id=f"JRF{self._sequence:012d}",
+            child_order_id=f"JOR{self._sequence:012d}",
+            side=side.upper(),
+            child_order_type=order_type.upper(),
+            price=price if order_type.upper() == 'LIMIT' else 0.0,
+            size=size,
+            sequence=self._sequence,
+            child_order_date=self._now()
+        )
+        if parent is not None:
+            # Registered before it is matched, as an immediate execution may trigger the parent.
+            parent['orders'].append(order)
+            self._parents[order.child_order_acceptance_id] = parent
+        fills = self.engine.submit(order)
+        events = [self._event('ORDER', order, price=order.price, size=order.size, child_order_type=order.child_order_type, expire_date=self._now())]
+        events += self._settle(fills)
+        if order.child_order_state == 'CANCELED':
+            events.append(self._event('CANCEL', order, price=order.price, size=order.outstanding_size))
+        return order, events
+
+    def _place_stage(self, parent: dict) -> List[dict]:
+        """
+        Submit the legs of the current stage of a parent order.
+        """
+        stage = parent['stage']
+        events = []
+        for leg in parent['stages'][stage]:
+            if parent['stage'] != stage or parent['executed']:
+                # A leg executed as it was placed, which cancels the rest of its OCO.
+                break
+            events += self._submit(leg['side'], leg['size'], leg.get('price'), leg['condition_type'], parent)[1]
+        return events
+
+    def _trigger(self, fills: List[Fill]) -> List[dict]:
+        """
+        Advance the parent orders whose legs executed: cancel the other legs of their OCO, and place their
+        next stage once the leg is completed.
+        """
+        events = []
+        for fill in fills:
+            parent = self._parents.get(fill.order.child_order_acceptance_id)
+            if parent is None:
+                continue
+            if not parent['executed']:
+                parent['executed'] = True
+                for order in parent['orders']:
+                    if order is not fill.order:
+                        self._parents.pop(order.child_order_acceptance_id, None)
+                        if self.engine.cancel(order.child_order_acceptance_id) is not None:
+                            events.append(self._event('CANCEL', order, price=order.price, size=order.outstanding_size))
+            if fill.order.child_order_state == 'COMPLETED':
+                del self._parents[fill.order.child_order_acceptance_id]
+                if parent['stage'] + 1 < len(parent['stages']):
+                    parent['stage'] += 1
+                    parent['orders'] = []
+                    parent['executed'] = False
+                    events += self._place_stage(parent)
+        return events
+
+    def _collateral(self) -> float:
+        return self.initial_collateral + self.account.realized_pnl - self._commission
+
+    def _event(self, event_type: str, order: SimulatedOrder, **fields) -> dict:
+        return {
+            'product_code': self.product_code,
+            'child_order_id': order.child_order_id,
+            'child_order_acceptance_id': order.child_order_acceptance_id,
+            'event_date': self._now(),
+            'event_type': event_type,
+            'side': order.side,
+            **fields,
+        }
+
+    def _emit(self, events: List[dict]) -> None:
+        """
+        Deliver events to the child order event handlers after the configured latency.
+        """
+        delay = self.event_latency + (self._random.uniform(0.0, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay > 0.0:
+            self.clock.call_later(delay, self._start_delivery, events)
+        else:
+            self._start_delivery(events)
+
+    def _start_delivery(self, events: List[dict]) -> None:
+        # The loop only keeps weak references to tasks, so they are held until they are done.
+        task = asyncio.get_running_loop().create_task(self._deliver(events))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @inject
+    async def _deliver(self, events: List[dict], handler_dispatcher = Provide['handler_dispatcher']) -> None:
+        await handler_dispatcher.submit(events, 'child_order_events')
+
+    async def _rest_latency(self) -> None:
+        if self.rest_latency > 0.0:
+            await self.clock.sleep(self.rest_latency)
+
+    def _now(self) -> str:
+        return datetime.datetime.fromtimestamp(self.clock.time(), datetime.timezone.utc).isoformat()
+
+    @inject
+    def __init__(self,
+                 initial_collateral: float = 1_000_000.0,
+                 fee_rate: float = 0.0,
+                 rest_latency: float = 0.0,
+                 event_latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 seed: int = 0,
+                 tracer: Tracer = Provide['tracer'],
+                 clock: Clock = Provide['clock'],
+                 config: dict = Provide['config']):
+        """
+        Initialize the simulated exchange.
+        :param initial_collateral: The collateral the simulated account starts with, in the legal currency.
+        :param fee_rate: The commission charged as a fraction of the executed size.
+        :param rest_latency: The simulated REST round-trip time in seconds.
+        :param event_latency: The delay in seconds before order events are delivered.
+        :param latency_jitter: The maximum random delay in seconds added to each event delivery.
+        :param seed: The seed of the latency jitter.
+        :param tracer: The tracer that times order requests and correlates their acks.
+        :param clock: The clock the latencies and timestamps follow.
+        :param config: Configuration dictionary containing currency codes.
+        """
+        self.product_code = config.get('crypto_currency_code')
+        self.legal_currency_code = config.get('legal_currency_code')
+        self.initial_collateral = initial_collateral
+        self.rest_latency = rest_latency
+        self.event_latency = event_latency
+        self.latency_jitter = latency_jitter
+        self.tracer = tracer
+        self.clock = clock
+        self.engine = MatchingEngine(fee_rate=fee_rate)
+        self.account = NettingEngine()
+        self._random = random.Random(seed)
+        self._sequence = 0
+        self._exec_id = 0
+        self._commission = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        # The parent order of each live leg, by child_order_acceptance_id.
+        self._parents: Dict[str, dict] = {}
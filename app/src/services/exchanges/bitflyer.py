@@ -1,5 +1,6 @@
 import asyncio
 from dependency_injector.wiring import inject, Provide
+from services.metrics import InstrumentedLock
 from services.exchanges.exchange import Exchange, Health, State
 from services.exchange_clients.exchange_client import ExchangeClient
 
@@ -18,7 +19,7 @@ class Bitflyer(Exchange):
         This method can be extended to fetch and update exchange data from an external source.
         """
         async with self.lock:
-            boardstate = exchange_client.get_health(symbol=config.get('crypto_currency_code'))
+            boardstate = await exchange_client.get_health(symbol=config.get('crypto_currency_code'))
             health = boardstate.get('health', Health.NORMAL.value)
             state = boardstate.get('state', State.RUNNING.value)
 
@@ -34,4 +35,4 @@ class Bitflyer(Exchange):
             return self.__state
 
     def __init__(self):
-        self.lock = asyncio.Lock()
\ No newline at end of file
+        self.lock = InstrumentedLock('exchange')
\ No newline at end of file
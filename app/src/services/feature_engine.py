@@ -0,0 +1,329 @@
+from typing import Dict, List, Mapping, Sequence
+from collections import deque
+import math
+import numpy as np
+
+# The features computed when none are configured.
+DEFAULT_FEATURES: List[dict] = [
+    {'name': 'spread', 'input': 'spread'},
+    {'name': 'spread_ewma', 'input': 'spread', 'operator': 'ewma', 'span': 20},
+    {'name': 'imbalance', 'input': 'imbalance'},
+    {'name': 'imbalance_ewma', 'input': 'imbalance', 'operator': 'ewma', 'span': 10},
+    {'name': 'microprice_offset', 'input': 'microprice_offset'},
+    {'name': 'log_return', 'input': 'log_return'},
+    {'name': 'volatility', 'input': 'log_return', 'operator': 'std', 'window': 100},
+    {'name': 'rolling_vwap', 'input': 'mid_price', 'operator': 'vwap', 'weight': 'depth', 'window': 100},
+    {'name': 'rolling_high', 'input': 'mid_price', 'operator': 'max', 'window': 100},
+    {'name': 'rolling_low', 'input': 'mid_price', 'operator': 'min', 'window': 100},
+]
+
+class RollingWindow:
+    """
+    The sum and variance of the last `window` values, kept in a ring.
+    Each update adds the new value and subtracts the evicted one. The sums are kept relative to a shift
+    close to the mean, so price-level inputs do not lose precision when the variance is taken, and are
+    recomputed from the ring each time it wraps around, which bounds floating-point drift at O(1)
+    amortized cost.
+    """
+    __slots__ = ('window', 'count', '_shift', '_sum', '_sum_of_squares', '_ring', '_index')
+
+    def update(self, value: float) -> None:
+        if self._shift is None:
+            self._shift = value
+        if self.count == self.window:
+            evicted = self._ring[self._index] - self._shift
+            self._sum -= evicted
+            self._sum_of_squares -= evicted * evicted
+        else:
+            self.count += 1
+        self._ring[self._index] = value
+        deviation = value - self._shift
+        self._sum += deviation
+        self._sum_of_squares += deviation * deviation
+        self._index += 1
+        if self._index == self.window:
+            self._index = 0
+            self._shift = math.fsum(self._ring[:self.count]) / self.count
+            self._sum = math.fsum(item - self._shift for item in self._ring[:self.count])
+            self._sum_of_squares = math.fsum((item - self._shift) ** 2 for item in self._ring[:self.count])
+
+    @property
+    def sum(self) -> float:
+        return self._sum + self.count * self._shift if self.count else 0.0
+
+    @property
+    def mean(self) -> float:
+        return self._shift + self._sum / self.count if self.count else math.nan
+
+    @property
+    def variance(self) -> float:
+        """
+        The sample variance of the window.
+        """
+        if self.count < 2:
+            return math.nan
+        return max((self._sum_of_squares - self._sum * self._sum / self.count) / (self.count - 1), 0.0)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self._shift: float = None
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+        self._ring = [0.0] * window
+        self._index = 0
+
+class Ewma:
+    """
+    An exponentially weighted moving average with `alpha = 2 / (span + 1)`, seeded with the first value.
+    """
+    __slots__ = ('alpha', 'value')
+
+    def update(self, value: float) -> float:
+        if self.value is None or math.isnan(self.value):
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def __init__(self, span: float):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value: float = None
+
+class RollingExtremum:
+    """
+    The minimum or maximum of the last `window` values, kept with a monotonic deque.
+    The deque holds the candidates in order of arrival with their values strictly monotonic,
+    so each value is pushed and popped at most once and the extremum is always at the front.
+    """
+    __slots__ = ('window', 'maximum', '_candidates', '_count')
+
+    def update(self, value: float) -> float:
+        candidates = self._candidates
+        if self.maximum:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        candidates.append((self._count, value))
+        if candidates[0][0] <= self._count - self.window:
+            candidates.popleft()
+        self._count += 1
+        return candidates[0][1]
+
+    def __init__(self, window: int, maximum: bool):
+        self.window = window
+        self.maximum = maximum
+        self._candidates = deque()
+        self._count = 0
+
+class Feature:
+    """
+    A declared feature: an operator applied to one of the inputs derived from each snapshot.
+    Operators are 'value' (the input itself), 'ewma' (over `span` updates), 'sum', 'mean', 'std', 'min'
+    and 'max' (over the last `window` updates), and 'vwap' (the mean of the input weighted by `weight`
+    over the last `window` updates).
+    """
+    operators = ('value', 'ewma', 'sum', 'mean', 'std', 'min', 'max', 'vwap')
+
+    def update(self, inputs: Dict[str, float]) -> float:
+        """
+        Advance the operator with the inputs of one snapshot; a missing (NaN) input keeps the last value.
+        """
+        value = inputs[self.input]
+        if value != value:
+            return self._last
+        self._last = self._update(value, inputs)
+        return self._last
+
+    def _value(self, value: float, inputs: Dict[str, float]) -> float:
+        return value
+
+    def _stateful(self, value: float, inputs: Dict[str, float]) -> float:
+        return self._state.update(value)
+
+    def _sum(self, value: float, inputs: Dict[str, float]) -> float:
+        self._state.update(value)
+        return self._state.sum
+
+    def _mean(self, value: float, inputs: Dict[str, float]) -> float:
+        self._state.update(value)
+        return self._state.mean
+
+    def _std(self, value: float, inputs: Dict[str, float]) -> float:
+        self._state.update(value)
+        return self._state.std
+
+    def _vwap(self, value: float, inputs: Dict[str, float]) -> float:
+        weight = inputs[self.weight]
+        if weight != weight:
+            return self._last
+        self._state.update(value * weight)
+        self._weights.update(weight)
+        return self._state.sum / self._weights.sum if self._weights.sum > 0.0 else math.nan
+
+    def __init__(self,
+                 name: str,
+                 input: str,
+                 operator: str = 'value',
+                 window: int = 100,
+                 span: float = 20,
+                 weight: str = None):
+        """
+        :param name: The name of the feature.
+        :param input: The snapshot input the operator is applied to; see `FeatureEngine.inputs`.
+        :param operator: The operator; see `Feature.operators`.
+        :param window: The number of updates of the rolling operators.
+        :param span: The span of the 'ewma' operator.
+        :param weight: The input weighting the 'vwap' operator.
+        """
+        if input not in FeatureEngine.inputs:
+            raise ValueError(f"Unknown feature input {input}; expected one of {FeatureEngine.inputs}.")
+        if operator not in self.operators:
+            raise ValueError(f"Unknown feature operator {operator}; expected one of {self.operators}.")
+        if operator == 'vwap' and weight not in FeatureEngine.inputs:
+            raise ValueError(f"The vwap feature {name} needs a weight input.")
+        self.name = name
+        self.input = input
+        self.operator = operator
+        self.window = window if operator in ('sum', 'mean', 'std', 'min', 'max', 'vwap') else 1
+        self.weight = weight
+        self._last = math.nan
+        self._state = None
+        self._weights = None
+        # The operator is resolved once, so an update is a single method call.
+        self._update = {
+            'value': self._value, 'ewma': self._stateful, 'min': self._stateful, 'max': self._stateful,
+            'sum': self._sum, 'mean': self._mean, 'std': self._std, 'vwap': self._vwap,
+        }[operator]
+        if operator == 'ewma':
+            self._state = Ewma(span)
+        elif operator in ('min', 'max'):
+            self._state = RollingExtremum(window, maximum=operator == 'max')
+        elif operator != 'value':
+            self._state = RollingWindow(window)
+            if operator == 'vwap':
+                self._weights = RollingWindow(window)
+
+class FeatureEngine:
+    """
+    Computes the declared features incrementally, once per board snapshot, for every agent.
+    Each update derives the inputs (mid price, spread, order book imbalance and depth over the top
+    `depth` levels, microprice and log return) from the newest row of the `BoardDataBuffer`, and
+    advances each feature's operator in O(1). The current values are written into one preallocated
+    NumPy vector, so agents read features instead of recomputing them over the whole window.
+    """
+    inputs = ('mid_price', 'best_bid', 'best_ask', 'spread', 'imbalance', 'depth', 'microprice', 'microprice_offset', 'log_return')
+    depth: int
+    features: List[Feature]
+    names: tuple
+    sequence: int = 0
+
+    def update(self, row: Mapping[str, float | np.ndarray]) -> np.ndarray:
+        """
+        Advance every feature with one snapshot.
+        :param row: One row of the `BoardDataBuffer` columns: scalar `mid_price`, `best_bid` and `best_ask`,
+                    and `bid_sizes` and `ask_sizes` arrays ordered from the best level.
+        :return: The feature vector, updated in place.
+        """
+        inputs = self._inputs
+        mid_price = float(row['mid_price'])
+        best_bid = float(row['best_bid'])
+        best_ask = float(row['best_ask'])
+        bid_sizes = row['bid_sizes']
+        ask_sizes = row['ask_sizes']
+        # Summing a few levels as Python floats is faster than a NumPy reduction.
+        bid_depth = math.fsum(bid_sizes[:self.depth].tolist())
+        ask_depth = math.fsum(ask_sizes[:self.depth].tolist())
+        bid_size = float(bid_sizes[0])
+        ask_size = float(ask_sizes[0])
+
+        inputs['mid_price'] = mid_price
+        inputs['best_bid'] = best_bid
+        inputs['best_ask'] = best_ask
+        inputs['spread'] = best_ask - best_bid
+        inputs['depth'] = bid_depth + ask_depth
+        inputs['imbalance'] = (bid_depth - ask_depth) / (bid_depth + ask_depth) if bid_depth + ask_depth > 0.0 else math.nan
+        microprice = (best_bid * ask_size + best_ask * bid_size) / (bid_size + ask_size) if bid_size + ask_size > 0.0 else math.nan
+        inputs['microprice'] = microprice
+        inputs['microprice_offset'] = microprice - mid_price
+        inputs['log_return'] = math.log(mid_price / self._previous_mid_price) if self._previous_mid_price and mid_price > 0.0 else math.nan
+        if mid_price > 0.0:
+            self._previous_mid_price = mid_price
+
+        self.vector[:] = [feature.update(inputs) for feature in self.features]
+        self.sequence += 1
+        return self.vector
+
+    def get_vector(self, copy: bool = True) -> np.ndarray:
+        """
+        Returns the current feature vector, in the order of `names`.
+        :param copy: When False, the preallocated vector itself is returned, which the next update overwrites.
+        """
+        return self.vector.copy() if copy else self.vector
+
+    def get_features(self) -> Dict[str, float]:
+        """
+        Returns the current features by name.
+        """
+        return dict(zip(self.names, self.vector.tolist()))
+
+    def state_dict(self) -> dict:
+        """
+        Returns the state of every feature's operator, to be restored with `load_state_dict`.
+        The operators' states are returned as they are, so the result must be serialized before the next update.
+        """
+        return {
+            'names': self.names,
+            'depth': self.depth,
+            'sequence': self.sequence,
+            'previous_mid_price': self._previous_mid_price,
+            'vector': self.vector.copy(),
+            'features': [(feature._last, feature._state, feature._weights) for feature in self.features],
+        }
+
+    def load_state_dict(self, state: dict) -> None:
+        """
+        Restore the state returned by `state_dict`; the features must be declared as they were.
+        """
+        if (tuple(state['names']), state['depth']) != (self.names, self.depth):
+            raise ValueError(f"The state holds the features {state['names']} of depth {state['depth']}, "
+                             f"the engine {self.names} of depth {self.depth}.")
+        for feature, (last, operator_state, weights) in zip(self.features, state['features']):
+            feature._last, feature._state, feature._weights = last, operator_state, weights
+        self.sequence = state['sequence']
+        self._previous_mid_price = state['previous_mid_price']
+        self.vector[:] = state['vector']
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether every rolling feature has seen a full window.
+        """
+        return self.sequence >= self.warmup
+
+    def __len__(self):
+        return len(self.features)
+
+    def __init__(self, features: Sequence[dict] = None, depth: int = 5):
+        """
+        Initialize the feature engine.
+        :param features: The feature declarations, each the keyword arguments of a `Feature`.
+                         Defaults to `DEFAULT_FEATURES`.
+        :param depth: The number of levels per side summed into the imbalance and depth inputs.
+        """
+        self.depth = depth
+        self.features = [Feature(**declaration) for declaration in (features or DEFAULT_FEATURES)]
+        self.names = tuple(feature.name for feature in self.features)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Feature names must be unique: {self.names}.")
+        # The log return needs one snapshot before the first value.
+        self.warmup = max((feature.window for feature in self.features), default=1) + 1
+        self.vector = np.full(len(self.features), np.nan)
+        self._inputs: Dict[str, float] = dict.fromkeys(self.inputs, math.nan)
+        self._previous_mid_price: float = None
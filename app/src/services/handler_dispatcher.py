@@ -1,7 +1,12 @@
-from typing import List
+from typing import Dict, List, Tuple
 import dataclasses
+import time
 import asyncio
 import exceptions
+from services.logger import Logger
+from services.channel_queue import ChannelQueue
+from services.metrics import HistogramValue, MetricsRegistry
+from services.tracer import Trace, current_trace
 from message_handlers.message_handler import MessageHandler
 
 @dataclasses.dataclass
@@ -9,19 +14,142 @@ class HandlerDispatcher:
     """
     HandlerDispatcher is responsible for dispatching messages to the appropriate handlers.
     It checks the channel of the incoming message and calls the corresponding handler's method.
+    The channel to handler routing table is built once, when the dispatcher is created.
+    Messages submitted by the stream are placed on a per-channel queue and processed by one worker per channel,
+    so a slow handler never blocks the socket reader or the handlers of other channels. Only lossless ('fifo')
+    channels make the reader wait when their queue is full; when a message of a 'drop' channel does not fit,
+    the channel's handlers are reset, as after a reconnection, so that they resynchronize.
+    When `inline`, as when replaying, submitted messages are dispatched at once by the submitter instead,
+    so that every message is handled, in an order that does not depend on how the workers are scheduled.
     """
     handlers: List[MessageHandler]
+    queue_size: int = 1000
+    inline: bool = False
+    logger: Logger = None
+    metrics: MetricsRegistry = None
+    routes: Dict[str, Tuple[MessageHandler, ...]] = dataclasses.field(init=False, repr=False)
+    queues: Dict[str, ChannelQueue] = dataclasses.field(init=False, repr=False)
+    timers: Dict[MessageHandler, HistogramValue] = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        """
+        Build the channel to handler routing table.
+        """
+        routes = {}
+        for handler in self.handlers:
+            if not hasattr(handler, 'handle_message'):
+                raise exceptions.LogicException(f"Handler {handler.__class__.__name__} does not implement handle_message method.")
+            for channel in handler.channel_names:
+                routes.setdefault(channel, []).append(handler)
+        self.routes = {channel: tuple(handlers) for channel, handlers in routes.items()}
+        # A channel takes the strictest policy of the handlers routed from it: it is lossless if any handler
+        # needs every message, and conflated only if every handler accepts losing superseded messages.
+        self.queues = {}
+        for channel, handlers in self.routes.items():
+            policies = {handler.queue_policy for handler in handlers}
+            policy = 'fifo' if 'fifo' in policies else 'drop' if 'drop' in policies else 'conflate'
+            self.queues[channel] = ChannelQueue(channel, policy=policy, maxsize=self.queue_size)
+        self.timers = {}
+        if self.metrics is not None:
+            duration = self.metrics.histogram('handler_duration_seconds', 'The time spent in each message handler.', ['handler'])
+            self.timers = {handler: duration.labels(handler.__class__.__name__) for handler in self.handlers}
+            depth = self.metrics.gauge('channel_queue_depth', 'The messages waiting in each channel queue.', ['channel'])
+            high_water_mark = self.metrics.gauge('channel_queue_high_water_mark', 'The deepest each channel queue has been.', ['channel'])
+            dropped = self.metrics.counter('channel_queue_dropped_total', 'The messages superseded in conflating channel queues, or dropped from full ones.', ['channel'])
+            for channel, queue in self.queues.items():
+                depth.labels(channel).set_function(queue.__len__)
+                high_water_mark.labels(channel).set_function(lambda queue=queue: queue.high_water_mark)
+                dropped.labels(channel).set_function(lambda queue=queue: queue.dropped_count)
+
+    async def submit(self, data: list|dict, channel: str, trace: Trace = None) -> None:
+        """
+        Enqueue the message for the channel's worker.
+        This only waits when a lossless channel's queue is full.
+        :param trace: The trace of the message, which becomes the current trace while it is handled.
+        """
+        queue = self.queues.get(channel)
+        if queue is None:
+            return
+        if self.inline:
+            if trace is not None:
+                trace.stamp('dispatch')
+            await self._dispatch_logged(data, channel)
+            return
+        overflowing = queue.overflowing
+        if not await queue.put((data, trace)):
+            if not overflowing:
+                self.logger.system.warning("The %s queue is full; dropping messages and resetting its handlers.", channel)
+            for handler in self.routes[channel]:
+                handler.reset()
+
+    async def run(self) -> None:
+        """
+        Start one worker per channel that dispatches the queued messages; there are none when `inline`.
+        """
+        if self.inline:
+            return
+        await asyncio.gather(*(self._work(queue) for queue in self.queues.values()))
+
+    def get_queue_stats(self) -> Dict[str, dict]:
+        """
+        Returns the metrics of every channel queue.
+        :return: A dictionary mapping each channel to its queue metrics.
+        """
+        return {channel: queue.get_stats() for channel, queue in self.queues.items()}
+
+    async def _work(self, queue: ChannelQueue) -> None:
+        """
+        Dispatch the messages of one channel in order. A failing message is logged and does not stop the worker.
+        """
+        while True:
+            data, trace = await queue.get()
+            current_trace.set(trace)
+            if trace is not None:
+                trace.stamp('dispatch')
+            await self._dispatch_logged(data, queue.channel)
+
+    async def _dispatch_logged(self, data: list|dict, channel: str) -> None:
+        """
+        Dispatch a message, logging rather than raising a failure.
+        """
+        try:
+            await self.dispatch(data, channel)
+        except exceptions.BaseException:
+            # Custom exceptions are logged when they are raised.
+            pass
+        except Exception as e:
+            self.logger.system.exception("Handling a message from %s failed: %s", channel, e)
 
     async def dispatch(self, data: list|dict, channel: str) -> None:
         """
         Dispatch the message to the appropriate handler based on the channel.
+        A single matching handler is awaited directly; several are run concurrently.
+        """
+        handlers = self.routes.get(channel)
+        if not handlers:
+            return
+        if len(handlers) == 1:
+            await self._handle(handlers[0], data, channel)
+        else:
+            await asyncio.gather(*(self._handle(handler, data, channel) for handler in handlers))
+
+    async def _handle(self, handler: MessageHandler, data: list|dict, channel: str) -> None:
+        """
+        Call a handler, timing it if metrics are enabled.
+        """
+        timer = self.timers.get(handler)
+        if timer is None:
+            await handler.handle_message(data, channel)
+            return
+        started_at = time.perf_counter_ns()
+        try:
+            await handler.handle_message(data, channel)
+        finally:
+            timer.observe((time.perf_counter_ns() - started_at) / 1e9)
+
+    def reset(self) -> None:
+        """
+        Reset the handlers' stream-derived state, e.g. when the stream (re)connects.
         """
-        tasks = []
         for handler in self.handlers:
-            if hasattr(handler, 'handle_message'):
-                if channel in handler.channel_names:
-                    tasks.append(handler.handle_message(data, channel))
-            else:
-                raise exceptions.LogicException(f"Handler {handler.__class__.__name__} does not implement handle_message method.")
-        if tasks:
-            await asyncio.gather(*tasks)
\ No newline at end of file
+            handler.reset()
\ No newline at end of file
@@ -0,0 +1,287 @@
+from typing import Any, Literal
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.data_buffer import DataBuffer
+from services.feature_engine import FeatureEngine
+from services.normalizer import Normalizer
+from services.tracer import Trace, current_trace
+from services.startup_report import StartupReport
+from agents.agent import Agent
+
+_worker_agent: Agent = None
+
+def _initialize_worker(torch_threads: int, agent: Agent = None) -> None:
+    """
+    Pin the intra-op thread count of torch in the worker and, in a worker process, keep the agent.
+    """
+    global _worker_agent
+    _worker_agent = agent
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+def _infer(agent: Agent, data: Any) -> tuple:
+    """
+    Run feature extraction and action selection.
+    :return: The action, and the `time.monotonic_ns()` at which inference started, the features were
+             extracted and the action was selected. The monotonic clock is shared by the worker processes.
+    """
+    started_at = time.monotonic_ns()
+    features = agent.extract_features(data)
+    extracted_at = time.monotonic_ns()
+    action = agent.get_action(features)
+    return action, started_at, extracted_at, time.monotonic_ns()
+
+def _infer_in_process(data: Any) -> tuple:
+    return _infer(_worker_agent, data)
+
+def _warm_up(agent: Agent) -> int:
+    """
+    Prepare the agent for its first decision in the worker that runs inference.
+    :return: The number of nanoseconds it took.
+    """
+    started_at = time.monotonic_ns()
+    agent.warmup()
+    return time.monotonic_ns() - started_at
+
+def _warm_up_in_process() -> int:
+    return _warm_up(_worker_agent)
+
+def _swap_model_in_process(model_path: str) -> None:
+    _worker_agent.swap_model(model_path)
+
+class InferenceExecutor:
+    """
+    Runs agent inference off the event loop.
+    In 'thread' mode inference runs on a dedicated worker thread, and in 'process' mode in a dedicated
+    worker process holding its own copy of the agent (which must then be picklable). 'inline' keeps the
+    previous behaviour of running on the event loop. Each run records the buffer sequence it was based on;
+    if newer snapshots arrived meanwhile the result is stale and is not acted on, and inference runs again
+    on the latest window: with the 'drop' `stale_policy` only if a decision was requested during the run,
+    with 'rerun' always. Inference slower than the snapshot interval may then never produce a fresh result;
+    only if `max_stale_runs` is set is the result of that many stale runs in a row acted on regardless,
+    which is counted and logged as forced rather than stale. Windows of the array buffer are passed to the agent with
+    the current vector of the `FeatureEngine` under 'raw_features', and its causally normalized
+    counterpart from the `Normalizer` under 'features'. The agent is warmed up in the worker as soon as
+    the executor starts; the worker runs one task at a time, so the first decision waits for it instead
+    of paying for model loading and first-run costs on a live tick. While `held`, e.g. until the books are
+    reconciled with the exchange at startup, requests are ignored.
+    """
+    mode: Literal['inline', 'thread', 'process']
+    stale_policy: Literal['drop', 'rerun']
+    max_stale_runs: int | None
+    requested_count: int = 0
+    executed_count: int = 0
+    stale_count: int = 0
+    forced_count: int = 0
+    held_count: int = 0
+    held: bool = False
+
+    def request(self, data_buffer: DataBuffer) -> None:
+        """
+        Request a decision on the current buffer window without waiting for it.
+        If an inference is already running, the request is absorbed by it; the running inference
+        will notice the newer sequence when it completes and run again on the latest window.
+        :param data_buffer: The buffer holding the window to decide on.
+        """
+        if self.held:
+            self.held_count += 1
+            return
+        self.requested_count += 1
+        # The newest request's trace is followed, as the running inference will be judged against it.
+        self._trace = current_trace.get()
+        if self.mode == 'inline':
+            action, started_at, extracted_at, selected_at = _infer(self.agent, self._get_window(data_buffer))
+            self.latencies.append(selected_at - started_at)
+            self.executed_count += 1
+            self._act(action, extracted_at, selected_at)
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(data_buffer))
+        else:
+            self._pending = True
+
+    async def swap_model(self, model_path: str) -> None:
+        """
+        Replace the agent's model without blocking the event loop.
+        The swap runs in the worker, between two decisions, so no decision ever sees a half-loaded model.
+        :param model_path: The path of the checkpoint.
+        """
+        started_at = time.monotonic_ns()
+        if self.mode == 'process':
+            await asyncio.get_running_loop().run_in_executor(self._executor, _swap_model_in_process, model_path)
+        elif self.mode == 'thread':
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.agent.swap_model, model_path)
+        else:
+            self.agent.swap_model(model_path)
+        self.logger.system.info("Swapped the agent's model for %s in %.1f ms.", model_path, (time.monotonic_ns() - started_at) / 1e6)
+
+    def hold(self) -> None:
+        """
+        Ignore requests until `release` is called.
+        """
+        self.held = True
+
+    def release(self) -> None:
+        self.held = False
+
+    def get_stats(self) -> dict:
+        """
+        Returns the inference counters and latency percentiles in microseconds.
+        :return: A dictionary with request, execution, stale and forced counts, and latency and queue wait statistics.
+        """
+        return {
+            'requested': self.requested_count,
+            'executed': self.executed_count,
+            'stale': self.stale_count,
+            'forced': self.forced_count,
+            'held': self.held_count,
+            'latency_us': self._percentiles(self.latencies),
+            'queue_wait_us': self._percentiles(self.queue_waits),
+        }
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, data_buffer: DataBuffer) -> None:
+        """
+        Run inference in the worker until a result is acted on, or a stale one is dropped with no request pending.
+        """
+        loop = asyncio.get_running_loop()
+        stale_runs = 0
+        try:
+            while True:
+                self._pending = False
+                sequence = data_buffer.sequence
+                current_trace.set(self._trace)
+                # The window is copied because the ring buffer keeps being written while the worker reads it.
+                data = self._get_window(data_buffer, copy=True)
+                submitted_at = time.monotonic_ns()
+                if self.mode == 'process':
+                    future = loop.run_in_executor(self._executor, _infer_in_process, data)
+                else:
+                    future = loop.run_in_executor(self._executor, _infer, self.agent, data)
+                action, started_at, extracted_at, selected_at = await future
+                self.queue_waits.append(started_at - submitted_at)
+                self.latencies.append(selected_at - started_at)
+                self.executed_count += 1
+
+                if data_buffer.sequence != sequence:
+                    stale_runs += 1
+                    if self.max_stale_runs is None or stale_runs < self.max_stale_runs:
+                        self.stale_count += 1
+                        if self._pending or self.stale_policy == 'rerun':
+                            continue
+                        return
+                    self.forced_count += 1
+                    self.logger.system.warning("Acting on a result %d snapshots old after %d stale runs in a row.",
+                                               data_buffer.sequence - sequence, stale_runs)
+                self._act(action, extracted_at, selected_at)
+                return
+        except Exception as e:
+            self.logger.system.exception("Inference failed: %s", e)
+
+    def _get_window(self, data_buffer: DataBuffer, copy: bool = False) -> Any:
+        """
+        Read the buffer window, adding the feature vectors to windows of the array buffer.
+        """
+        data = data_buffer.get_data(copy=copy)
+        if isinstance(data, dict):
+            # The vectors are tiny and are overwritten by the next snapshot, so they are always copied.
+            data['raw_features'] = self.feature_engine.get_vector()
+            data['features'] = self.normalizer.transform(data['raw_features'])
+        return data
+
+    def _act(self, action: Any, extracted_at: int, selected_at: int) -> None:
+        """
+        Execute the action, stamping the inference stages on the current trace.
+        """
+        trace = current_trace.get()
+        if trace is not None:
+            trace.stamp('extract_features', extracted_at)
+            trace.stamp('get_action', selected_at)
+        self.agent.action(action)
+        self.startup_report.milestone('first_decision')
+        if trace is not None:
+            trace.stamp('action')
+
+    def _log_warmup(self, future: Future) -> None:
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.logger.system.error("Warming up the agent failed: %s", future.exception())
+        else:
+            self.logger.system.info("Agent warmed up in %.1f ms.", future.result() / 1e6)
+
+    def _percentiles(self, samples: deque) -> dict:
+        if not samples:
+            return {}
+        ordered = sorted(samples)
+        return {
+            'p50': ordered[len(ordered) // 2] / 1000,
+            'p99': ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)] / 1000,
+            'max': ordered[-1] / 1000,
+        }
+
+    @inject
+    def __init__(self,
+                 mode: Literal['inline', 'thread', 'process'] = 'thread',
+                 torch_threads: int = 1,
+                 stale_policy: Literal['drop', 'rerun'] = 'drop',
+                 max_stale_runs: int = None,
+                 sample_size: int = 1000,
+                 agent: Agent = Provide['agent'],
+                 feature_engine: FeatureEngine = Provide['feature_engine'],
+                 normalizer: Normalizer = Provide['normalizer'],
+                 startup_report: StartupReport = Provide['startup_report'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the inference executor.
+        :param mode: Where inference runs: 'inline', 'thread' or 'process'.
+        :param torch_threads: The intra-op thread count pinned in the worker; 0 leaves torch's default.
+        :param stale_policy: 'drop' to discard stale results, running again only if a decision was requested meanwhile,
+                             or 'rerun' to always recompute on the latest window.
+        :param max_stale_runs: The number of stale runs in a row after which the result is acted on regardless,
+                               or None to never act on a stale result.
+        :param sample_size: The number of recent latency samples kept for the statistics.
+        :param agent: The agent that selects actions.
+        :param feature_engine: The feature engine whose vector is passed along with each window.
+        :param normalizer: The normalizer that normalizes the feature vector of each window.
+        :param startup_report: The startup report recording the first decision.
+        :param logger: The logger service.
+        """
+        self.mode = mode
+        self.stale_policy = stale_policy
+        self.max_stale_runs = max_stale_runs
+        self.agent = agent
+        self.feature_engine = feature_engine
+        self.normalizer = normalizer
+        self.startup_report = startup_report
+        self.logger = logger
+        self.latencies = deque(maxlen=sample_size)
+        self.queue_waits = deque(maxlen=sample_size)
+        self._task: asyncio.Task = None
+        self._pending = False
+        self._trace: Trace = None
+        self._executor: Executor = None
+        if mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference', initializer=_initialize_worker, initargs=(torch_threads,))
+        elif mode == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=1, initializer=_initialize_worker, initargs=(torch_threads, agent))
+
+        if self._executor is None:
+            self.logger.system.info("Agent warmed up in %.1f ms.", _warm_up(agent) / 1e6)
+        else:
+            warmup = self._executor.submit(_warm_up_in_process) if mode == 'process' else self._executor.submit(_warm_up, agent)
+            warmup.add_done_callback(self._log_warmup)
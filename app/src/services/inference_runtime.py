@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, Literal, Sequence
+import time
+import numpy as np
+
+def build_q_network(layer_sizes: Sequence[int]) -> Any:
+    """
+    A multilayer perceptron with ReLU activations between its linear layers.
+    :param layer_sizes: The input size, the hidden sizes and the number of actions.
+    :return: A `torch.nn.Sequential`.
+    """
+    import torch
+    layers: List[Any] = []
+    for index, (in_features, out_features) in enumerate(zip(layer_sizes[:-1], layer_sizes[1:])):
+        if index:
+            layers.append(torch.nn.ReLU())
+        layers.append(torch.nn.Linear(in_features, out_features))
+    return torch.nn.Sequential(*layers)
+
+def _q_network_from_state_dict(state: Dict[str, Any]) -> Any:
+    """
+    Rebuild the perceptron of a state dict whose 2-D weights are those of its linear layers, in order.
+    The perceptron is built on the meta device and the tensors of the state dict are assigned to it rather
+    than copied, so memory-mapped weights stay backed by the checkpoint file.
+    """
+    import torch
+    weights = [name for name, tensor in state.items() if name.endswith('weight') and tensor.dim() == 2]
+    if not weights:
+        raise ValueError("The checkpoint holds no linear layer weights.")
+    with torch.device('meta'):
+        module = build_q_network([state[weights[0]].shape[1]] + [state[name].shape[0] for name in weights])
+    linear_layers = [name for name, layer in module.named_children() if hasattr(layer, 'weight')]
+    renamed = {}
+    for name, layer in zip(weights, linear_layers):
+        renamed[f'{layer}.weight'] = state[name]
+        bias = name[:-len('weight')] + 'bias'
+        if bias in state:
+            renamed[f'{layer}.bias'] = state[bias]
+    module.load_state_dict(renamed, assign=True)
+    return module
+
+class InferenceRuntime:
+    """
+    Runs a Q-network on CPU at the lowest and steadiest per-call latency.
+    The network is prepared once for the backend: 'eager' runs the module as is, 'torchscript' traces it,
+    freezes the weights into the graph and applies `optimize_for_inference` (operator fusion and
+    prepacked weights), and 'quantized' additionally quantizes the linear layers to int8 dynamically
+    before tracing. Every call copies the features into a preallocated input tensor, runs under
+    `inference_mode` and writes the Q-values into a preallocated array, so nothing is allocated per tick
+    beyond the network's own intermediates. `warmup` runs the network on zeros so that the first live call
+    does not pay for the graph optimization passes of the TorchScript executor or for first-touch
+    allocations. torch is imported on `load` only, and the prepared network is not pickled, so the
+    runtime can be sent to an inference worker process and loaded there.
+    """
+    backends = ('eager', 'torchscript', 'quantized')
+    model_path: str
+    backend: Literal['eager', 'torchscript', 'quantized']
+    input_size: int
+    threads: int
+    warmup_iterations: int
+    module: Any = None
+
+    def __call__(self, features: np.ndarray) -> np.ndarray:
+        """
+        Run the network on one feature vector.
+        :param features: The input vector.
+        :return: The Q-values, written into the preallocated `output`, which the next call overwrites.
+        """
+        if self.module is None:
+            self.load()
+        self.input[0] = features
+        with self._torch.inference_mode():
+            q_values = self.module(self._input)
+        self.output[:] = q_values.numpy()[0]
+        return self.output
+
+    def load(self) -> None:
+        """
+        Load the network, prepare it for the backend and allocate the input and output buffers.
+        A checkpoint is either a TorchScript archive, e.g. written by `export`, which is run as is, or a
+        state dict of a perceptron, which is rebuilt with `build_q_network` and prepared for the backend.
+        """
+        import torch
+        self._torch = torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        module = self._model
+        if module is None:
+            if not self.model_path:
+                raise ValueError("Either a model or a model path is needed.")
+            try:
+                module = torch.jit.load(self.model_path, map_location='cpu')
+            except RuntimeError:
+                # Memory-mapped and assigned to the module, the weights are paged in from the page cache rather than read and copied.
+                module = _q_network_from_state_dict(torch.load(self.model_path, map_location='cpu', weights_only=True, mmap=True))
+        module.eval()
+
+        input_size = self.input_size
+        if input_size is None:
+            weight = next((parameter for parameter in module.parameters() if parameter.dim() == 2), None)
+            if weight is None:
+                raise ValueError("The input size of the network cannot be inferred; set `input_size`.")
+            input_size = weight.shape[1]
+        self._input = torch.zeros((1, input_size))
+        # The array shares the tensor's memory, so features are copied into the tensor without torch overhead.
+        self.input = self._input.numpy()
+
+        if not isinstance(module, torch.jit.ScriptModule) and self.backend != 'eager':
+            if self.backend == 'quantized':
+                module = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+            with torch.inference_mode():
+                module = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(module, self._input)))
+        with torch.inference_mode():
+            self.output = np.empty(module(self._input).shape[-1], dtype=np.float32)
+        self.module = module
+
+    def warmup(self, iterations: int = None) -> float:
+        """
+        Run the network on zeros, loading it first if needed.
+        :param iterations: The number of runs; defaults to `warmup_iterations`.
+        :return: The number of seconds it took, including loading.
+        """
+        started_at = time.perf_counter()
+        if self.module is None:
+            self.load()
+        for _ in range(self.warmup_iterations if iterations is None else iterations):
+            self(np.zeros(len(self.input[0]), dtype=np.float32))
+        return time.perf_counter() - started_at
+
+    def export(self, path: str) -> None:
+        """
+        Save the prepared network as a TorchScript archive, which later loads without rebuilding or re-optimizing it.
+        """
+        if self.module is None:
+            self.load()
+        if not isinstance(self.module, self._torch.jit.ScriptModule):
+            raise ValueError("Only the 'torchscript' and 'quantized' backends can be exported.")
+        self._torch.jit.save(self.module, path)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for name in ('module', '_model', '_torch', '_input', 'input', 'output'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._model = None
+
+    def __init__(self,
+                 model_path: str = None,
+                 backend: Literal['eager', 'torchscript', 'quantized'] = 'torchscript',
+                 model: Any = None,
+                 input_size: int = None,
+                 threads: int = None,
+                 warmup_iterations: int = 10):
+        """
+        Initialize the inference runtime; the network is loaded on `load`, `warmup` or the first call.
+        :param model_path: The checkpoint: a TorchScript archive or a state dict of a perceptron.
+        :param backend: 'eager', 'torchscript' or 'quantized'.
+        :param model: A `torch.nn.Module` to run instead of a checkpoint; it is not sent to worker processes.
+        :param input_size: The number of features; inferred from the first linear layer when None.
+        :param threads: The intra-op thread count to set on load; None leaves it, e.g. to the `InferenceExecutor`'s setting.
+        :param warmup_iterations: The number of runs of `warmup`.
+        """
+        if backend not in self.backends:
+            raise ValueError(f"Unknown inference backend {backend}; expected one of {self.backends}.")
+        self.model_path = model_path
+        self.backend = backend
+        self.input_size = input_size
+        self.threads = threads
+        self.warmup_iterations = warmup_iterations
+        self._model = model
+        self._torch = None
+        self.input: np.ndarray = None
+        self.output: np.ndarray = None
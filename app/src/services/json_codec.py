@@ -0,0 +1,35 @@
+from typing import Callable
+import json
+
+def _stdlib_loads() -> Callable:
+    return json.loads
+
+def _orjson_loads() -> Callable:
+    import orjson
+    return orjson.loads
+
+def _msgspec_loads() -> Callable:
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+DECODERS = {
+    'orjson': _orjson_loads,
+    'msgspec': _msgspec_loads,
+    'json': _stdlib_loads,
+}
+
+def get_loads(name: str = 'auto') -> Callable:
+    """
+    Returns a JSON decoding function accepting `str` or `bytes`.
+    With 'auto', the fastest installed decoder is picked, in the order orjson, msgspec, then the standard library.
+    :param name: 'auto', or one of 'orjson', 'msgspec' and 'json'.
+    :return: The decoding function.
+    """
+    if name and name != 'auto':
+        return DECODERS[name]()
+    for factory in DECODERS.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _stdlib_loads()
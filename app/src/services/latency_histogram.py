@@ -0,0 +1,107 @@
+from array import array
+
+class LatencyHistogram:
+    """
+    An HDR-style histogram of latencies in nanoseconds.
+    Values below `2 * sub_buckets` are counted exactly; above that, every power of two is split into
+    `sub_buckets` linear buckets, so any recorded value is reported within 1 / `sub_buckets` of its true
+    value. The counts live in one preallocated array, so recording only increments a slot.
+    """
+    # 32 sub-buckets per power of two bound the relative error to about 3%.
+    sub_bucket_bits: int = 5
+    # The largest tracked value is about 2^40 ns (18 minutes); larger values land in the last bucket.
+    max_bits: int = 40
+    count: int = 0
+    total: int = 0
+    min: int = None
+    max: int = 0
+
+    def record(self, value: int) -> None:
+        """
+        Record one latency.
+        :param value: The latency in nanoseconds.
+        """
+        if value < 0:
+            value = 0
+        if value < self._linear_limit:
+            index = value
+        else:
+            shift = value.bit_length() - self.sub_bucket_bits - 1
+            index = self._linear_limit + ((shift - 1) << self.sub_bucket_bits) + (value >> shift) - self._sub_buckets
+            if index >= self._size:
+                index = self._size - 1
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percentile: float) -> int:
+        """
+        The value at a percentile, in nanoseconds.
+        :param percentile: The percentile, between 0 and 100.
+        """
+        if not self.count:
+            return 0
+        target = max(int(self.count * percentile / 100 + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._value_at(index), self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        """
+        Add the counts of another histogram with the same layout.
+        """
+        for index, count in enumerate(other._counts):
+            if count:
+                self._counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        for index in range(self._size):
+            self._counts[index] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def snapshot(self) -> dict:
+        """
+        Summarize the histogram in microseconds.
+        :return: A dictionary with the count, min, mean, p50, p90, p99, p99.9 and max.
+        """
+        return {
+            'count': self.count,
+            'min': (self.min or 0) / 1000,
+            'mean': self.total / self.count / 1000 if self.count else 0.0,
+            'p50': self.percentile(50) / 1000,
+            'p90': self.percentile(90) / 1000,
+            'p99': self.percentile(99) / 1000,
+            'p999': self.percentile(99.9) / 1000,
+            'max': self.max / 1000,
+        }
+
+    def _value_at(self, index: int) -> int:
+        """
+        The midpoint of a bucket.
+        """
+        if index < self._linear_limit:
+            return index
+        shift = ((index - self._linear_limit) >> self.sub_bucket_bits) + 1
+        mantissa = ((index - self._linear_limit) & (self._sub_buckets - 1)) + self._sub_buckets
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def __init__(self):
+        self._sub_buckets = 1 << self.sub_bucket_bits
+        self._linear_limit = 2 * self._sub_buckets
+        self._size = self._linear_limit + (self.max_bits - self.sub_bucket_bits) * self._sub_buckets
+        self._counts = array('q', bytes(8 * self._size))
@@ -0,0 +1,241 @@
+from typing import List, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.recorder import Recorder
+from services.exchange_clients.exchange_client import ExchangeClient
+
+class PriceLadder:
+    """
+    One side of a limit order book, kept as parallel price/size arrays sorted by ascending price.
+    Levels are located by binary search; the best level is at the end for bids and at the start for asks.
+    """
+    descending: bool
+
+    def set(self, price: float, size: float) -> None:
+        """
+        Set the size at a price level; a size of zero removes the level.
+        :param price: The price of the level.
+        :param size: The total size resting at the level.
+        """
+        index = bisect_left(self._prices, price)
+        exists = index < len(self._prices) and self._prices[index] == price
+        if size > 0.0:
+            if exists:
+                self._sizes[index] = size
+            else:
+                self._prices.insert(index, price)
+                self._sizes.insert(index, size)
+        elif exists:
+            del self._prices[index]
+            del self._sizes[index]
+
+    def best(self) -> float | None:
+        """
+        The best price on this side, or None when the side is empty.
+        """
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.descending else self._prices[0]
+
+    def size_at(self, price: float) -> float:
+        """
+        The size resting at the given price.
+        """
+        index = bisect_left(self._prices, price)
+        if index < len(self._prices) and self._prices[index] == price:
+            return self._sizes[index]
+        return 0.0
+
+    def depth(self, levels: int) -> List[Tuple[float, float]]:
+        """
+        The best `levels` price levels, best first.
+        :param levels: The number of levels to return.
+        :return: A list of (price, size) tuples.
+        """
+        if self.descending:
+            start = max(len(self._prices) - levels, 0)
+            return list(zip(reversed(self._prices[start:]), reversed(self._sizes[start:])))
+        return list(zip(self._prices[:levels], self._sizes[:levels]))
+
+    def cumulative_size(self, price: float) -> float:
+        """
+        The total size resting at prices at least as good as the given price.
+        The boundary is found by binary search and the sizes are summed over a contiguous slice.
+        :param price: The worst price to include.
+        """
+        if self.descending:
+            return sum(self._sizes[bisect_left(self._prices, price):])
+        return sum(self._sizes[:bisect_right(self._prices, price)])
+
+    def clear(self) -> None:
+        del self._prices[:]
+        del self._sizes[:]
+
+    def __len__(self):
+        return len(self._prices)
+
+    def __init__(self, descending: bool):
+        """
+        :param descending: True for the bid side, whose best price is the highest.
+        """
+        self.descending = descending
+        self._prices = array('d')
+        self._sizes = array('d')
+
+class LocalBoard:
+    """
+    A local limit order book maintained from the `lightning_board_{product}` diff channel.
+    The book is seeded from a REST board snapshot and then updated by applying diffs to sorted price ladders.
+    Diffs received while the book is not ready are kept and replayed after the seed. A crossed book or a
+    reconnection invalidates the book, and the next diff triggers an automatic resync. A board snapshot
+    message, e.g. from a recording, can seed the book as well. The REST seeds are recorded as snapshot
+    messages, so that a recording of the diff channel can be replayed and backtested on its own.
+    """
+    mid_price: float = None
+    ready: bool = False
+    resync_count: int = 0
+
+    def seed(self, board: dict) -> None:
+        """
+        Replace the whole book with a snapshot.
+        :param board: A board snapshot with `mid_price`, `bids` and `asks`.
+        """
+        self.bids.clear()
+        self.asks.clear()
+        self._apply_levels(board)
+        self.ready = not self.is_crossed()
+
+    def apply(self, diff: dict) -> bool:
+        """
+        Apply a board diff, or keep it for later if the book is being (re)synchronized.
+        :param diff: A board diff with `mid_price`, `bids` and `asks`; a size of zero removes a level.
+        :return: True if the diff was applied to a consistent book.
+        """
+        if not self.ready:
+            self._pending.append(diff)
+            self._schedule_resync()
+            return False
+        self._apply_levels(diff)
+        if self.is_crossed():
+            self.logger.system.warning("Local board is crossed (bid %s >= ask %s); resynchronizing.", self.bids.best(), self.asks.best())
+            self.invalidate()
+            self._schedule_resync()
+            return False
+        return True
+
+    def invalidate(self) -> None:
+        """
+        Mark the book as inconsistent, e.g. after a missed message or a reconnection.
+        """
+        self.ready = False
+        self._pending.clear()
+        self._generation += 1
+
+    @inject
+    async def resync(self,
+                     exchange_client: ExchangeClient = Provide['exchange_client'],
+                     recorder: Recorder = Provide['recorder'],
+                     config: dict = Provide['config']) -> None:
+        """
+        Reseed the book from the REST board and replay the diffs received in the meantime.
+        :param exchange_client: The client used to fetch the board.
+        :param recorder: The recorder the seed is recorded with, as a board snapshot message.
+        :param config: Configuration dictionary containing currency codes.
+        """
+        self._pending.clear()
+        generation = self._generation
+        board = await exchange_client.get_board(symbol=config.get('crypto_currency_code'))
+        if recorder.enabled:
+            channel = f"lightning_board_snapshot_{config.get('crypto_currency_code')}"
+            recorder.record(channel, json.dumps({'jsonrpc': '2.0', 'method': 'channelMessage', 'params': {'channel': channel, 'message': board}}), time.time_ns())
+        self.seed(board)
+        pending, self._pending = self._pending, []
+        for diff in pending:
+            self._apply_levels(diff)
+        # If the book was invalidated while the board was fetched, diffs are missing from the replay; the next diff resyncs again.
+        self.ready = not self.is_crossed() and self._generation == generation
+        self.resync_count += 1
+        self._last_resync_at = time.monotonic()
+        self.logger.system.info("Local board resynchronized (%d bids, %d asks, %d diffs replayed).", len(self.bids), len(self.asks), len(pending))
+
+    @property
+    def best_bid(self) -> float | None:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> float | None:
+        return self.asks.best()
+
+    @property
+    def spread(self) -> float | None:
+        if self.bids.best() is None or self.asks.best() is None:
+            return None
+        return self.asks.best() - self.bids.best()
+
+    def is_crossed(self) -> bool:
+        """
+        Whether the best bid is at or above the best ask, which means the book is inconsistent.
+        """
+        best_bid = self.bids.best()
+        best_ask = self.asks.best()
+        return best_bid is not None and best_ask is not None and best_bid >= best_ask
+
+    def to_snapshot(self, levels: int = None) -> dict:
+        """
+        Render the book in the shape of a `lightning_board_snapshot` message.
+        :param levels: The number of levels per side, or None for the whole book.
+        """
+        return {
+            'mid_price': self.mid_price,
+            'bids': [{'price': price, 'size': size} for price, size in self.bids.depth(levels or len(self.bids))],
+            'asks': [{'price': price, 'size': size} for price, size in self.asks.depth(levels or len(self.asks))],
+        }
+
+    def _apply_levels(self, message: dict) -> None:
+        if message.get('mid_price') is not None:
+            self.mid_price = message['mid_price']
+        for level in message.get('bids', ()):
+            self.bids.set(level['price'], level['size'])
+        for level in message.get('asks', ()):
+            self.asks.set(level['price'], level['size'])
+
+    def _schedule_resync(self) -> None:
+        """
+        Start a resync unless one is in flight or the last one was less than `resync_interval` seconds ago.
+        """
+        if self._resync_task is not None and not self._resync_task.done():
+            return
+        delay = max(self._last_resync_at + self.resync_interval - time.monotonic(), 0.0)
+        self._resync_task = asyncio.get_running_loop().create_task(self._delayed_resync(delay))
+
+    async def _delayed_resync(self, delay: float) -> None:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            await self.resync()
+        except Exception as e:
+            self._last_resync_at = time.monotonic()
+            self.logger.system.error("Local board resynchronization failed: %s", e)
+
+    @inject
+    def __init__(self,
+                 resync_interval: float = 1.0,
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the local board.
+        :param resync_interval: The minimum number of seconds between two resyncs.
+        :param logger: The logger service.
+        """
+        self.bids = PriceLadder(descending=True)
+        self.asks = PriceLadder(descending=False)
+        self.resync_interval = resync_interval
+        self.logger = logger
+        self._pending: List[dict] = []
+        self._generation = 0
+        self._resync_task: asyncio.Task = None
+        self._last_resync_at = float('-inf')
\ No newline at end of file
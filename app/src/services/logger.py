@@ -1,11 +1,293 @@
+from typing import Dict, List
+from collections import deque
 import os
-from logging import Logger, getLogger, DEBUG, INFO, FileHandler, Formatter
+import sys
+import gzip
+import json
+import time
+import shutil
+import atexit
+import threading
+from logging import Logger, getLogger, DEBUG, INFO, WARNING, Formatter, Handler, LogRecord
+
+class JsonLinesFormatter(Formatter):
+    """
+    Formats records as one JSON object per line.
+    Structured fields passed as `extra={'fields': {...}}` are merged into the object.
+    """
+    def format(self, record: LogRecord) -> str:
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RotatingLogFile:
+    """
+    An append-only log file rotated when it exceeds `max_bytes` or when `interval` seconds have elapsed.
+    Rotated files are renamed with their rotation time, gzip-compressed on a background thread if
+    `compress` is set, and pruned down to the newest `backup_count`.
+    """
+    def write(self, lines: List[str]) -> None:
+        """
+        Append formatted lines in one write.
+        :param lines: The lines, each ending with a newline.
+        """
+        data = ''.join(lines).encode('utf-8')
+        if self._file.closed:
+            # A failed rotation leaves the file closed; it is reopened so that the write can be retried.
+            self._open()
+        if (self.max_bytes and self._size and self._size + len(data) > self.max_bytes) or (self.interval and time.time() >= self._rollover_at):
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        now = time.time_ns()
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 1_000_000_000))}.{now % 1_000_000_000:09d}"
+        os.replace(self.path, rotated)
+        self._open()
+        if self.compress:
+            threading.Thread(target=self._compress, args=(rotated,), name='log-compressor', daemon=True).start()
+        else:
+            self._prune()
+
+    def _compress(self, path: str) -> None:
+        try:
+            with open(path, 'rb') as source, gzip.open(f"{path}.gz", 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except OSError:
+            pass
+        self._prune()
+
+    def _prune(self) -> None:
+        if not self.backup_count:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        # Rotated names embed their rotation time, so lexical order is chronological.
+        backups = sorted(name for name in os.listdir(directory) if name.startswith(prefix))
+        for name in backups[:-self.backup_count]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def _open(self) -> None:
+        self._file = open(self.path, 'ab', buffering=1 << 16)
+        self._size = self._file.tell()
+        if self.interval:
+            now = time.time()
+            self._rollover_at = now - now % self.interval + self.interval
+
+    def __init__(self, path: str, max_bytes: int = 0, interval: int = 0, backup_count: int = 7, compress: bool = True):
+        """
+        :param path: The path of the live log file.
+        :param max_bytes: The size above which the file is rotated; 0 disables size-based rotation.
+        :param interval: The rotation period in seconds, aligned to the epoch; 0 disables time-based rotation.
+        :param backup_count: The number of rotated files kept; 0 keeps all of them.
+        :param compress: Whether rotated files are gzip-compressed.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._open()
+
+class RotatingLogHandler(Handler):
+    """
+    A handler writing to a `RotatingLogFile` synchronously, on the calling thread.
+    """
+    def emit(self, record: LogRecord) -> None:
+        try:
+            self.file.write([self.format(record) + '\n'])
+            self.file.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.file.close()
+        super().close()
+
+    def __init__(self, file: RotatingLogFile, lossless: bool = False):
+        """
+        :param file: The file records are written to.
+        :param lossless: Whether records must never be dropped under load.
+        """
+        super().__init__()
+        self.file = file
+        self.lossless = lossless
+
+class QueuedLogHandler(RotatingLogHandler):
+    """
+    A handler that only enqueues the record; formatting and writing happen on the `LogWriter` thread.
+    """
+    def emit(self, record: LogRecord) -> None:
+        self.writer.submit(self, record)
+
+    def flush(self) -> None:
+        pass
+
+    def __init__(self, file: RotatingLogFile, writer: 'LogWriter', lossless: bool = False):
+        super().__init__(file, lossless)
+        self.writer = writer
+
+class LogWriter:
+    """
+    A background thread that formats queued records and writes them to their files in batches.
+    The queue is bounded by `capacity` for lossy records: once it is half full DEBUG records are dropped,
+    and once it is full every lossy record is. Records of lossless handlers (the transaction log) are
+    always queued. Drops are counted and reported in the system log. If a batch cannot be written, the
+    failure is reported on stderr; the lines of lossless handlers are kept and written with the next batch.
+    """
+    capacity: int
+    flush_interval: float
+    batch_size: int
+
+    def submit(self, handler: QueuedLogHandler, record: LogRecord) -> None:
+        """
+        Enqueue a record without blocking.
+        """
+        if not handler.lossless:
+            depth = len(self._queue)
+            if depth >= self.capacity or (record.levelno <= DEBUG and depth >= self.capacity // 2):
+                self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+                return
+        self._queue.append((handler, record))
+        # The writer wakes up every `flush_interval`; it is only woken early once a full batch is waiting.
+        if len(self._queue) >= self.batch_size and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the queue depth and the number of records dropped per level.
+        """
+        return {'depth': len(self._queue), 'dropped': dict(self.dropped), 'written': self.written_count}
+
+    def stop(self) -> None:
+        """
+        Write the queued records and stop the thread.
+        """
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self) -> None:
+        # The lines that failed to be written last time go first, so the file stays in order.
+        failed, self._failed = self._failed, {}
+        batches: Dict[QueuedLogHandler, List[str]] = {handler: list(lines) for handler, lines in failed.items()}
+        while self._queue:
+            handler, record = self._queue.popleft()
+            try:
+                batches.setdefault(handler, []).append(handler.format(record) + '\n')
+            except Exception:
+                handler.handleError(record)
+        if self.dropped != self._reported_dropped and self.report_handler is not None:
+            dropped = {level: count - self._reported_dropped.get(level, 0) for level, count in self.dropped.items()}
+            self._reported_dropped = dict(self.dropped)
+            record = LogRecord('System', WARNING, __file__, 0, 'Log queue overflowed; dropped records: %s', (dropped,), None)
+            batches.setdefault(self.report_handler, []).append(self.report_handler.format(record) + '\n')
+        for handler, lines in batches.items():
+            try:
+                handler.file.write(lines)
+                handler.file.flush()
+                self.written_count += len(lines)
+            except Exception as e:
+                if handler.lossless:
+                    self._failed[handler] = lines
+                # Only the first failure of a run of them is reported, not every flush that retries.
+                if handler not in failed:
+                    outcome = 'they will be retried' if handler.lossless else 'they were dropped'
+                    sys.stderr.write(f"Writing {len(lines)} log records to {handler.file.path} failed, {outcome}: {e}\n")
+
+    def __init__(self, capacity: int = 10000, flush_interval: float = 0.2, batch_size: int = 256):
+        """
+        :param capacity: The number of queued lossy records above which records are dropped.
+        :param flush_interval: The maximum number of seconds a record waits before it is written.
+        :param batch_size: The number of queued records that wakes the writer before `flush_interval` elapses.
+        """
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.report_handler: QueuedLogHandler = None
+        self.dropped: Dict[str, int] = {}
+        self.written_count = 0
+        self._reported_dropped: Dict[str, int] = {}
+        self._failed: Dict[QueuedLogHandler, List[str]] = {}
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
 
 class Logger:
+    """
+    The System, Transaction and Action loggers.
+    In the default 'async' mode (`LOG_MODE`), a log call only enqueues the record; a background thread
+    formats and writes records in batches, so the event loop never blocks on disk. Call sites pass
+    %-style arguments, which are only formatted on that thread. Files are rotated by size and time and
+    rotated files are compressed. The transaction log is written as JSON lines (`TRANSACTION_LOG_FORMAT`)
+    and is never dropped under load.
+    """
     formatter: Formatter = None
     system: Logger = None
     transaction: Logger = None
     action: Logger = None
+    writer: LogWriter = None
+
+    def close(self) -> None:
+        """
+        Write the queued records and close the files.
+        """
+        if self.writer is not None:
+            self.writer.stop()
+        for logger in (self.system, self.transaction, self.action):
+            for handler in list(logger.handlers):
+                if isinstance(handler, RotatingLogHandler):
+                    handler.close()
+                    logger.removeHandler(handler)
+
+    def get_stats(self) -> dict:
+        return self.writer.get_stats() if self.writer is not None else {}
+
+    def _create_handler(self, filename: str, formatter: Formatter, lossless: bool = False) -> RotatingLogHandler:
+        file = RotatingLogFile(
+            filename,
+            max_bytes=int(os.environ.get('LOG_MAX_BYTES', 50 << 20)),
+            interval=int(os.environ.get('LOG_ROTATE_INTERVAL', 86400)),
+            # Rotated transaction logs are never pruned.
+            backup_count=0 if lossless else int(os.environ.get('LOG_BACKUP_COUNT', 14)),
+            compress=os.environ.get('LOG_COMPRESS', 'true').lower() in ('1', 'true', 'yes')
+        )
+        handler = QueuedLogHandler(file, self.writer, lossless) if self.writer is not None else RotatingLogHandler(file, lossless)
+        handler.setFormatter(formatter)
+        return handler
 
     def __init__(self):
         self.system = getLogger('System')
@@ -16,16 +298,21 @@ class Logger:
         self.action.setLevel(INFO)
 
         self.formatter = Formatter(fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        transaction_formatter = JsonLinesFormatter() if os.environ.get('TRANSACTION_LOG_FORMAT', 'jsonl') == 'jsonl' else self.formatter
 
-        system_log_handler = FileHandler(filename=os.environ.get('SYSTEM_LOG_FILENAME'))
-        system_log_handler.setFormatter(self.formatter)
-
-        transaction_log_handler = FileHandler(filename=os.environ.get('TRANSACTION_LOG_FILENAME'))
-        transaction_log_handler.setFormatter(self.formatter)
+        if os.environ.get('LOG_MODE', 'async') == 'async':
+            self.writer = LogWriter(
+                capacity=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+                flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', 0.2))
+            )
+            atexit.register(self.close)
 
-        action_log_handler = FileHandler(filename=os.environ.get('ACTION_LOG_FILENAME'))
-        action_log_handler.setFormatter(self.formatter)
+        system_log_handler = self._create_handler(os.environ.get('SYSTEM_LOG_FILENAME'), self.formatter)
+        transaction_log_handler = self._create_handler(os.environ.get('TRANSACTION_LOG_FILENAME'), transaction_formatter, lossless=True)
+        action_log_handler = self._create_handler(os.environ.get('ACTION_LOG_FILENAME'), self.formatter)
+        if self.writer is not None:
+            self.writer.report_handler = system_log_handler
 
         self.system.addHandler(system_log_handler)
         self.transaction.addHandler(transaction_log_handler)
-        self.action.addHandler(action_log_handler)
\ No newline at end of file
+        self.action.addHandler(action_log_handler)
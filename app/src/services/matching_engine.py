@@ -0,0 +1,207 @@
+from typing import Dict, List, Literal
+import heapq
+import math
+
+class SimulatedOrder:
+    """
+    A compact record of an order resting in the matching engine.
+    """
+    __slots__ = ('child_order_acceptance_id', 'child_order_id', 'side', 'child_order_type', 'price', 'size',
+                 'outstanding_size', 'executed_size', 'average_price', 'total_commission', 'child_order_state',
+                 'sequence', 'child_order_date')
+
+    def __init__(self, child_order_acceptance_id: str, child_order_id: str, side: str, child_order_type: str,
+                 price: float, size: float, sequence: int, child_order_date: str = None):
+        self.child_order_acceptance_id = child_order_acceptance_id
+        self.child_order_id = child_order_id
+        self.side = side
+        self.child_order_type = child_order_type
+        self.price = price
+        self.size = size
+        self.outstanding_size = size
+        self.executed_size = 0.0
+        self.average_price = 0.0
+        self.total_commission = 0.0
+        self.child_order_state = 'ACTIVE'
+        self.sequence = sequence
+        self.child_order_date = child_order_date
+
+class Fill:
+    """
+    An execution produced by the matching engine.
+    """
+    __slots__ = ('order', 'price', 'size', 'commission')
+
+    def __init__(self, order: SimulatedOrder, price: float, size: float, commission: float):
+        self.order = order
+        self.price = price
+        self.size = size
+        self.commission = commission
+
+class MatchingEngine:
+    """
+    A price-time priority matching engine for our own orders against external market data.
+    Resting orders are kept in one heap per side, ordered by price and then by arrival sequence.
+    A market update only compares the market's best opposite price with the top of each heap, so
+    updates that do not trade are O(1); orders fill at their limit price, up to the size the market
+    shows at the crossing level. Market and marketable limit orders sweep the last board's levels.
+    Boards list each side best first, as bitFlyer sends them and the `LocalBoard` renders them, so the
+    top of book is read in O(1) and the levels are copied, never sorted, and only once an order needs them.
+    """
+    # Sizes are quoted to 8 decimals; rounding keeps partial fills from leaving dust behind.
+    precision: int = 8
+    best_bid: float = None
+    best_bid_size: float = 0.0
+    best_ask: float = None
+    best_ask_size: float = 0.0
+    mid_price: float = None
+
+    def update_top(self, best_bid: float, best_bid_size: float, best_ask: float, best_ask_size: float) -> List[Fill]:
+        """
+        Apply a top-of-book update and fill resting orders the market has traded through.
+        :param best_bid: The market's best bid price.
+        :param best_bid_size: The size at the best bid.
+        :param best_ask: The market's best ask price.
+        :param best_ask_size: The size at the best ask.
+        :return: The fills produced by the update.
+        """
+        # Without a full board, market orders sweep only the top of book.
+        self._bid_levels = []
+        self._ask_levels = []
+        self._levels_sorted = False
+        return self._update_top(best_bid, best_bid_size, best_ask, best_ask_size)
+
+    def _update_top(self, best_bid: float, best_bid_size: float, best_ask: float, best_ask_size: float) -> List[Fill]:
+        self.best_bid, self.best_bid_size = best_bid, best_bid_size
+        self.best_ask, self.best_ask_size = best_ask, best_ask_size
+        fills = []
+        if self._bids and best_ask is not None and -self._bids[0][0] >= best_ask:
+            self._fill_resting(self._bids, lambda price: price >= best_ask, best_ask_size, fills)
+        if self._asks and best_bid is not None and self._asks[0][0] <= best_bid:
+            self._fill_resting(self._asks, lambda price: price <= best_bid, best_bid_size, fills)
+        return fills
+
+    def update_board(self, board: dict) -> List[Fill]:
+        """
+        Apply a board snapshot: keep its levels for sweeping market orders and update the top of book.
+        :param board: A board snapshot with `mid_price`, `bids` and `asks`, each sorted best first.
+        :return: The fills produced by the update.
+        """
+        self._bid_levels = board.get('bids') or []
+        self._ask_levels = board.get('asks') or []
+        self._levels_sorted = False
+        self.mid_price = board.get('mid_price', self.mid_price)
+        best_bid = self._bid_levels[0] if self._bid_levels else None
+        best_ask = self._ask_levels[0] if self._ask_levels else None
+        return self._update_top(
+            best_bid['price'] if best_bid else None, best_bid['size'] if best_bid else 0.0,
+            best_ask['price'] if best_ask else None, best_ask['size'] if best_ask else 0.0
+        )
+
+    def submit(self, order: SimulatedOrder) -> List[Fill]:
+        """
+        Submit an order. The marketable part executes immediately against the board; the rest of a limit order rests.
+        :param order: The order to submit.
+        :return: The immediate fills.
+        """
+        self._orders[order.child_order_acceptance_id] = order
+        if order.child_order_id is not None:
+            self._child_order_ids[order.child_order_id] = order.child_order_acceptance_id
+        fills = []
+        limit = order.price if order.child_order_type == 'LIMIT' else (math.inf if order.side == 'BUY' else -math.inf)
+        for level in self._levels('SELL' if order.side == 'BUY' else 'BUY'):
+            price, size = level
+            if order.outstanding_size <= 0.0:
+                break
+            if size <= 0.0:
+                continue
+            if (order.side == 'BUY' and price > limit) or (order.side == 'SELL' and price < limit):
+                break
+            fill = self._fill(order, price, min(size, order.outstanding_size))
+            # Consume the liquidity so that later orders on the same board do not fill against it again.
+            level[1] = round(size - fill.size, self.precision)
+            fills.append(fill)
+
+        if order.outstanding_size > 0.0:
+            if order.child_order_type == 'LIMIT':
+                entry = (-order.price, order.sequence, order) if order.side == 'BUY' else (order.price, order.sequence, order)
+                heapq.heappush(self._bids if order.side == 'BUY' else self._asks, entry)
+            else:
+                # A market order that exhausted the visible book is canceled for the remainder.
+                order.child_order_state = 'CANCELED'
+        return fills
+
+    def cancel(self, order_id: str) -> SimulatedOrder | None:
+        """
+        Cancel a resting order. The heap entry is removed lazily when it reaches the top.
+        :param order_id: The child_order_acceptance_id or child_order_id of the order.
+        :return: The canceled order, or None if it is not active.
+        """
+        order = self.get_order(order_id)
+        if order is None or order.child_order_state != 'ACTIVE':
+            return None
+        order.child_order_state = 'CANCELED'
+        return order
+
+    def get_order(self, order_id: str) -> SimulatedOrder | None:
+        order = self._orders.get(order_id)
+        if order is None:
+            order = self._orders.get(self._child_order_ids.get(order_id))
+        return order
+
+    def get_orders(self, state: str = None) -> List[SimulatedOrder]:
+        return [order for order in self._orders.values() if state is None or order.child_order_state == state]
+
+    def _fill_resting(self, heap: list, crosses, available: float, fills: List[Fill]) -> None:
+        while heap and available > 0.0:
+            key, _, order = heap[0]
+            if order.child_order_state != 'ACTIVE':
+                heapq.heappop(heap)
+                continue
+            if not crosses(order.price):
+                break
+            fill = self._fill(order, order.price, min(available, order.outstanding_size))
+            fills.append(fill)
+            available = round(available - fill.size, self.precision)
+            if order.outstanding_size <= 0.0:
+                heapq.heappop(heap)
+
+    def _fill(self, order: SimulatedOrder, price: float, size: float) -> Fill:
+        commission = round(size * self.fee_rate, self.precision)
+        order.average_price = (order.average_price * order.executed_size + price * size) / (order.executed_size + size)
+        order.executed_size = round(order.executed_size + size, self.precision)
+        order.outstanding_size = round(order.outstanding_size - size, self.precision)
+        order.total_commission += commission
+        if order.outstanding_size <= 0.0:
+            order.outstanding_size = 0.0
+            order.child_order_state = 'COMPLETED'
+        return Fill(order, price, size, commission)
+
+    def _levels(self, side: Literal['BUY', 'SELL']) -> List[List[float]]:
+        """
+        The last board's levels on one side, best first. They are copied once an order needs them, as sweeps consume their sizes.
+        """
+        if not self._levels_sorted:
+            self._sorted_bids = [[level['price'], level['size']] for level in self._bid_levels]
+            self._sorted_asks = [[level['price'], level['size']] for level in self._ask_levels]
+            if not self._sorted_bids and self.best_bid is not None:
+                self._sorted_bids = [[self.best_bid, self.best_bid_size]]
+            if not self._sorted_asks and self.best_ask is not None:
+                self._sorted_asks = [[self.best_ask, self.best_ask_size]]
+            self._levels_sorted = True
+        return self._sorted_bids if side == 'BUY' else self._sorted_asks
+
+    def __init__(self, fee_rate: float = 0.0):
+        """
+        :param fee_rate: The commission charged per unit of executed size, as a fraction of the size.
+        """
+        self.fee_rate = fee_rate
+        self._bids: list = []
+        self._asks: list = []
+        self._orders: Dict[str, SimulatedOrder] = {}
+        self._child_order_ids: Dict[str, str] = {}
+        self._bid_levels: list = []
+        self._ask_levels: list = []
+        self._sorted_bids: list = []
+        self._sorted_asks: list = []
+        self._levels_sorted = True
\ No newline at end of file
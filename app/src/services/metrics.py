@@ -0,0 +1,304 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+from bisect import bisect_left
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+
+# Latency buckets in seconds, from 10 microseconds to 10 seconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                                      0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class CounterValue:
+    """
+    A monotonically increasing value.
+    """
+    __slots__ = ('value', 'function')
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Read the value from a callback at scrape time instead of storing it.
+        """
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+class GaugeValue(CounterValue):
+    """
+    A value that can go up and down.
+    """
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+class HistogramValue:
+    """
+    A distribution of observations over fixed buckets.
+    The counts are kept per bucket in a preallocated list and accumulated at scrape time.
+    """
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+class Metric:
+    """
+    A named family of values, one per combination of label values.
+    Resolve the value for a label combination once with `labels` and keep it; recording on the value
+    itself only updates numbers in place.
+    """
+    type: str = None
+
+    def labels(self, *values: str):
+        """
+        The value for a combination of label values, created on first use.
+        """
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"Metric {self.name} expects labels {self.label_names}.")
+            value = self._values[values] = self._create()
+        return value
+
+    def render(self, namespace: str) -> List[str]:
+        """
+        Render the metric in the Prometheus text exposition format.
+        """
+        name = f"{namespace}_{self.name}" if namespace else self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} {self.type}"]
+        for values, value in list(self._values.items()):
+            labels = ','.join(f'{label}="{_escape(str(item))}"' for label, item in zip(self.label_names, values))
+            lines.extend(self._render_value(name, labels, value))
+        return lines
+
+    def _create(self):
+        raise NotImplementedError
+
+    def _render_value(self, name: str, labels: str, value) -> List[str]:
+        return [f"{name}{{{labels}}} {_format(value.get())}" if labels else f"{name} {_format(value.get())}"]
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[tuple, object] = {}
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Increment the unlabelled value.
+        """
+        self.labels().inc(amount)
+
+    def _create(self) -> CounterValue:
+        return CounterValue()
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float) -> None:
+        """
+        Set the unlabelled value.
+        """
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Read the unlabelled value from a callback at scrape time.
+        """
+        self.labels().set_function(function)
+
+    def _create(self) -> GaugeValue:
+        return GaugeValue()
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def observe(self, value: float) -> None:
+        """
+        Observe a value without labels.
+        """
+        self.labels().observe(value)
+
+    def _create(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def _render_value(self, name: str, labels: str, value: HistogramValue) -> List[str]:
+        separator = ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{_format(bound)}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {value.count}')
+        suffix = f"{{{labels}}}" if labels else ''
+        lines.append(f"{name}_sum{suffix} {_format(value.sum)}")
+        lines.append(f"{name}_count{suffix} {value.count}")
+        return lines
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+class MetricsRegistry:
+    """
+    An in-process registry of counters, gauges and histograms, served over a local HTTP endpoint in the
+    Prometheus text format. The registry also measures the event loop lag: a task sleeps for
+    `lag_interval` and records how late it wakes up, which grows as soon as the loop is saturated.
+    """
+    enabled: bool
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, label_names)
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, label_names)
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render(self.namespace))
+        return '\n'.join(lines) + '\n'
+
+    async def run(self) -> None:
+        """
+        Serve the metrics endpoint and monitor the event loop lag.
+        """
+        if not self.enabled:
+            return
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.logger.system.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+        loop = asyncio.get_running_loop()
+        last_lag = self._last_event_loop_lag.labels()
+        lag = self._event_loop_lag.labels()
+        async with server:
+            while True:
+                expected = loop.time() + self.lag_interval
+                await asyncio.sleep(self.lag_interval)
+                delay = max(loop.time() - expected, 0.0)
+                last_lag.set(delay)
+                lag.observe(delay)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer one HTTP request: GET /metrics returns the metrics, anything else is not found.
+        """
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/metrics', '/'):
+                status, body = '200 OK', self.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _register(self, metric_type: type, name: str, help: str, label_names: Sequence[str], **kwargs) -> Metric:
+        """
+        Return the metric registered under the name, creating it on first use.
+        """
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_type(name, help, label_names, **kwargs)
+        elif not isinstance(metric, metric_type) or metric.label_names != tuple(label_names):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels.")
+        return metric
+
+    @inject
+    def __init__(self,
+                 enabled: bool = True,
+                 host: str = '127.0.0.1',
+                 port: int = 9100,
+                 namespace: str = 'trading_bot',
+                 lag_interval: float = 0.5,
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the metrics registry.
+        :param enabled: Whether the endpoint is served and the event loop lag monitored. Metrics are recorded either way.
+        :param host: The address the endpoint listens on; keep it local.
+        :param port: The port the endpoint listens on.
+        :param namespace: The prefix of every metric name.
+        :param lag_interval: The interval in seconds at which the event loop lag is sampled.
+        :param logger: The logger service.
+        """
+        self.enabled = enabled
+        self.host = host
+        self.port = port
+        self.namespace = namespace
+        self.lag_interval = lag_interval
+        self.logger = logger
+        self._metrics: Dict[str, Metric] = {}
+        self._last_event_loop_lag = self.gauge('event_loop_lag_last_seconds', 'The delay of the latest event loop lag probe.')
+        self._event_loop_lag = self.histogram('event_loop_lag_seconds', 'The delays of the event loop lag probes.')
+
+class InstrumentedLock(asyncio.Lock):
+    """
+    An `asyncio.Lock` that records how long each acquisition waited, and how often it was contended.
+    """
+    async def acquire(self) -> bool:
+        if not self.locked():
+            self._wait.observe(0.0)
+            return await super().acquire()
+        self._contended.inc()
+        started_at = time.perf_counter_ns()
+        try:
+            return await super().acquire()
+        finally:
+            self._wait.observe((time.perf_counter_ns() - started_at) / 1e9)
+
+    @inject
+    def __init__(self,
+                 name: str,
+                 metrics: MetricsRegistry = Provide['metrics']):
+        """
+        :param name: The label identifying the lock in the metrics.
+        :param metrics: The metrics registry.
+        """
+        super().__init__()
+        self._wait = metrics.histogram('lock_wait_seconds', 'The time spent waiting to acquire a lock.', ['lock']).labels(name)
+        self._contended = metrics.counter('lock_contended_total', 'The acquisitions that had to wait for a lock.', ['lock']).labels(name)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(value) if isinstance(value, int) else repr(float(value))
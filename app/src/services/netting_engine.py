@@ -0,0 +1,101 @@
+from typing import Dict, Literal
+from collections import deque
+
+class Lot:
+    """
+    A compact record of an open lot.
+    """
+    __slots__ = ('price', 'size', 'open_date')
+
+    def __init__(self, price: float, size: float, open_date: str = None):
+        self.price = price
+        self.size = size
+        self.open_date = open_date
+
+class NettingEngine:
+    """
+    FIFO netting engine for positions.
+    Lots are queued per side; an incoming execution offsets the oldest opposite lots first,
+    partially if needed, and only the remainder is opened as a new lot. Net size, average entry
+    price and cost basis are maintained incrementally so they can be read in O(1).
+    """
+    # Sizes are quoted to 8 decimals; rounding keeps offsets from leaving dust lots behind.
+    precision: int = 8
+
+    def add(self, side: Literal['BUY', 'SELL'], price: float, size: float, open_date: str = None) -> float:
+        """
+        Net an execution against the open lots.
+        :param side: The side of the execution.
+        :param price: The execution price.
+        :param size: The executed size.
+        :param open_date: The date to record on the lot opened by the remainder, if any.
+        :return: The PnL realized by offsetting opposite lots.
+        """
+        opposite = self._lots['SELL' if side == 'BUY' else 'BUY']
+        remaining = size
+        pnl = 0.0
+        while remaining > 0.0 and opposite:
+            lot = opposite[0]
+            offset_size = min(lot.size, remaining)
+            pnl += (price - lot.price) * offset_size if side == 'SELL' else (lot.price - price) * offset_size
+            lot.size = round(lot.size - offset_size, self.precision)
+            remaining = round(remaining - offset_size, self.precision)
+            self._open_size = round(self._open_size - offset_size, self.precision)
+            self._open_cost -= lot.price * offset_size
+            if lot.size <= 0.0:
+                opposite.popleft()
+
+        if remaining > 0.0:
+            self._lots[side].append(Lot(price, remaining, open_date))
+            self._open_size = round(self._open_size + remaining, self.precision)
+            self._open_cost += price * remaining
+
+        if self._open_size <= 0.0:
+            # Reset the running cost basis when flat so floating point error never accumulates.
+            self._open_size = 0.0
+            self._open_cost = 0.0
+            self.net_size = 0.0
+        else:
+            self.net_size = self._open_size if self._lots['BUY'] else -self._open_size
+        self.realized_pnl += pnl
+        return pnl
+
+    @property
+    def average_price(self) -> float:
+        """
+        The size-weighted average entry price of the open lots, or 0.0 when flat.
+        """
+        return self._open_cost / self._open_size if self._open_size else 0.0
+
+    def unrealized_pnl(self, mark_price: float) -> float:
+        """
+        The PnL of the open lots if they were closed at the given price.
+        :param mark_price: The price at which to value the open lots.
+        """
+        return (mark_price - self.average_price) * self.net_size if self._open_size else 0.0
+
+    def lots(self, side: Literal['BUY', 'SELL']) -> deque:
+        """
+        The open lots on the given side, oldest first.
+        """
+        return self._lots[side]
+
+    def reset(self) -> None:
+        """
+        Drop all lots and aggregates, keeping the realized PnL.
+        """
+        self._lots['BUY'].clear()
+        self._lots['SELL'].clear()
+        self._open_size = 0.0
+        self._open_cost = 0.0
+        self.net_size = 0.0
+
+    def __len__(self):
+        return len(self._lots['BUY']) + len(self._lots['SELL'])
+
+    def __init__(self):
+        self._lots: Dict[str, deque] = {'BUY': deque(), 'SELL': deque()}
+        self._open_size = 0.0
+        self._open_cost = 0.0
+        self.net_size = 0.0
+        self.realized_pnl = 0.0
\ No newline at end of file
@@ -0,0 +1,353 @@
+from typing import Dict, Literal
+import json
+import numpy as np
+
+# The quantiles tracked by the 'quantile' method: the median centres the inputs and the interquartile range scales them.
+QUANTILES = (0.25, 0.5, 0.75)
+
+class Normalizer:
+    """
+    Causal normalization of feature vectors with running statistics.
+    Each update folds one vector into the statistics and standardizes it with statistics of the past
+    and present only, so live inputs never depend on future data. The methods are 'welford' (running
+    mean and variance), 'ewm' (exponentially decayed mean and variance with weight `alpha`), 'quantile'
+    (median and interquartile range tracked with P² sketches, five markers per quantile and feature)
+    and 'none'. Every step is O(1) per feature and vectorized across the features. On small vectors the
+    cost is dominated by the fixed overhead of each NumPy call, about as much in normalizing a vector as
+    in folding it, so the live path folds every vector with `observe` and only normalizes the ones a
+    decision reads, with `transform`; `update` does both.
+    `transform_many` runs the same code over a matrix of rows, so offline (training or backtest) inputs
+    are bit-identical to live ones. The state can be saved and shipped with a model; once `frozen`, the
+    statistics are no longer updated and a matrix is transformed in one vectorized expression.
+    """
+    methods = ('none', 'welford', 'ewm', 'quantile')
+    method: Literal['none', 'welford', 'ewm', 'quantile']
+    alpha: float
+    clip: float
+    min_count: int
+    epsilon: float
+    frozen: bool
+    size: int = None
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        """
+        Fold a vector into the statistics, unless frozen, and normalize it.
+        :param x: The feature vector; NaN features are skipped and normalized to 0.
+        :return: The normalized vector, written into the preallocated `output`, which the next update overwrites.
+        """
+        self.observe(x)
+        return self.transform(x, out=self.output)
+
+    def observe(self, x: np.ndarray) -> None:
+        """
+        Fold a vector into the statistics, unless frozen, without normalizing it.
+        `transform` of the same vector afterwards returns what `update` would have.
+        :param x: The feature vector; NaN features are skipped.
+        """
+        if self.size is None:
+            self._allocate(len(x))
+        elif len(x) != self.size:
+            raise ValueError(f"The normalizer holds statistics of {self.size} features, got {len(x)}.")
+        if not self.frozen and self.method != 'none':
+            self._step(np.asarray(x, dtype=np.float64))
+
+    def transform(self, x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Normalize a vector, or a matrix of row vectors, with the current statistics without updating them.
+        :param x: The feature vector, or a matrix whose last axis is the features.
+        :param out: An array to write the result into.
+        :return: The normalized input, clipped to ±`clip`.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.size is None:
+            self._allocate(x.shape[-1])
+        elif x.shape[-1] != self.size:
+            raise ValueError(f"The normalizer holds statistics of {self.size} features, got {x.shape[-1]}.")
+        if self.method == 'none':
+            result = np.where(x == x, x, 0.0)
+            if out is None:
+                return result
+            out[...] = result
+            return out
+        center, scale, ready = self._parameters()
+        # Written in place into `out`; the scale is at least epsilon, and NaN features propagate quietly until they are zeroed.
+        result = np.subtract(x, center, out=out)
+        result /= scale
+        np.maximum(result, -self.clip, out=result)
+        np.minimum(result, self.clip, out=result)
+        np.copyto(result, 0.0, where=~(ready & (x == x)))
+        return result
+
+    def transform_many(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Normalize a matrix of feature vectors, oldest first, as successive calls to `update` would.
+        :param rows: A (time, features) matrix.
+        :return: A (time, features) matrix of normalized vectors, bit-identical to the per-row results.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if self.size is None:
+            self._allocate(rows.shape[1])
+        elif rows.shape[1] != self.size:
+            raise ValueError(f"The normalizer holds statistics of {self.size} features, got {rows.shape[1]}.")
+        if self.frozen or self.method == 'none':
+            # Elementwise operations round identically on a row and on a matrix.
+            return self.transform(rows)
+        result = np.empty_like(rows)
+        for index in range(len(rows)):
+            self._step(rows[index])
+            self.transform(rows[index], out=result[index])
+        return result
+
+    def freeze(self) -> None:
+        """
+        Stop updating the statistics, e.g. once a model was trained with them.
+        """
+        self.frozen = True
+
+    def reset(self) -> None:
+        if self.size is not None:
+            self._allocate(self.size)
+
+    def state_dict(self) -> Dict[str, object]:
+        """
+        Returns the configuration and the statistics.
+        """
+        return {
+            'method': self.method,
+            'alpha': self.alpha,
+            'clip': self.clip,
+            'min_count': self.min_count,
+            'epsilon': self.epsilon,
+            'size': self.size,
+            'arrays': {name: array.copy() for name, array in self._state.items()},
+        }
+
+    def load_state_dict(self, state: Dict[str, object]) -> None:
+        """
+        Restore the configuration and the statistics returned by `state_dict`.
+        """
+        self.method = state['method']
+        self.alpha = state['alpha']
+        self.clip = state['clip']
+        self.min_count = state['min_count']
+        self.epsilon = state['epsilon']
+        if state['size'] is None:
+            self.size = None
+            self._state = {}
+            return
+        self._allocate(state['size'])
+        for name, array in state['arrays'].items():
+            self._state[name][...] = array
+
+    def save(self, path: str) -> None:
+        """
+        Save the state to a `.npz` file.
+        """
+        state = self.state_dict()
+        arrays = state.pop('arrays')
+        np.savez(path, __meta__=np.array(json.dumps(state)), **arrays)
+
+    def load(self, path: str) -> None:
+        """
+        Load a state saved with `save`.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            state = json.loads(str(data['__meta__']))
+            state['arrays'] = {name: data[name] for name in data.files if name != '__meta__'}
+        self.load_state_dict(state)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the number of observations and the current centre and scale of each feature.
+        """
+        if self.size is None or self.method == 'none':
+            return {}
+        center, scale, _ = self._parameters()
+        return {'count': self._state['count'].tolist(), 'center': center.tolist(), 'scale': scale.tolist()}
+
+    def _step(self, x: np.ndarray) -> None:
+        """
+        Fold one vector into the statistics. Every operation is elementwise across the features.
+        Vectors without NaN take a shorter path that computes the same values.
+        """
+        state = self._state
+        valid = x == x
+        complete = np.count_nonzero(valid) == self.size
+        if self.method == 'welford':
+            count, mean, m2 = state['count'], state['mean'], state['m2']
+            if complete:
+                count += 1.0
+                delta = x - mean
+                mean += delta / count
+                m2 += delta * (x - mean)
+            else:
+                count += valid
+                delta = np.where(valid, x - mean, 0.0)
+                mean += np.where(valid, delta / np.maximum(count, 1.0), 0.0)
+                m2 += np.where(valid, delta * (x - mean), 0.0)
+        elif self.method == 'ewm':
+            count, mean, variance = state['count'], state['mean'], state['variance']
+            if complete and self._seeded:
+                count += 1.0
+                diff = x - mean
+                increment = self.alpha * diff
+                mean += increment
+                variance[...] = (1.0 - self.alpha) * (variance + diff * increment)
+            else:
+                first = valid & (count == 0.0)
+                count += valid
+                diff = np.where(valid, x - mean, 0.0)
+                increment = self.alpha * diff
+                mean[...] = np.where(first, x, mean + increment)
+                variance[...] = np.where(first, 0.0, np.where(valid, (1.0 - self.alpha) * (variance + diff * increment), variance))
+                self._seeded = bool((count > 0.0).all())
+        elif self.method == 'quantile':
+            # Every quantile of a feature observes the same value.
+            self._columns[...] = x
+            self._step_quantiles(self._columns.reshape(-1), None if complete else np.tile(valid, len(QUANTILES)))
+            state['count'] += valid
+
+    def _step_quantiles(self, x: np.ndarray, valid: np.ndarray = None) -> None:
+        """
+        One P² step for every (quantile, feature) column: the five markers hold the minimum, the quantile,
+        the maximum and two intermediate estimates, and are nudged towards their desired positions with
+        a piecewise-parabolic interpolation.
+        :param x: The observation of each column.
+        :param valid: Which columns observed a value, or None if all of them did.
+        """
+        state = self._state
+        heights, positions, desired = state['heights'], state['positions'], state['desired']
+        counts = state['marker_count']
+
+        if not self._filled:
+            # The first five observations of a column are stored as they come, then sorted into the markers.
+            filling = counts < 5 if valid is None else valid & (counts < 5)
+            columns = np.nonzero(filling)[0]
+            heights[counts[columns].astype(np.intp), columns] = x[columns]
+            counts[columns] += 1
+            full = columns[counts[columns] == 5]
+            heights[:, full] = np.sort(heights[:, full], axis=0)
+            self._filled = bool((counts >= 5).all())
+            active = (counts >= 5) & ~filling
+            if valid is not None:
+                active &= valid
+        elif valid is not None:
+            active = valid
+        else:
+            active = None
+
+        if active is not None:
+            if not np.count_nonzero(active):
+                return
+            # Inactive columns are stepped on a copy that is discarded.
+            x = np.where(active, x, heights[2])
+            saved = (heights.copy(), positions.copy(), desired.copy())
+
+        np.minimum(heights[0], x, out=heights[0])
+        np.maximum(heights[4], x, out=heights[4])
+        cell = (x >= heights[1]).astype(np.intp) + (x >= heights[2]) + (x >= heights[3])
+        positions += self._marker_index > cell
+        desired += self._increments
+
+        # Marker positions are strictly increasing integers, so every denominator is at least 1 in every
+        # column; the moves are computed for all columns and only kept where a marker moves.
+        for i in (1, 2, 3):
+            q_low, q, q_high = heights[i - 1], heights[i], heights[i + 1]
+            n_low, n, n_high = positions[i - 1], positions[i], positions[i + 1]
+            d = desired[i] - n
+            gap_high = n_high - n
+            gap_low = n - n_low
+            up = (d >= 1.0) & (gap_high > 1.0)
+            moving = up | ((d <= -1.0) & (gap_low > 1.0))
+            if not np.count_nonzero(moving):
+                continue
+            sign = np.where(up, 1.0, -1.0)
+            parabolic = q + sign / (n_high - n_low) * ((gap_low + sign) * (q_high - q) / gap_high + (gap_high - sign) * (q - q_low) / gap_low)
+            linear = q + sign * (np.where(up, q_high, q_low) - q) / np.where(up, gap_high, -gap_low)
+            np.copyto(q, np.where((q_low < parabolic) & (parabolic < q_high), parabolic, linear), where=moving)
+            np.copyto(n, n + sign, where=moving)
+
+        if active is not None:
+            inactive = ~active
+            heights[:, inactive] = saved[0][:, inactive]
+            positions[:, inactive] = saved[1][:, inactive]
+            desired[:, inactive] = saved[2][:, inactive]
+
+    def _parameters(self) -> tuple:
+        """
+        The centre and scale of each feature, and whether it has enough observations to be normalized.
+        """
+        state = self._state
+        count = state['count']
+        if self.method == 'welford':
+            center = state['mean']
+            scale = np.sqrt(state['m2'] / np.maximum(count - 1.0, 1.0))
+            ready = count >= max(self.min_count, 2)
+        elif self.method == 'ewm':
+            center = state['mean']
+            scale = np.sqrt(state['variance'])
+            ready = count >= max(self.min_count, 2)
+        else:
+            heights = state['heights'][2].reshape(len(QUANTILES), self.size)
+            center = heights[1]
+            scale = heights[2] - heights[0]
+            ready = count >= max(self.min_count, 5)
+        return center, np.maximum(scale, self.epsilon), ready
+
+    def _allocate(self, size: int) -> None:
+        self.size = size
+        self.output = np.zeros(size)
+        self._state: Dict[str, np.ndarray] = {'count': np.zeros(size)}
+        self._seeded = False
+        self._filled = False
+        if self.method == 'welford':
+            self._state.update(mean=np.zeros(size), m2=np.zeros(size))
+        elif self.method == 'ewm':
+            self._state.update(mean=np.zeros(size), variance=np.zeros(size))
+        elif self.method == 'quantile':
+            columns = size * len(QUANTILES)
+            p = np.repeat(QUANTILES, size)
+            self._increments = np.stack([np.zeros(columns), p / 2.0, p, (1.0 + p) / 2.0, np.ones(columns)])
+            self._marker_index = np.arange(5)[:, None]
+            self._columns = np.empty((len(QUANTILES), size))
+            self._state.update(
+                heights=np.zeros((5, columns)),
+                positions=np.tile(np.arange(5.0)[:, None], (1, columns)),
+                desired=np.stack([np.zeros(columns), 2.0 * p, 4.0 * p, 2.0 + 2.0 * p, np.full(columns, 4.0)]),
+                marker_count=np.zeros(columns),
+            )
+
+    def __init__(self,
+                 method: Literal['none', 'welford', 'ewm', 'quantile'] = 'welford',
+                 size: int = None,
+                 alpha: float = 0.01,
+                 clip: float = 5.0,
+                 min_count: int = 2,
+                 epsilon: float = 1e-12,
+                 frozen: bool = False,
+                 state_path: str = None):
+        """
+        Initialize the normalizer.
+        :param method: The statistics: 'welford', 'ewm', 'quantile' or 'none'.
+        :param size: The number of features; taken from the first vector when None.
+        :param alpha: The weight of the newest observation in the 'ewm' statistics.
+        :param clip: The normalized values are clipped to ±clip.
+        :param min_count: The number of observations of a feature before it is normalized; it is 0 until then.
+        :param epsilon: The smallest scale, which keeps constant features finite.
+        :param frozen: Whether the statistics are fixed, e.g. when loaded from the state a model was trained with.
+        :param state_path: A state saved with `save` to start from; it overrides the other settings.
+        """
+        if method not in self.methods:
+            raise ValueError(f"Unknown normalization method {method}; expected one of {self.methods}.")
+        self.method = method
+        self.alpha = alpha
+        self.clip = clip
+        self.min_count = min_count
+        self.epsilon = epsilon
+        self.frozen = frozen
+        self.output: np.ndarray = None
+        self._state: Dict[str, np.ndarray] = {}
+        if size is not None:
+            self._allocate(size)
+        if state_path:
+            self.load(state_path)
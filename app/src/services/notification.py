@@ -1,5 +1,4 @@
 import json
-import requests
 
 class Notification:
     def notify(self, message: str):
@@ -21,6 +20,8 @@ class Notification:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.__line_messaging_api_channel_token}",
         }
+        # Imported on first use, as it is slow to import and rarely needed.
+        import requests
         response = requests.post(self.line_messaging_api_base_url + path, data=data, headers=headers)
         return response.json()
 
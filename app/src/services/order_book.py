@@ -1,9 +1,16 @@
-from typing import List, Literal
+from typing import Dict, Iterable, List, Literal
+from collections import OrderedDict
 import dataclasses
+import time
 import asyncio
 from dependency_injector.wiring import inject, Provide
+from services.metrics import InstrumentedLock
 from services.exchange_clients.exchange_client import ExchangeClient
 
+TERMINAL_STATES = ('COMPLETED', 'CANCELED', 'EXPIRED', 'REJECTED')
+# PENDING orders were accepted by the REST API and are waiting for their ORDER event.
+LIVE_STATES = ('PENDING', 'ACTIVE')
+
 @dataclasses.dataclass
 class Order:
     product_code: str
@@ -15,7 +22,7 @@ class Order:
     id: int = None
     child_order_id: str = None
     average_price: float = None
-    child_order_state: Literal['ACTIVE', 'COMPLETED', 'CANCELED', 'EXPIRED', 'REJECTED'] = None
+    child_order_state: Literal['PENDING', 'ACTIVE', 'COMPLETED', 'CANCELED', 'EXPIRED', 'REJECTED'] = None
     expire_date: str = None
     child_order_date: str = None
     outstanding_size: float = None
@@ -28,8 +35,13 @@ class OrderBook:
     """
     Service for managing order book operations.
     This service can be extended to include methods for adding, removing, or updating orders.
+    Live orders are indexed by `child_order_acceptance_id` and `child_order_id` and partitioned by
+    `child_order_state`, so lookups and state transitions are O(1). Orders reaching a terminal state
+    are moved into an archive bounded by count and age.
     """
-    _orders: List[Order] = []
+    archive_size: int
+    archive_age: float
+    pending_timeout: float
 
     @inject
     async def sync(self,
@@ -42,54 +54,259 @@ class OrderBook:
         :param exchange_client: The Bitflyer client for fetching order book data.
         """
         async with self.lock:
-            orders = exchange_client.get_orders(symbol=config.get('crypto_currency_code'), **filter)
+            orders = await exchange_client.get_orders(symbol=config.get('crypto_currency_code'), **filter)
 
-            self._orders = [Order(**order) for order in orders]
+            # Orders still waiting for their ORDER event may not be listed by the exchange yet. Past
+            # `pending_timeout` the event is considered lost, and the exchange listing is trusted instead.
+            deadline = time.monotonic() - self.pending_timeout
+            pending = [order for order in self._states.get('PENDING', {}).values()
+                       if self._pending_since.get(order.child_order_acceptance_id, deadline) > deadline]
+            pending_since = self._pending_since
+            self._orders.clear()
+            self._child_order_id_index.clear()
+            self._states.clear()
+            self._pending_since = {}
+            for order in orders:
+                self._insert(Order(**order))
+            for order in pending:
+                if order.child_order_acceptance_id not in self._orders:
+                    self._insert(order)
+                    self._pending_since[order.child_order_acceptance_id] = pending_since[order.child_order_acceptance_id]
 
     async def add(self, order: Order):
         """
         Add a new order to the order book.
+        Orders without a state are considered ACTIVE. If the order is already known, it is replaced,
+        which is how the ORDER event reconciles a PENDING entry.
+        :param order: The order to be added.
+        """
+        async with self.lock:
+            if order.child_order_state is None:
+                order.child_order_state = 'ACTIVE'
+            if order.outstanding_size is None:
+                order.outstanding_size = order.size
+            existing = self._orders.get(order.child_order_acceptance_id)
+            if existing is not None:
+                self._remove(existing)
+            self._insert(order)
+
+    async def add_pending(self, order: Order) -> bool:
+        """
+        Add an order accepted by the REST API whose ORDER event has not been received yet.
+        The order is only added if it is unknown, since its events may have been handled first.
         :param order: The order to be added.
+        :return: True if the order was added.
         """
         async with self.lock:
-            self._orders.append(order)
+            if self._lookup(order.child_order_acceptance_id) is not None or order.child_order_acceptance_id in self._archive:
+                return False
+            order.child_order_state = 'PENDING'
+            if order.outstanding_size is None:
+                order.outstanding_size = order.size
+            self._insert(order)
+            self._pending_since[order.child_order_acceptance_id] = time.monotonic()
+            return True
 
-    async def execute(self, order_id: str) -> Order | None:
+    async def execute(self, order_id: str, size: float = None) -> Order | None:
         """
-        Mark the order with the given ID as COMPLETED.
-        :param order_id: The child_order_acceptance_id of the order to complete.
+        Apply an execution to the order with the given ID.
+        The order is marked as COMPLETED once its outstanding size is filled, or immediately if no size is given.
+        :param order_id: The child_order_acceptance_id (or child_order_id) of the order.
+        :param size: The executed size, if known.
         :return: The updated order if found, else None.
         """
         async with self.lock:
-            for order in self._orders:
-                if order.child_order_acceptance_id == order_id and order.child_order_state == 'ACTIVE':
-                    order.child_order_state = 'COMPLETED'
+            order = self._lookup(order_id)
+            if order is None or order.child_order_state not in LIVE_STATES:
+                return None
+            if size is not None and order.outstanding_size is not None:
+                # Sizes are quoted to 8 decimals; rounding keeps partial fills from leaving dust behind.
+                order.executed_size = round((order.executed_size or 0.0) + size, 8)
+                order.outstanding_size = max(round(order.outstanding_size - size, 8), 0.0)
+                if order.outstanding_size > 0.0:
                     return order
-            return None
+            self._transition(order, 'COMPLETED')
+            return order
 
     async def cancel(self, order_id: str) -> Order | None:
         """
         Cancel the order with the given ID.
-        :param order_id: The child_order_acceptance_id of the order to cancel.
+        :param order_id: The child_order_acceptance_id (or child_order_id) of the order to cancel.
         :return: The updated order if found, else None.
         """
+        return await self._close(order_id, 'CANCELED')
+
+    async def cancel_many(self, order_ids: Iterable[str]) -> List[Order]:
+        """
+        Cancel several orders under one lock acquisition.
+        :param order_ids: The child_order_acceptance_ids (or child_order_ids) of the orders to cancel.
+        :return: The orders that were canceled; unknown or already terminal orders are skipped.
+        """
         async with self.lock:
-            for order in self._orders:
-                if order.child_order_acceptance_id == order_id and order.child_order_state == 'ACTIVE':
-                    order.child_order_state = 'CANCELED'
-                    return order
-            return None
+            return [order for order in (self._finish(order_id, 'CANCELED') for order_id in order_ids) if order is not None]
+
+    async def cancel_all(self, product_code: str = None) -> List[Order]:
+        """
+        Cancel every live order under one lock acquisition, e.g. once the exchange confirmed a cancel-all.
+        :param product_code: If given, only orders of this product are canceled.
+        :return: The orders that were canceled.
+        """
+        async with self.lock:
+            orders = [order for order in self._orders.values() if product_code is None or order.product_code == product_code]
+            for order in orders:
+                self._transition(order, 'CANCELED')
+            return orders
+
+    async def reject(self, order_id: str) -> Order | None:
+        """
+        Mark the order with the given ID as REJECTED, after its ORDER_FAILED event.
+        :param order_id: The child_order_acceptance_id (or child_order_id) of the order.
+        :return: The updated order if found, else None.
+        """
+        return await self._close(order_id, 'REJECTED')
+
+    async def expire(self, order_id: str) -> Order | None:
+        """
+        Mark the order with the given ID as EXPIRED, after its EXPIRE event.
+        :param order_id: The child_order_acceptance_id (or child_order_id) of the order.
+        :return: The updated order if found, else None.
+        """
+        return await self._close(order_id, 'EXPIRED')
+
+    async def get_order(self, order_id: str) -> Order | None:
+        """
+        Get an order by its child_order_acceptance_id or child_order_id, including archived orders.
+        :param order_id: The ID of the order.
+        :return: The order if found, else None.
+        """
+        async with self.lock:
+            order = self._lookup(order_id)
+            if order is None:
+                archived = self._archive.get(order_id)
+                order = archived[1] if archived is not None else None
+            return order
+
+    async def get_orders(self, state: str = None) -> List[Order]:
+        """
+        Get the live orders.
+        :param state: If given, only orders in this `child_order_state` are returned.
+        :return: A list of orders.
+        """
+        async with self.lock:
+            if state is None:
+                return list(self._orders.values())
+            return list(self._states.get(state, {}).values())
+
+    async def get_archived_orders(self) -> List[Order]:
+        """
+        Get the archived orders, oldest first.
+        :return: A list of orders that reached a terminal state.
+        """
+        async with self.lock:
+            self._evict()
+            return [order for _, order in self._archive.values()]
 
-    async def get_orders(self) -> List[Order]:
+    async def _close(self, order_id: str, state: str) -> Order | None:
+        """
+        Move a live order to a terminal state.
+        """
         async with self.lock:
-            return self._orders.copy()
+            return self._finish(order_id, state)
+
+    def _finish(self, order_id: str, state: str) -> Order | None:
+        """
+        Move a live order to a terminal state; the caller holds the lock.
+        """
+        order = self._lookup(order_id)
+        if order is None or order.child_order_state not in LIVE_STATES:
+            return None
+        self._transition(order, state)
+        return order
+
+    def _lookup(self, order_id: str) -> Order | None:
+        """
+        Find a live order by child_order_acceptance_id, falling back to child_order_id.
+        """
+        order = self._orders.get(order_id)
+        if order is None:
+            acceptance_id = self._child_order_id_index.get(order_id)
+            if acceptance_id is not None:
+                order = self._orders.get(acceptance_id)
+        return order
+
+    def _insert(self, order: Order) -> None:
+        """
+        Insert an order into the indexes, or into the archive if it is already terminal.
+        """
+        if order.child_order_state in TERMINAL_STATES:
+            self._archive_order(order)
+            return
+        self._orders[order.child_order_acceptance_id] = order
+        if order.child_order_id is not None:
+            self._child_order_id_index[order.child_order_id] = order.child_order_acceptance_id
+        self._states.setdefault(order.child_order_state, {})[order.child_order_acceptance_id] = order
+
+    def _remove(self, order: Order) -> None:
+        """
+        Remove a live order from all indexes.
+        """
+        self._orders.pop(order.child_order_acceptance_id, None)
+        if order.child_order_id is not None:
+            self._child_order_id_index.pop(order.child_order_id, None)
+        partition = self._states.get(order.child_order_state)
+        if partition is not None:
+            partition.pop(order.child_order_acceptance_id, None)
+        self._pending_since.pop(order.child_order_acceptance_id, None)
+
+    def _transition(self, order: Order, state: str) -> None:
+        """
+        Move a live order to another state partition, archiving it if the state is terminal.
+        """
+        self._remove(order)
+        order.child_order_state = state
+        self._insert(order)
+
+    def _archive_order(self, order: Order) -> None:
+        """
+        Append a terminal order to the archive and evict entries beyond the retention limits.
+        """
+        self._archive.pop(order.child_order_acceptance_id, None)
+        self._archive[order.child_order_acceptance_id] = (time.monotonic(), order)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Drop archived orders exceeding the retention count or age.
+        """
+        while len(self._archive) > self.archive_size:
+            self._archive.popitem(last=False)
+        if self.archive_age is not None:
+            deadline = time.monotonic() - self.archive_age
+            while self._archive and next(iter(self._archive.values()))[0] < deadline:
+                self._archive.popitem(last=False)
 
     def __len__(self):
         return len(self._orders)
 
-    def __init__(self):
+    def __init__(self,
+                 archive_size: int = 1000,
+                 archive_age: float = 3600.0,
+                 pending_timeout: float = 30.0):
         """
         Initialize the OrderBook service.
         This service can be extended to include methods for managing order book data.
+        :param archive_size: The maximum number of terminal orders kept in the archive.
+        :param archive_age: The maximum age in seconds of terminal orders kept in the archive, or None for no limit.
+        :param pending_timeout: The number of seconds a PENDING order is kept across syncs while the exchange
+                                does not list it, i.e. how long its ORDER event is waited for.
         """
-        self.lock = asyncio.Lock()
\ No newline at end of file
+        self.lock = InstrumentedLock('order_book')
+        self.archive_size = archive_size
+        self.archive_age = archive_age
+        self.pending_timeout = pending_timeout
+        self._orders: Dict[str, Order] = {}
+        self._child_order_id_index: Dict[str, str] = {}
+        self._states: Dict[str, Dict[str, Order]] = {}
+        self._archive: OrderedDict = OrderedDict()
+        # The time each PENDING order was added at, by child_order_acceptance_id.
+        self._pending_since: Dict[str, float] = {}
\ No newline at end of file
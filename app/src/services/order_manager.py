@@ -0,0 +1,260 @@
+from typing import Dict, Literal, Set
+from collections import OrderedDict
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.metrics import MetricsRegistry
+from services.latency_histogram import LatencyHistogram
+from services.order_book import Order, OrderBook
+from services.position_book import PositionBook
+from services.exchange_clients.exchange_client import ExchangeClient
+
+class InFlightOrder:
+    """
+    An order sent by the `OrderManager` that has not reached a terminal state yet.
+    """
+    __slots__ = ('side', 'size', 'price', 'order_type', 'submitted_at', 'accepted_at', 'acknowledged_at', 'child_order_acceptance_id')
+
+    def __init__(self, side: str, size: float, price: float, order_type: str):
+        self.side = side
+        self.size = size
+        self.price = price
+        self.order_type = order_type
+        self.submitted_at = time.perf_counter_ns()
+        self.accepted_at: int = None
+        self.acknowledged_at: int = None
+        self.child_order_acceptance_id: str = None
+
+class OrderManager:
+    """
+    Sends orders without blocking the caller.
+    `submit` only reserves the side and schedules the REST request; once the exchange returns a
+    `child_order_acceptance_id`, the order is inserted into the `OrderBook` as PENDING, and the later
+    ORDER event of `child_order_events` reconciles it to ACTIVE. At most one order per side is in flight,
+    from submission until the order is completed, canceled, expired or rejected, so the agent never
+    stacks duplicate same-side orders. The latency from submission to the REST response and to the
+    ORDER event is recorded per order. `flatten` cancels every order and closes the position at once.
+    """
+    order_size: float
+    order_type: Literal['LIMIT', 'MARKET']
+    ack_timeout: float
+    unmatched_size: int = 100
+    submitted_count: int = 0
+    duplicate_count: int = 0
+    failed_count: int = 0
+
+    def submit(self,
+               side: Literal['BUY', 'SELL'],
+               size: float = None,
+               price: float = None,
+               order_type: Literal['LIMIT', 'MARKET'] = None,
+               force: bool = False) -> asyncio.Task | None:
+        """
+        Schedule an order without waiting for the exchange.
+        Must be called on the event loop.
+        :param side: 'BUY' or 'SELL'.
+        :param size: The order size; defaults to `order_size`.
+        :param price: The limit price; None for market orders.
+        :param order_type: 'LIMIT' or 'MARKET'; defaults to `order_type`.
+        :param force: Send the order even if an order on the same side is still in flight.
+        :return: The task sending the order, or None if an order on the same side is still in flight.
+                 The manager holds the task until it is done, so callers may drop it.
+        """
+        side = side.upper()
+        in_flight = self._in_flight.get(side)
+        if in_flight is not None and not force:
+            self.duplicate_count += 1
+            self.logger.system.debug("Skipped a %s order: %s is still in flight.", side, in_flight.child_order_acceptance_id or 'a request')
+            return None
+        order = InFlightOrder(side, size or self.order_size, price, (order_type or self.order_type).upper())
+        self._in_flight[side] = order
+        self.submitted_count += 1
+        task = asyncio.get_running_loop().create_task(self._send(order))
+        # The loop only keeps weak references to tasks, so they are held until they are done.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @inject
+    async def flatten(self,
+                      exchange_client: ExchangeClient = Provide['exchange_client'],
+                      order_book: OrderBook = Provide['order_book'],
+                      position_book: PositionBook = Provide['position_book'],
+                      config: dict = Provide['config']) -> dict:
+        """
+        Cancel every open order, then close the net position with a market order.
+        Cancels are sent as one cancel-all request rather than one request per order, and once it succeeds
+        the live orders are marked CANCELED in the order book under one lock acquisition. The closing order
+        is only sent afterwards, so that the cancel-all cannot cancel it. An order that fills before its
+        cancel lands leaves a residual position, which the next call closes.
+        :param exchange_client: The exchange client.
+        :param order_book: The order book holding the live orders.
+        :param position_book: The position book holding the net position.
+        :param config: Configuration dictionary containing currency codes.
+        :return: A dictionary with the cancel-all response and the acceptance ID of the closing order, if any.
+        """
+        symbol = config.get('crypto_currency_code')
+        try:
+            canceled = await exchange_client.cancel_all_orders(symbol)
+        except Exception as e:
+            # The position is closed regardless, as it is the larger risk.
+            self.logger.system.error("Canceling every order failed while flattening: %s", e)
+            canceled = e
+        else:
+            await order_book.cancel_all(symbol)
+        net_size = round(position_book.net_size, 8)
+        child_order_acceptance_id = None
+        if net_size != 0.0:
+            child_order_acceptance_id = await self.submit('SELL' if net_size > 0.0 else 'BUY', size=abs(net_size), order_type='MARKET', force=True)
+        self.logger.system.info("Flattened %s: canceled every order and closed %s.", symbol, net_size)
+        return {'cancel_all': canceled, 'child_order_acceptance_id': child_order_acceptance_id}
+
+    def is_in_flight(self, side: Literal['BUY', 'SELL']) -> bool:
+        return side.upper() in self._in_flight
+
+    def acknowledge(self, child_order_acceptance_id: str) -> None:
+        """
+        Record that the ORDER event of an order sent by this manager was received.
+        :param child_order_acceptance_id: The acceptance ID of the order.
+        """
+        order = self._accepted.get(child_order_acceptance_id)
+        if order is None:
+            self._remember(child_order_acceptance_id, 0, time.perf_counter_ns())
+            return
+        if order.acknowledged_at is not None:
+            return
+        order.acknowledged_at = time.perf_counter_ns()
+        latency = order.acknowledged_at - order.submitted_at
+        self.ack_latencies.record(latency)
+        self._ack_seconds.observe(latency / 1e9)
+        self.logger.system.debug("Order %s acknowledged %.1f ms after submission.", child_order_acceptance_id, latency / 1e6)
+
+    def release(self, child_order_acceptance_id: str) -> None:
+        """
+        Free the side of an order that reached a terminal state, so that the next order on it can be sent.
+        :param child_order_acceptance_id: The acceptance ID of the order.
+        """
+        order = self._accepted.pop(child_order_acceptance_id, None)
+        if order is None:
+            self._remember(child_order_acceptance_id, 1, True)
+        elif self._in_flight.get(order.side) is order:
+            del self._in_flight[order.side]
+
+    def get_stats(self) -> dict:
+        """
+        Returns the order counters and the submit-to-response and submit-to-ack latencies in microseconds.
+        """
+        return {
+            'submitted': self.submitted_count,
+            'duplicates': self.duplicate_count,
+            'failed': self.failed_count,
+            'in_flight': {side: order.child_order_acceptance_id for side, order in self._in_flight.items()},
+            'response_latency_us': self.response_latencies.snapshot(),
+            'ack_latency_us': self.ack_latencies.snapshot(),
+        }
+
+    @inject
+    async def _send(self,
+                    order: InFlightOrder,
+                    exchange_client: ExchangeClient = Provide['exchange_client'],
+                    order_book: OrderBook = Provide['order_book'],
+                    config: dict = Provide['config']) -> str | None:
+        """
+        Send the order and insert it into the order book as PENDING once it is accepted.
+        :return: The acceptance ID of the order, or None if the request failed.
+        """
+        symbol = config.get('crypto_currency_code')
+        try:
+            response = await exchange_client.create_order(symbol, order.side.lower(), order.size, order.price, order.order_type.lower())
+            child_order_acceptance_id = response.get('child_order_acceptance_id') if isinstance(response, dict) else None
+            if not child_order_acceptance_id:
+                raise ValueError(f"No child_order_acceptance_id in the response: {response}")
+        except Exception as e:
+            self.failed_count += 1
+            self._failed.inc()
+            if self._in_flight.get(order.side) is order:
+                del self._in_flight[order.side]
+            self.logger.system.error("Sending a %s order of %s failed: %s", order.side, order.size, e)
+            return None
+
+        order.accepted_at = time.perf_counter_ns()
+        order.child_order_acceptance_id = child_order_acceptance_id
+        self._accepted[child_order_acceptance_id] = order
+        latency = order.accepted_at - order.submitted_at
+        self.response_latencies.record(latency)
+        self._response_seconds.observe(latency / 1e9)
+        # The events of the order may have been handled before the REST response arrived.
+        acknowledged_at, released = self._unmatched.pop(child_order_acceptance_id, (None, False))
+        if acknowledged_at is not None:
+            order.acknowledged_at = acknowledged_at
+            self.ack_latencies.record(acknowledged_at - order.submitted_at)
+            self._ack_seconds.observe((acknowledged_at - order.submitted_at) / 1e9)
+        if released:
+            self.release(child_order_acceptance_id)
+
+        # The ORDER event may already have been handled; the book then keeps the ACTIVE entry.
+        await order_book.add_pending(Order(
+            product_code=symbol,
+            side=order.side,
+            child_order_type=order.order_type,
+            price=order.price or 0.0,
+            size=order.size,
+            child_order_acceptance_id=child_order_acceptance_id
+        ))
+        if order.acknowledged_at is None:
+            asyncio.get_running_loop().call_later(self.ack_timeout, self._expire, order)
+
+        self.logger.transaction.info('Order sent, Order ID: %s, Side: %s, Price: %s, Size: %s', child_order_acceptance_id, order.side, order.price, order.size,
+                                     extra={'fields': {'event_type': 'ORDER_SENT', 'child_order_acceptance_id': child_order_acceptance_id, 'side': order.side,
+                                                       'price': order.price, 'size': order.size, 'response_latency': latency / 1e9}})
+        return child_order_acceptance_id
+
+    def _remember(self, child_order_acceptance_id: str, field: int, value) -> None:
+        """
+        Keep an event for an order that is not known yet, in case its REST response is still on the way.
+        Events of orders not sent by this manager end up here too, so only the newest `unmatched_size` are kept.
+        """
+        entry = self._unmatched.setdefault(child_order_acceptance_id, [None, False])
+        entry[field] = value
+        while len(self._unmatched) > self.unmatched_size:
+            self._unmatched.popitem(last=False)
+
+    def _expire(self, order: InFlightOrder) -> None:
+        """
+        Free the side of an accepted order whose ORDER event did not arrive within `ack_timeout`.
+        """
+        if order.acknowledged_at is None and order.child_order_acceptance_id in self._accepted:
+            self.logger.system.warning("No ORDER event for %s within %s seconds; releasing the %s side.", order.child_order_acceptance_id, self.ack_timeout, order.side)
+            self.release(order.child_order_acceptance_id)
+
+    @inject
+    def __init__(self,
+                 order_size: float = 0.001,
+                 order_type: Literal['LIMIT', 'MARKET'] = 'MARKET',
+                 ack_timeout: float = 30.0,
+                 metrics: MetricsRegistry = Provide['metrics'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the order manager.
+        :param order_size: The default order size.
+        :param order_type: The default order type.
+        :param ack_timeout: The number of seconds after acceptance within which the ORDER event is expected;
+                            past it the side is released so that a lost event cannot block it forever.
+        :param metrics: The metrics registry.
+        :param logger: The logger service.
+        """
+        self.order_size = order_size
+        self.order_type = order_type
+        self.ack_timeout = ack_timeout
+        self.logger = logger
+        self.response_latencies = LatencyHistogram()
+        self.ack_latencies = LatencyHistogram()
+        self._in_flight: Dict[str, InFlightOrder] = {}
+        self._accepted: Dict[str, InFlightOrder] = {}
+        self._unmatched: OrderedDict = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._response_seconds = metrics.histogram('order_response_seconds', 'The time from submitting an order to its REST response.').labels()
+        self._ack_seconds = metrics.histogram('order_ack_seconds', 'The time from submitting an order to its ORDER event.').labels()
+        self._failed = metrics.counter('order_failures_total', 'The orders whose request failed.').labels()
+        metrics.gauge('orders_in_flight', 'The orders sent and not yet terminal.').set_function(lambda: len(self._in_flight))
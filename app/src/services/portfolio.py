@@ -1,48 +1,179 @@
+import time
 import asyncio
 from dependency_injector.wiring import inject, Provide
+from services.metrics import InstrumentedLock
+from services.logger import Logger
 from services.exchange_clients.exchange_client import ExchangeClient
 
 class Portfolio:
     """
     Service for managing portfolio-related operations.
     This service can be extended to include methods for adding, removing, or updating portfolio items.
+    Amounts are kept in a local ledger that is updated in O(1) from each execution event,
+    so reads are served from memory. REST synchronization acts as a reconciliation that reports any drift.
+    Synchronization is single-flight: concurrent callers share one in-flight REST fetch.
     """
     __legal_currency_amount: float
     __crypto_currency_amount: float
     __collateral_amount: float
+    drift_tolerance: float
+    max_deferred_fetches: int
+    margin_trading: bool
+    last_drift: dict = None
+    synced_at: float = None
+    requested_sync_count: int = 0
+    merged_sync_count: int = 0
+    executed_sync_count: int = 0
 
-    @inject
-    async def sync(self, 
-                   exchange_client: ExchangeClient = Provide['exchange_client'],
-                   config: dict = Provide['config']):
+    async def sync(self, fresh_as_of: float = None) -> None:
         """
         Synchronize the portfolio data.
-        This method can be extended to fetch and update portfolio data from an external source.
+        Joins the in-flight fetch if there is one, instead of sending another pair of REST requests.
+        :param fresh_as_of: A `time.monotonic()` timestamp. If the current snapshot was fetched at or after it,
+                            the refresh is skipped. When None, any in-flight or new fetch is accepted.
+        """
+        self.requested_sync_count += 1
+        await self._coalesced_sync(fresh_as_of)
+
+    def apply_execution(self, side: str, price: float, size: float, commission: float = 0.0, realized_pnl: float = 0.0) -> None:
+        """
+        Update the local ledger from an execution event.
+        For margin products (e.g. FX_BTC_JPY) the collateral moves by the realized PnL less the commission,
+        converted at the execution price; for spot products the balances move by the executed notional,
+        with the commission charged in crypto.
+        :param side: The side of the execution, either 'BUY' or 'SELL'.
+        :param price: The execution price.
+        :param size: The executed size.
+        :param commission: The commission charged for the execution, in crypto currency units as reported by the exchange.
+        :param realized_pnl: The PnL realized by offsetting existing positions.
+        """
+        if self.margin_trading:
+            self.__collateral_amount += (realized_pnl or 0.0) - (commission or 0.0) * price
+        else:
+            signed_size = size if side == 'BUY' else -size
+            self.__crypto_currency_amount += signed_size - (commission or 0.0)
+            self.__legal_currency_amount -= signed_size * price
+        self._ledger_version += 1
+
+    def get_sync_stats(self) -> dict:
+        """
+        Returns the counters of the coalescing synchronization.
+        :return: A dictionary with the number of requested, merged and executed syncs.
+        """
+        return {
+            'requested': self.requested_sync_count,
+            'merged': self.merged_sync_count,
+            'executed': self.executed_sync_count,
+        }
+
+    async def _coalesced_sync(self, fresh_as_of: float = None) -> None:
+        """
+        Run or join a fetch until the snapshot is at least as fresh as requested.
+        :param fresh_as_of: The minimum `time.monotonic()` timestamp the snapshot must have been fetched at.
+        """
+        while True:
+            if fresh_as_of is not None and self.synced_at is not None and self.synced_at >= fresh_as_of:
+                self.merged_sync_count += 1
+                return
+            if self._inflight_sync_task is None:
+                break
+            started_at, task = self._inflight_sync_task
+            if fresh_as_of is None or started_at >= fresh_as_of:
+                self.merged_sync_count += 1
+                await asyncio.shield(task)
+                return
+            # The in-flight fetch is older than requested; wait for it and re-check.
+            await asyncio.shield(task)
+
+        started_at = time.monotonic()
+        task = asyncio.get_running_loop().create_task(self._fetch(started_at))
+        self._inflight_sync_task = (started_at, task)
+        self.executed_sync_count += 1
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._inflight_sync_task is not None and self._inflight_sync_task[1] is task:
+                self._inflight_sync_task = None
+
+    @inject
+    async def _fetch(self,
+                     started_at: float,
+                     exchange_client: ExchangeClient = Provide['exchange_client'],
+                     config: dict = Provide['config']) -> None:
+        """
+        Fetch balance and collateral from the exchange and store them.
+        A fetch during which executions were applied is discarded, as it is unknown whether its figures include
+        them. The first one is retried instead, as the ledger has no base yet; after `max_deferred_fetches`
+        attempts its figures are accepted, and any executions they miss show up as drift on the next reconciliation.
+        :param started_at: The time at which the fetch was started; recorded as the snapshot time.
         :param exchange_client: The Bitflyer client for fetching balance and collateral.
         :param config: Configuration dictionary containing currency codes.
         """
-        async with self.lock:
-            balance = exchange_client.get_balance()
-            collateral = exchange_client.get_collateral()
+        for attempt in range(1, self.max_deferred_fetches + 1):
+            ledger_version = self._ledger_version
+            balance, collateral = await asyncio.gather(
+                exchange_client.get_balance(),
+                exchange_client.get_collateral()
+            )
 
-            self.__legal_currency_amount = next(filter(lambda x: x['currency_code'] == config.get('legal_currency_code'), balance), {}).get('amount', 0.0)
-            self.__crypto_currency_amount = next(filter(lambda x: x['currency_code'] == config.get('crypto_currency_code'), balance), {}).get('amount', 0.0)
-            self.__collateral_amount = collateral.get('collateral', 0.0)
+            async with self.lock:
+                legal_currency_amount = next(filter(lambda x: x['currency_code'] == config.get('legal_currency_code'), balance), {}).get('amount', 0.0)
+                crypto_currency_amount = next(filter(lambda x: x['currency_code'] == config.get('crypto_currency_code'), balance), {}).get('amount', 0.0)
+                collateral_amount = collateral.get('collateral', 0.0)
+
+                if self._ledger_version != ledger_version:
+                    if self.synced_at is not None:
+                        # Keep the ledger and reconcile next time.
+                        self.logger.system.info("Portfolio reconciliation deferred: executions arrived during the fetch.")
+                        return
+                    if attempt < self.max_deferred_fetches:
+                        self.logger.system.info("Initial portfolio synchronization retried: executions arrived during the fetch.")
+                        continue
+
+                if self.synced_at is not None:
+                    self.last_drift = {
+                        'legal_currency_amount': legal_currency_amount - self.__legal_currency_amount,
+                        'crypto_currency_amount': crypto_currency_amount - self.__crypto_currency_amount,
+                        'collateral_amount': collateral_amount - self.__collateral_amount,
+                    }
+                    if any(abs(drift) > self.drift_tolerance for drift in self.last_drift.values()):
+                        self.logger.system.warning("Portfolio ledger drifted from the exchange: %s", self.last_drift)
+
+                self.__legal_currency_amount = legal_currency_amount
+                self.__crypto_currency_amount = crypto_currency_amount
+                self.__collateral_amount = collateral_amount
+                self.synced_at = started_at
+                return
 
     async def get_legal_currency_amount(self) -> float:
-        async with self.lock:
-            return self.__legal_currency_amount
+        return self.__legal_currency_amount
 
     async def get_crypto_currency_amount(self) -> float:
-        async with self.lock:
-            return self.__crypto_currency_amount
+        return self.__crypto_currency_amount
 
     async def get_collateral_amount(self) -> float:
-        async with self.lock:
-            return self.__collateral_amount
+        return self.__collateral_amount
 
-    def __init__(self):
+    @inject
+    def __init__(self,
+                 drift_tolerance: float = 1e-8,
+                 max_deferred_fetches: int = 5,
+                 config: dict = Provide['config'],
+                 logger: Logger = Provide['logger']):
         """
         Initialize the PortfolioService with amounts and Bitflyer client.
+        :param drift_tolerance: The absolute difference between ledger and exchange above which drift is reported.
+        :param max_deferred_fetches: The number of attempts of the first synchronization while executions keep arriving.
+        :param config: Configuration dictionary containing currency codes.
+        :param logger: The logger service to log synchronization failures.
         """
-        self.lock = asyncio.Lock()
\ No newline at end of file
+        self.lock = InstrumentedLock('portfolio')
+        self.drift_tolerance = drift_tolerance
+        self.max_deferred_fetches = max_deferred_fetches
+        self.margin_trading = str(config.get('crypto_currency_code') or '').startswith('FX_')
+        self.__legal_currency_amount = 0.0
+        self.__crypto_currency_amount = 0.0
+        self.__collateral_amount = 0.0
+        self._ledger_version = 0
+        self.logger = logger
+        self._inflight_sync_task = None
\ No newline at end of file
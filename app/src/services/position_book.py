@@ -2,6 +2,8 @@ from typing import List, Literal
 import dataclasses
 import asyncio
 from dependency_injector.wiring import inject, Provide
+from services.metrics import InstrumentedLock
+from services.netting_engine import NettingEngine
 from services.exchange_clients.exchange_client import ExchangeClient
 
 @dataclasses.dataclass
@@ -22,8 +24,10 @@ class PositionBook:
     """
     Service for managing position book operations.
     This service can be extended to include methods for adding, removing, or updating positions.
+    Positions are netted FIFO by a `NettingEngine`, whose net size, average price and PnL aggregates
+    are exposed for O(1), lock-free reads.
     """
-    _positions: List[Position] = []
+    product_code: str = None
 
     @inject
     async def sync(self,
@@ -35,9 +39,13 @@ class PositionBook:
         :param exchange_client: The Bitflyer client for fetching position book data.
         """
         async with self.lock:
-            positions = exchange_client.get_positions(symbol=config.get('crypto_currency_code'))
+            positions = await exchange_client.get_positions(symbol=config.get('crypto_currency_code'))
 
-            self._positions = [Position(**position) for position in positions]
+            self.product_code = config.get('crypto_currency_code')
+            self._netting_engine.reset()
+            for position in positions:
+                position = Position(**position)
+                self._netting_engine.add(position.side, position.price, position.size, position.open_date)
 
     async def add_and_settle(self, position: Position) -> float:
         """
@@ -47,30 +55,53 @@ class PositionBook:
         :return: The realized PnL from offsetting, if any.
         """
         async with self.lock:
-            pnl = 0.0
-            for existing in self._positions:
-                if existing.side != position.side and existing.size >= position.size:
-                    # Offset the existing position with the new position
-                    # Calculate PnL based on the offset size
-                    offset_size = min(existing.size, position.size)
-                    pnl += (position.price - existing.price) * offset_size if position.side == 'SELL' else (existing.price - position.price) * offset_size
-                    existing.size -= offset_size
-                    position.size -= offset_size
-                    if existing.size == 0.0:
-                        self._positions.remove(existing)
-                    if position.size == 0.0:
-                        break
-            if position.size > 0:
-                self._positions.append(position)
-            return pnl
+            if self.product_code is None:
+                self.product_code = position.product_code
+            return self._netting_engine.add(position.side, position.price, position.size, position.open_date)
 
     async def get_positions(self) -> List[Position]:
         async with self.lock:
-            return self._positions.copy()
+            return [
+                Position(product_code=self.product_code, side=side, price=lot.price, size=lot.size, open_date=lot.open_date)
+                for side in ('BUY', 'SELL')
+                for lot in self._netting_engine.lots(side)
+            ]
+
+    @property
+    def net_size(self) -> float:
+        """
+        The net position size; positive when long and negative when short.
+        """
+        return self._netting_engine.net_size
+
+    @property
+    def average_price(self) -> float:
+        """
+        The average entry price of the open position, or 0.0 when flat.
+        """
+        return self._netting_engine.average_price
+
+    @property
+    def realized_pnl(self) -> float:
+        """
+        The PnL realized by offsetting positions since the service started.
+        """
+        return self._netting_engine.realized_pnl
+
+    def unrealized_pnl(self, mark_price: float) -> float:
+        """
+        The PnL of the open position valued at the given price.
+        :param mark_price: The price at which to value the open position.
+        """
+        return self._netting_engine.unrealized_pnl(mark_price)
+
+    def __len__(self):
+        return len(self._netting_engine)
 
     def __init__(self):
         """
         Initialize the PositionBook service.
         This service can be extended to include methods for managing position book data.
         """
-        self.lock = asyncio.Lock()
\ No newline at end of file
+        self.lock = InstrumentedLock('position_book')
+        self._netting_engine = NettingEngine()
\ No newline at end of file
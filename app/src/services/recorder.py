@@ -0,0 +1,350 @@
+from typing import Callable, Dict, Iterator, List, Tuple
+import os
+import json
+import mmap
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.s3client import S3Client
+
+# Segment layout:
+#   header  = MAGIC + codec id (1 byte)
+#   chunk   = CHUNK_HEADER(compressed length, raw length, first ts, last ts) + compressed records
+#   record  = RECORD_HEADER(receive ts in ns, channel length, payload length) + channel + payload
+# A JSON index next to each finished segment lists every chunk with its offset, time range and channels.
+MAGIC = b'CTBSEG1\x00'
+CHUNK_HEADER = struct.Struct('<IIqq')
+RECORD_HEADER = struct.Struct('<qHI')
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx.json'
+
+def _zstd_codec() -> Tuple[Callable, Callable]:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=3)
+    decompressor = zstandard.ZstdDecompressor()
+    return compressor.compress, lambda data, size: decompressor.decompress(data, max_output_size=size)
+
+def _lz4_codec() -> Tuple[Callable, Callable]:
+    import lz4.block
+    return (lambda data: lz4.block.compress(data, store_size=False),
+            lambda data, size: lz4.block.decompress(data, uncompressed_size=size))
+
+def _zlib_codec() -> Tuple[Callable, Callable]:
+    return (lambda data: zlib.compress(data, 1), lambda data, size: zlib.decompress(data))
+
+CODECS = {
+    'zstd': (1, _zstd_codec),
+    'lz4': (2, _lz4_codec),
+    'zlib': (3, _zlib_codec),
+}
+
+def get_codec(name: str = 'auto') -> Tuple[str, int, Callable, Callable]:
+    """
+    Returns a chunk codec. With 'auto', the first installed of zstd, lz4 and zlib is picked.
+    :param name: 'auto', or one of 'zstd', 'lz4' and 'zlib'.
+    :return: A tuple of the codec name, its id, the compress function and the decompress function.
+    """
+    names = list(CODECS) if not name or name == 'auto' else [name]
+    for candidate in names:
+        codec_id, factory = CODECS[candidate]
+        try:
+            return (candidate, codec_id, *factory())
+        except ImportError:
+            if candidate == name:
+                raise
+    return ('zlib', CODECS['zlib'][0], *_zlib_codec())
+
+def get_codec_by_id(codec_id: int) -> Tuple[str, int, Callable, Callable]:
+    for name, (candidate_id, _) in CODECS.items():
+        if candidate_id == codec_id:
+            return get_codec(name)
+    raise ValueError(f"Unknown segment codec id {codec_id}")
+
+class SegmentWriter:
+    """
+    Writes records into one segment file, compressing them chunk by chunk.
+    """
+    path: str
+
+    def append_chunk(self, records: List[Tuple[int, bytes, bytes]]) -> None:
+        """
+        Compress and append a chunk of records.
+        :param records: A list of (receive timestamp in ns, channel, payload) tuples in arrival order.
+        """
+        raw = bytearray()
+        channels: Dict[str, int] = {}
+        for received_at, channel, payload in records:
+            raw += RECORD_HEADER.pack(received_at, len(channel), len(payload))
+            raw += channel
+            raw += payload
+            name = channel.decode('utf-8')
+            channels[name] = channels.get(name, 0) + 1
+        compressed = self._compress(bytes(raw))
+        first_ts, last_ts = records[0][0], records[-1][0]
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(len(compressed), len(raw), first_ts, last_ts))
+        self._file.write(compressed)
+        self._file.flush()
+        self._index.append({
+            'offset': offset,
+            'length': CHUNK_HEADER.size + len(compressed),
+            'first_ts': first_ts,
+            'last_ts': last_ts,
+            'count': len(records),
+            'channels': channels,
+        })
+
+    @property
+    def size(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> str:
+        """
+        Close the segment and write its index.
+        :return: The path of the index file.
+        """
+        self._file.close()
+        index_path = self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        with open(index_path, 'w') as file:
+            json.dump({'codec': self._codec_name, 'chunks': self._index}, file)
+        return index_path
+
+    def __init__(self, path: str, codec: str = 'auto'):
+        """
+        :param path: The path of the segment file to create.
+        :param codec: The chunk codec ('auto', 'zstd', 'lz4' or 'zlib').
+        """
+        self.path = path
+        self._codec_name, codec_id, self._compress, _ = get_codec(codec)
+        self._index: List[dict] = []
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + bytes([codec_id]))
+
+class SegmentReader:
+    """
+    Reads the records of a segment file.
+    The file is memory-mapped and decompressed one chunk at a time, so only one chunk is held in memory.
+    """
+    path: str
+
+    def chunks(self, start_ts: int = None, end_ts: int = None) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        Iterate over the chunk headers overlapping a time range.
+        :param start_ts: The earliest receive timestamp of interest, in ns.
+        :param end_ts: The latest receive timestamp of interest, in ns.
+        :return: An iterator of (offset, compressed length, raw length, first ts) tuples.
+        """
+        offset = len(MAGIC) + 1
+        while offset + CHUNK_HEADER.size <= len(self._mmap):
+            compressed_length, raw_length, first_ts, last_ts = CHUNK_HEADER.unpack_from(self._mmap, offset)
+            if offset + CHUNK_HEADER.size + compressed_length > len(self._mmap):
+                # A chunk truncated by a crash while the segment was being written.
+                return
+            if (start_ts is None or last_ts >= start_ts) and (end_ts is None or first_ts <= end_ts):
+                yield offset + CHUNK_HEADER.size, compressed_length, raw_length, first_ts
+            offset += CHUNK_HEADER.size + compressed_length
+
+    def records(self, start_ts: int = None, end_ts: int = None, channels: set = None) -> Iterator[Tuple[int, str, bytes]]:
+        """
+        Iterate over the records in arrival order.
+        :param start_ts: The earliest receive timestamp to return, in ns.
+        :param end_ts: The latest receive timestamp to return, in ns.
+        :param channels: If given, only records of these channels are returned.
+        :return: An iterator of (receive timestamp in ns, channel, payload) tuples.
+        """
+        for offset, compressed_length, raw_length, _ in self.chunks(start_ts, end_ts):
+            raw = self._decompress(self._mmap[offset:offset + compressed_length], raw_length)
+            position = 0
+            while position < len(raw):
+                received_at, channel_length, payload_length = RECORD_HEADER.unpack_from(raw, position)
+                position += RECORD_HEADER.size
+                channel = raw[position:position + channel_length].decode('utf-8')
+                position += channel_length
+                payload = raw[position:position + payload_length]
+                position += payload_length
+                if start_ts is not None and received_at < start_ts:
+                    continue
+                if end_ts is not None and received_at > end_ts:
+                    return
+                if channels is not None and channel not in channels:
+                    continue
+                yield received_at, channel, payload
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the segment file to read.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a recorded segment")
+        _, _, _, self._decompress = get_codec_by_id(self._mmap[len(MAGIC)])
+
+def list_segments(directory: str) -> List[str]:
+    """
+    List the segment files of a recording directory in chronological order.
+    Segment names embed their start time, so lexical order is chronological.
+    """
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+class Recorder:
+    """
+    Records every received WebSocket frame into append-only, chunk-compressed segment files.
+    `record` only enqueues the raw frame with its receive timestamp; batching, compression, disk I/O,
+    rotation and the optional S3 offload of finished segments all happen on a background writer thread.
+    """
+    enabled: bool
+    directory: str
+
+    def record(self, channel: str, payload: str | bytes, received_at: int) -> None:
+        """
+        Enqueue a frame for recording. This never blocks and does no I/O.
+        :param channel: The channel of the frame.
+        :param payload: The raw frame as received.
+        :param received_at: The receive timestamp in nanoseconds since the epoch.
+        """
+        if self.enabled:
+            self._queue.put_nowait((received_at, channel, payload))
+
+    def start(self) -> None:
+        """
+        Start the writer thread.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self._thread.start()
+        self.logger.system.info("Recording market data to %s.", self.directory)
+
+    def stop(self) -> None:
+        """
+        Flush pending frames, close the current segment and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._uploader.shutdown(wait=True)
+
+    def _run(self) -> None:
+        writer: SegmentWriter = None
+        segment_started_at = 0.0
+        records: List[Tuple[int, bytes, bytes]] = []
+        chunk_bytes = 0
+        chunk_started_at = 0.0
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            if item is None:
+                running = False
+            elif item:
+                received_at, channel, payload = item
+                if isinstance(payload, str):
+                    payload = payload.encode('utf-8')
+                if not records:
+                    chunk_started_at = time.monotonic()
+                records.append((received_at, channel.encode('utf-8'), payload))
+                chunk_bytes += len(payload)
+
+            now = time.monotonic()
+            if records and (not running or chunk_bytes >= self.chunk_size or now - chunk_started_at >= self.flush_interval):
+                try:
+                    if writer is None:
+                        writer = SegmentWriter(os.path.join(self.directory, f"{self.prefix}-{records[0][0]}{SEGMENT_SUFFIX}"), codec=self.codec)
+                        segment_started_at = now
+                    writer.append_chunk(records)
+                except Exception as e:
+                    self.logger.system.error("Recording a chunk of %d frames failed: %s", len(records), e)
+                records = []
+                chunk_bytes = 0
+
+            if writer is not None and (not running or writer.size >= self.segment_size or now - segment_started_at >= self.segment_duration):
+                self._finish(writer)
+                writer = None
+
+    def _finish(self, writer: SegmentWriter) -> None:
+        try:
+            index_path = writer.close()
+        except Exception as e:
+            self.logger.system.error("Closing segment %s failed: %s", writer.path, e)
+            return
+        if self.s3client is not None and self.s3_prefix is not None:
+            self._uploader.submit(self._offload, writer.path, index_path)
+
+    def _offload(self, *paths: str) -> None:
+        for path in paths:
+            try:
+                self.s3client.upload_file(path, f"{self.s3_prefix.rstrip('/')}/{os.path.basename(path)}")
+            except Exception as e:
+                self.logger.system.error("Offloading %s failed: %s", path, e)
+                return
+        if self.delete_after_offload:
+            for path in paths:
+                os.remove(path)
+
+    @inject
+    def __init__(self,
+                 directory: str = 'recordings',
+                 enabled: bool = False,
+                 codec: str = 'auto',
+                 chunk_size: int = 1 << 20,
+                 flush_interval: float = 1.0,
+                 segment_size: int = 256 << 20,
+                 segment_duration: float = 3600.0,
+                 prefix: str = 'market',
+                 s3_prefix: str = None,
+                 delete_after_offload: bool = False,
+                 s3client: S3Client = Provide['s3client'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the recorder.
+        :param directory: The directory segment files are written to.
+        :param enabled: Whether frames are recorded.
+        :param codec: The chunk codec ('auto', 'zstd', 'lz4' or 'zlib').
+        :param chunk_size: The number of raw payload bytes after which a chunk is compressed and written.
+        :param flush_interval: The maximum number of seconds a frame waits before its chunk is written.
+        :param segment_size: The file size in bytes after which the segment is rotated.
+        :param segment_duration: The number of seconds after which the segment is rotated.
+        :param prefix: The file name prefix of the segments.
+        :param s3_prefix: The S3 key prefix finished segments are uploaded under, or None to keep them local.
+        :param delete_after_offload: Whether to delete local files once uploaded.
+        :param s3client: The S3 client used to offload finished segments.
+        :param logger: The logger service.
+        """
+        self.directory = directory
+        self.enabled = bool(enabled)
+        self.codec = codec
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.prefix = prefix
+        self.s3_prefix = s3_prefix
+        self.delete_after_offload = delete_after_offload
+        self.s3client = s3client if s3_prefix else None
+        self.logger = logger
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread = None
+        self._uploader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recorder-offload')
\ No newline at end of file
@@ -0,0 +1,288 @@
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Sequence, Set, Tuple
+from enum import IntEnum
+import contextvars
+import heapq
+import itertools
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.metrics import MetricsRegistry
+from services.exchange_clients.exchange_client import ExchangeClient
+
+class Priority(IntEnum):
+    """
+    Request classes, most urgent first.
+    """
+    CANCEL = 0
+    ORDER = 1
+    READ = 2
+    HEALTH = 3
+
+class TokenBucket:
+    """
+    A token bucket holding up to `capacity` tokens, refilled continuously at `capacity / period` per second.
+    """
+    capacity: float
+    period: float
+
+    def available(self, now: float) -> float:
+        """
+        The number of tokens available at the given time.
+        :param now: A `time.monotonic()` timestamp.
+        """
+        self._refill(now)
+        return self._tokens
+
+    def take(self, now: float, tokens: float = 1.0) -> None:
+        self._refill(now)
+        self._tokens -= tokens
+
+    def wait_time(self, now: float, tokens: float) -> float:
+        """
+        The number of seconds until `tokens` tokens are available.
+        """
+        self._refill(now)
+        return max(tokens - self._tokens, 0.0) / self._rate
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated_at:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self._rate)
+            self._updated_at = now
+
+    def __init__(self, capacity: float, period: float):
+        """
+        :param capacity: The number of requests allowed per period.
+        :param period: The period in seconds.
+        """
+        self.capacity = capacity
+        self.period = period
+        self._rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+
+class RequestScheduler:
+    """
+    Grants REST requests against token buckets that mirror the exchange's request limits.
+    Waiting requests are granted by priority class (cancels, then new orders, then reads, then health
+    polling), and each class may only draw a bucket down to its reserve, so bursts of reads never consume
+    the tokens that cancels and orders need. A request waiting for one exhausted bucket, e.g. the small
+    order limit, does not hold up the requests that only draw on other buckets. Reads that are identical
+    to one still waiting are coalesced into it instead of being queued again. A request is sent in the
+    context of the caller that submitted it, so that it stamps the caller's trace. A caller that is cancelled while its order or
+    cancel is still waiting withdraws it; coalesced reads are shared, so they are sent regardless.
+    """
+    limits: Dict[str, Tuple[float, float]]
+    reserves: Dict[Priority, float]
+    granted_count: int = 0
+    coalesced_count: int = 0
+
+    async def submit(self,
+                     priority: Priority,
+                     buckets: Sequence[str],
+                     request: Callable[[], Awaitable[Any]],
+                     coalesce_key: tuple = None) -> Any:
+        """
+        Wait for a grant and send the request.
+        :param priority: The class of the request.
+        :param buckets: The names of the buckets the request draws a token from; unconfigured buckets are ignored.
+        :param request: A function returning the request coroutine; it is only called once granted.
+        :param coalesce_key: Requests with the same key that are waiting at the same time share one response.
+        :return: The response of the request.
+        """
+        if coalesce_key is not None:
+            future = self._waiting.get(coalesce_key)
+            if future is not None:
+                self.coalesced_count += 1
+                return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        buckets = tuple(name for name in buckets if name in self.buckets)
+        heapq.heappush(self._queue, (priority, next(self._sequence), buckets, request, future, coalesce_key, contextvars.copy_context()))
+        if coalesce_key is not None:
+            self._waiting[coalesce_key] = future
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if coalesce_key is not None:
+            # Other callers may join the request, so one of them being cancelled must not cancel it.
+            return await asyncio.shield(future)
+        # Cancelling the caller cancels the future, and a request that has not been granted yet is then dropped.
+        return await future
+
+    def get_headroom(self) -> dict:
+        """
+        Returns the tokens left in each bucket and the number of waiting requests per class.
+        :return: A dictionary with, per bucket, the available tokens, the capacity and their ratio,
+                 and the queue depth per priority class.
+        """
+        now = time.monotonic()
+        waiting = {priority.name.lower(): 0 for priority in Priority}
+        for entry in self._queue:
+            waiting[Priority(entry[0]).name.lower()] += 1
+        return {
+            'buckets': {
+                name: {'available': bucket.available(now), 'capacity': bucket.capacity, 'ratio': bucket.available(now) / bucket.capacity}
+                for name, bucket in self.buckets.items()
+            },
+            'waiting': waiting,
+            'granted': self.granted_count,
+            'coalesced': self.coalesced_count,
+        }
+
+    async def _run(self) -> None:
+        """
+        Grant waiting requests, most urgent first, as soon as their buckets allow it.
+        A request waiting for an exhausted bucket does not hold up less urgent ones drawing on other buckets;
+        on a shared bucket the larger reserve of a less urgent class keeps it behind the more urgent one.
+        """
+        while self._queue:
+            now = time.monotonic()
+            delay = None
+            for entry in sorted(self._queue):
+                priority, _, buckets, request, future, coalesce_key, context = entry
+                if future.cancelled():
+                    self._remove(entry)
+                    continue
+                wait = 0.0
+                for name in buckets:
+                    bucket = self.buckets[name]
+                    # A class may only draw the bucket down to its reserve, which keeps tokens for more urgent classes.
+                    wait = max(wait, bucket.wait_time(now, 1.0 + self.reserves.get(Priority(priority), 0.0) * bucket.capacity))
+                if wait > 0.0:
+                    delay = wait if delay is None else min(delay, wait)
+                    continue
+
+                self._remove(entry)
+                for name in buckets:
+                    self.buckets[name].take(now)
+                if coalesce_key is not None and self._waiting.get(coalesce_key) is future:
+                    del self._waiting[coalesce_key]
+                self.granted_count += 1
+                task = asyncio.get_running_loop().create_task(self._send(request, future), context=context)
+                # The loop only keeps weak references to tasks, so they are held until they are done.
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            if delay is not None:
+                self._wakeup.clear()
+                try:
+                    # A request that fits may arrive in the meantime.
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _remove(self, entry: tuple) -> None:
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+
+    async def _send(self, request: Callable[[], Awaitable[Any]], future: asyncio.Future) -> None:
+        try:
+            result = await request()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    @inject
+    def __init__(self,
+                 limits: Dict[str, List[float]] = None,
+                 reserves: Dict[str, float] = None,
+                 metrics: MetricsRegistry = Provide['metrics'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the request scheduler.
+        :param limits: For each bucket name, the number of requests allowed and the period in seconds.
+        :param reserves: For each priority class name ('cancel', 'order', 'read', 'health'), the fraction of
+                         every bucket that the class leaves for more urgent classes.
+        :param metrics: The metrics registry exposing the headroom of each bucket.
+        :param logger: The logger service.
+        """
+        self.limits = {name: (capacity, period) for name, (capacity, period) in (limits or {}).items()}
+        self.reserves = {Priority[name.upper()]: reserve for name, reserve in (reserves or {}).items()}
+        self.buckets = {name: TokenBucket(capacity, period) for name, (capacity, period) in self.limits.items()}
+        self.logger = logger
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._waiting: Dict[tuple, asyncio.Future] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        headroom = metrics.gauge('request_bucket_tokens', 'The requests left in each rate limit bucket.', ['bucket'])
+        for name, bucket in self.buckets.items():
+            headroom.labels(name).set_function(lambda bucket=bucket: bucket.available(time.monotonic()))
+        waiting = metrics.gauge('request_queue_depth', 'The requests waiting for a rate limit grant.')
+        waiting.set_function(lambda: len(self._queue))
+
+class ScheduledExchangeClient(ExchangeClient):
+    """
+    An `ExchangeClient` that routes every request of the wrapped client through the `RequestScheduler`.
+    Every request draws from the 'ip' bucket, private ones also from 'private', and order placement and
+    cancellation also from 'orders' ('small_orders' as well for orders of at most `small_order_size`).
+    Reads and health checks are coalesced. `cancel_orders` fans out through `cancel_order`, so each of
+    its requests is scheduled as a cancel.
+    """
+    @property
+    def exchange_name(self) -> str:
+        return self.client.exchange_name
+
+    async def get_ticker(self, symbol: str) -> dict:
+        return await self.scheduler.submit(Priority.READ, ('ip',), lambda: self.client.get_ticker(symbol), ('get_ticker', symbol))
+
+    async def get_board(self, symbol: str) -> dict:
+        return await self.scheduler.submit(Priority.READ, ('ip',), lambda: self.client.get_board(symbol), ('get_board', symbol))
+
+    async def get_health(self, symbol: str) -> dict:
+        return await self.scheduler.submit(Priority.HEALTH, ('ip',), lambda: self.client.get_health(symbol), ('get_health', symbol))
+
+    async def get_balance(self) -> list:
+        return await self.scheduler.submit(Priority.READ, ('ip', 'private'), self.client.get_balance, ('get_balance',))
+
+    async def get_collateral(self) -> dict:
+        return await self.scheduler.submit(Priority.READ, ('ip', 'private'), self.client.get_collateral, ('get_collateral',))
+
+    async def create_order(self, symbol: str, side: Literal["buy", "sell"], size: float, price: float = None, order_type: str = Literal["limit", "market"]) -> dict:
+        buckets = ('ip', 'private', 'orders', 'small_orders') if size <= self.small_order_size else ('ip', 'private', 'orders')
+        return await self.scheduler.submit(Priority.ORDER, buckets, lambda: self.client.create_order(symbol, side, size, price, order_type))
+
+    async def cancel_order(self, order_id: str, symbol: str = None) -> dict:
+        return await self.scheduler.submit(Priority.CANCEL, ('ip', 'private', 'orders'), lambda: self.client.cancel_order(order_id, symbol))
+
+    async def cancel_all_orders(self, symbol: str) -> dict:
+        return await self.scheduler.submit(Priority.CANCEL, ('ip', 'private', 'orders'), lambda: self.client.cancel_all_orders(symbol))
+
+    async def create_parent_order(self,
+                                  symbol: str,
+                                  order_method: Literal["SIMPLE", "IFD", "OCO", "IFDOCO"],
+                                  parameters: List[dict],
+                                  minute_to_expire: int = None,
+                                  time_in_force: Literal["GTC", "IOC", "FOK"] = None) -> dict:
+        size = max((leg.get('size', 0.0) for leg in parameters), default=0.0)
+        buckets = ('ip', 'private', 'orders', 'small_orders') if size <= self.small_order_size else ('ip', 'private', 'orders')
+        return await self.scheduler.submit(Priority.ORDER, buckets, lambda: self.client.create_parent_order(symbol, order_method, parameters, minute_to_expire, time_in_force))
+
+    async def get_orders(self, symbol: str, order_state: str = None) -> list:
+        return await self.scheduler.submit(Priority.READ, ('ip', 'private'), lambda: self.client.get_orders(symbol, order_state), ('get_orders', symbol, order_state))
+
+    async def get_positions(self, symbol: str) -> dict:
+        return await self.scheduler.submit(Priority.READ, ('ip', 'private'), lambda: self.client.get_positions(symbol), ('get_positions', symbol))
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    @inject
+    def __init__(self,
+                 client: ExchangeClient,
+                 small_order_size: float = 0.1,
+                 scheduler: RequestScheduler = Provide['request_scheduler']):
+        """
+        :param client: The exchange client that sends the requests.
+        :param small_order_size: The order size at or below which orders also count against 'small_orders'.
+        :param scheduler: The request scheduler.
+        """
+        self.client = client
+        self.small_order_size = small_order_size
+        self.scheduler = scheduler
@@ -1,28 +1,113 @@
-import boto3
+from typing import Any
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from exceptions import S3ClientException
 
 class S3Client:
     """
     A simple S3 client to interact with AWS S3 buckets.
-    This client provides methods to get objects from a specified S3 bucket.
+    This client provides methods to get objects from and upload files to a specified S3 bucket.
     """
     bucket: str = None
-    __client: boto3.client = None
+    __client: Any = None
 
     def __init__(self, bucket: str = None):
         """
         Initializes the S3Client with the specified bucket name.
+        boto3 is imported and its client created on the first request, as both take a noticeable part of startup.
         :param bucket: The name of the S3 bucket to interact with.
         """
         self.bucket = bucket
-        self.__client = boto3.client('s3')
+        self.__lock = threading.Lock()
+
+    def __get_client(self) -> Any:
+        with self.__lock:
+            if self.__client is None:
+                import boto3
+                self.__client = boto3.client('s3')
+            return self.__client
 
     def get_object(self, key: str):
         try:
-            response = self.__client.get_object(
+            response = self.__get_client().get_object(
                 Bucket=self.bucket,
                 Key=key
             )
             return response
         except Exception as e:
-            raise S3ClientException(f"Getting object {key} from bucket {self._bucket}: {e}") from e
\ No newline at end of file
+            raise S3ClientException(f"Getting object {key} from bucket {self.bucket}: {e}") from e
+
+    def head_object(self, key: str) -> dict:
+        """
+        Gets the metadata of an object without its body.
+        :param key: The key of the object.
+        :return: The response, with the 'ETag', 'ContentLength' and 'LastModified' of the object.
+        """
+        try:
+            return self.__get_client().head_object(
+                Bucket=self.bucket,
+                Key=key
+            )
+        except Exception as e:
+            raise S3ClientException(f"Getting the metadata of {key} from bucket {self.bucket}: {e}") from e
+
+    def download_file(self,
+                      key: str,
+                      path: str,
+                      etag: str = None,
+                      size: int = None,
+                      part_size: int = 8 << 20,
+                      concurrency: int = 8) -> None:
+        """
+        Downloads an object to a local file, streaming it to disk in chunks.
+        Objects larger than `part_size` are fetched as concurrent ranged requests, each written at its offset.
+        :param key: The key of the object.
+        :param path: The path of the local file.
+        :param etag: The ETag the object must still have; a part of a newer object fails the download
+                     instead of being mixed into the file.
+        :param size: The size of the object; fetched with `head_object` when None.
+        :param part_size: The number of bytes per ranged request.
+        :param concurrency: The number of ranged requests in flight.
+        """
+        if size is None or etag is None:
+            metadata = self.head_object(key)
+            size, etag = metadata['ContentLength'], metadata['ETag']
+        try:
+            with open(path, 'wb') as file:
+                file.truncate(size)
+                ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+                if len(ranges) <= 1:
+                    for start, end in ranges:
+                        self._download_range(key, file.fileno(), start, end, etag)
+                else:
+                    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='s3-download') as executor:
+                        for future in [executor.submit(self._download_range, key, file.fileno(), start, end, etag) for start, end in ranges]:
+                            future.result()
+        except Exception as e:
+            raise S3ClientException(f"Downloading {key} from bucket {self.bucket} to {path}: {e}") from e
+
+    def _download_range(self, key: str, descriptor: int, start: int, end: int, etag: str) -> None:
+        response = self.__get_client().get_object(
+            Bucket=self.bucket,
+            Key=key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=etag
+        )
+        offset = start
+        for chunk in response['Body'].iter_chunks(1 << 20):
+            os.pwrite(descriptor, chunk, offset)
+            offset += len(chunk)
+        if offset != end + 1:
+            raise IOError(f"Got {offset - start} bytes of the range {start}-{end}.")
+
+    def upload_file(self, path: str, key: str) -> None:
+        """
+        Uploads a local file, using multipart uploads for large files.
+        :param path: The path of the local file.
+        :param key: The key to store the object under.
+        """
+        try:
+            self.__get_client().upload_file(path, self.bucket, key)
+        except Exception as e:
+            raise S3ClientException(f"Uploading {path} to {key} in bucket {self.bucket}: {e}") from e
\ No newline at end of file
@@ -0,0 +1,79 @@
+from typing import Dict, List, Tuple
+import os
+import time
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.metrics import MetricsRegistry
+
+def _process_age() -> float:
+    """
+    The number of seconds since the process started, from /proc where available; 0.0 elsewhere.
+    """
+    try:
+        with open('/proc/self/stat') as file:
+            # The fields after the parenthesized command name; the start time is the 22nd field, in clock ticks since boot.
+            fields = file.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+        return max(uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+class StartupReport:
+    """
+    Breaks the time from process start to the first decision down into phases.
+    `mark` closes a phase that ended now (importing, building the services, restoring the checkpoint,
+    reconciling with the exchange), and `milestone` records the first time something happened (the
+    first snapshot, the first decision). Once the first decision is made, the breakdown is logged and
+    exposed as the `startup_seconds` metric, so the time to first decision after a restart can be tracked.
+    """
+    phases: List[Tuple[str, float]]
+    milestones: Dict[str, float]
+
+    def mark(self, phase: str) -> None:
+        """
+        Record the phase that ended now, since the previous mark or the process start.
+        :param phase: The name of the phase.
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._marked_at))
+        self._marked_at = now
+        self._seconds.labels(phase).set(self.phases[-1][1])
+
+    def milestone(self, name: str) -> None:
+        """
+        Record the first time `name` happened; later calls are ignored.
+        The report is logged on the 'first_decision' milestone.
+        :param name: The name of the milestone.
+        """
+        if name in self.milestones:
+            return
+        self.milestones[name] = time.perf_counter() - self._started_at
+        self._seconds.labels(name).set(self.milestones[name])
+        if name == 'first_decision':
+            self.logger.system.info("Startup: %s.", ', '.join(
+                [f"{phase} {seconds:.3f} s" for phase, seconds in self.phases]
+                + [f"{milestone} after {seconds:.3f} s" for milestone, seconds in self.milestones.items()]
+            ))
+
+    def snapshot(self) -> dict:
+        """
+        Returns the phases and milestones in seconds.
+        """
+        return {'phases': dict(self.phases), 'milestones': dict(self.milestones)}
+
+    @inject
+    def __init__(self,
+                 metrics: MetricsRegistry = Provide['metrics'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the startup report; the first phase is measured from the process start.
+        :param metrics: The metrics registry exposing the phases and milestones.
+        :param logger: The logger service.
+        """
+        self.logger = logger
+        self.phases = []
+        self.milestones = {}
+        self._started_at = time.perf_counter() - _process_age()
+        self._marked_at = self._started_at
+        self._seconds = metrics.gauge('startup_seconds', 'The duration of each startup phase, and the time to each startup milestone.', ['phase'])
@@ -0,0 +1,162 @@
+import os
+import time
+import pickle
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services.logger import Logger
+from services.data_buffer import DataBuffer
+from services.feature_engine import FeatureEngine
+from services.normalizer import Normalizer
+from services.order_book import OrderBook
+from services.position_book import PositionBook
+
+class StateCheckpoint:
+    """
+    Saves the state that takes long to rebuild to a local file, and restores it after a restart.
+    The checkpoint holds the data buffer window, the feature engine's operators and the normalizer's
+    statistics, which otherwise take a full window of snapshots (and far longer for the statistics) to
+    warm up, along with the live orders and the positions. It is written atomically every `interval`
+    seconds by `run` and once more on shutdown; the state is serialized on the event loop, between two
+    updates, and written to disk in a worker thread.
+    On restore, the window and the features are only used if the gap they leave before the live stream is
+    at most `max_gap` of the time the window spans, and at most `max_age` seconds, as a longer gap would be
+    spliced into the window as if it were one tick; the time span is estimated from the snapshot rate
+    between two checkpoints. The normalizer's statistics are restored regardless, unless it is frozen. The restored books are a starting point only: they are
+    replaced by the reconciliation with the exchange that follows.
+    """
+    path: str
+    interval: float
+    max_age: float
+    max_gap: float
+    enabled: bool
+    window_span: float = None
+
+    async def save(self) -> None:
+        """
+        Write a checkpoint of the current state.
+        """
+        if not self.enabled:
+            return
+        # Orders waiting for their ORDER event are left out, as the restart may have lost it.
+        orders = await self.order_book.get_orders(state='ACTIVE')
+        positions = await self.position_book.get_positions()
+        # Nothing is awaited from here until the state is serialized, so no snapshot is handled in between.
+        self._measure_window_span()
+        state = {
+            'saved_at': time.time(),
+            'window_span': self.window_span,
+            'data_buffer': self.data_buffer.state_dict(),
+            'feature_engine': self.feature_engine.state_dict(),
+            'normalizer': self.normalizer.state_dict(),
+            'orders': orders,
+            'positions': positions,
+        }
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        await asyncio.to_thread(self._write, payload)
+
+    async def restore(self) -> bool:
+        """
+        Restore the state from the checkpoint, if there is one.
+        :return: Whether the window and the features were restored, so that decisions can start with the first snapshot.
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as file:
+                state = pickle.load(file)
+        except Exception as e:
+            self.logger.system.warning("The checkpoint %s could not be read: %s", self.path, e)
+            return False
+
+        age = time.time() - state['saved_at']
+        # A frozen normalizer holds the statistics its model was trained with, and a changed method starts afresh.
+        if not self.normalizer.frozen and state['normalizer']['method'] == self.normalizer.method:
+            self._load('normalizer', self.normalizer, state)
+        for order in state['orders']:
+            await self.order_book.add(order)
+        for position in state['positions']:
+            await self.position_book.add_and_settle(position)
+        window_span = state.get('window_span')
+        if window_span is None or age > min(self.max_age, self.max_gap * window_span):
+            self.logger.system.info("The checkpoint %s is %.1f seconds old and its window spans %s seconds; the window and the features are rebuilt from the stream.",
+                                    self.path, age, 'unknown' if window_span is None else f'{window_span:.1f}')
+            return False
+        restored = self._load('data_buffer', self.data_buffer, state) and self._load('feature_engine', self.feature_engine, state)
+        if restored:
+            self.logger.system.info("Restored the state of %.1f seconds ago from %s.", age, self.path)
+        return restored
+
+    async def run(self) -> None:
+        """
+        Write a checkpoint every `interval` seconds.
+        """
+        self._rate_sample = (time.monotonic(), self.data_buffer.sequence)
+        while self.enabled:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                self.logger.system.error("Writing the checkpoint %s failed: %s", self.path, e)
+
+    def _measure_window_span(self) -> None:
+        """
+        Estimate the number of seconds the window spans from the snapshot rate since the last measurement.
+        The last estimate is kept while no snapshot arrives.
+        """
+        now, sequence = time.monotonic(), self.data_buffer.sequence
+        if self._rate_sample is not None and sequence > self._rate_sample[1] and now > self._rate_sample[0]:
+            self.window_span = len(self.data_buffer) * (now - self._rate_sample[0]) / (sequence - self._rate_sample[1])
+        self._rate_sample = (now, sequence)
+
+    def _load(self, name: str, service, state: dict) -> bool:
+        try:
+            service.load_state_dict(state[name])
+            return True
+        except Exception as e:
+            self.logger.system.warning("The %s state of the checkpoint was not restored: %s", name, e)
+            return False
+
+    def _write(self, payload: bytes) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f"{self.path}.tmp", 'wb') as file:
+            file.write(payload)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    @inject
+    def __init__(self,
+                 path: str = 'checkpoints/state.pkl',
+                 interval: float = 10.0,
+                 max_age: float = 300.0,
+                 max_gap: float = 0.1,
+                 data_buffer: DataBuffer = Provide['data_buffer'],
+                 feature_engine: FeatureEngine = Provide['feature_engine'],
+                 normalizer: Normalizer = Provide['normalizer'],
+                 order_book: OrderBook = Provide['order_book'],
+                 position_book: PositionBook = Provide['position_book'],
+                 logger: Logger = Provide['logger']):
+        """
+        Initialize the state checkpoint.
+        :param path: The checkpoint file, or None to disable checkpoints.
+        :param interval: The number of seconds between checkpoints.
+        :param max_age: The age in seconds past which the window and the features of a checkpoint are not restored.
+        :param max_gap: The age, as a fraction of the time the window spans, past which the window and the
+                        features of a checkpoint are not restored.
+        :param data_buffer: The data buffer.
+        :param feature_engine: The feature engine.
+        :param normalizer: The normalizer.
+        :param order_book: The order book.
+        :param position_book: The position book.
+        :param logger: The logger service.
+        """
+        self.path = path
+        self.enabled = bool(path)
+        self.interval = interval
+        self.max_age = max_age
+        self.max_gap = max_gap
+        self.data_buffer = data_buffer
+        self.feature_engine = feature_engine
+        self.normalizer = normalizer
+        self.order_book = order_book
+        self.position_book = position_book
+        self.logger = logger
+        self._rate_sample: tuple = None
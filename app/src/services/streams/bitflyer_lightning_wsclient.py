@@ -8,7 +8,7 @@ import asyncio
 import websockets
 from websockets.asyncio.client import connect
 from dependency_injector.wiring import inject, Provide
-from services import handler_dispatcher
+from services import handler_dispatcher, json_codec, metrics, recorder, tracer
 from services.streams.stream import Stream
 
 class BitflyerLightningWsclient(Stream):
@@ -48,13 +48,20 @@ class BitflyerLightningWsclient(Stream):
     async def receive_message(self, websocket):
         while True:
             if not self.paused:
-                message = await websocket.recv()
-                message = json.loads(message)
+                frame = await websocket.recv()
+                received_at = time.time_ns()
+                received_ns = time.monotonic_ns()
+                message = self._loads(frame)
 
-                if 'params' in message and 'message' in message['params'] and 'channel' in message['params']:
-                    data = message['params']['message']
-                    channel = message['params']['channel']
-                    await self.handler_dispatcher.dispatch(data, channel)
+                params = message.get('params')
+                if params is not None and 'message' in params and 'channel' in params:
+                    trace = self.tracer.start(params['channel'], received_ns)
+                    counter = self._message_counters.get(params['channel'])
+                    if counter is None:
+                        counter = self._message_counters[params['channel']] = self._messages.labels(params['channel'])
+                    counter.inc()
+                    self.recorder.record(params['channel'], frame, received_at)
+                    await self.handler_dispatcher.submit(params['message'], params['channel'], trace)
             else:
                 await asyncio.sleep(1)
 
@@ -65,6 +72,7 @@ class BitflyerLightningWsclient(Stream):
         """
         self.logger.system.info("Starting WebSocket client...")
         async for websocket in connect(self.url):
+            self.handler_dispatcher.reset()
             try:
                 await asyncio.gather(self.send_public_subscriptions(websocket),
                                     self.send_private_subscriptions(websocket),
@@ -79,7 +87,11 @@ class BitflyerLightningWsclient(Stream):
                  api_secret: str,
                  public_channels: List[str],
                  private_channels: List[str],
-                 handler_dispatcher: handler_dispatcher.HandlerDispatcher = Provide['handler_dispatcher']):
+                 json_decoder: str = 'auto',
+                 handler_dispatcher: handler_dispatcher.HandlerDispatcher = Provide['handler_dispatcher'],
+                 recorder: recorder.Recorder = Provide['recorder'],
+                 tracer: tracer.Tracer = Provide['tracer'],
+                 metrics: metrics.MetricsRegistry = Provide['metrics']):
         """
         Initialize the WebSocket client.
         :param url: The WebSocket URL to connect to.
@@ -87,7 +99,11 @@ class BitflyerLightningWsclient(Stream):
         :param api_secret: The API secret for authentication.
         :param public_channels: A list of public channels to subscribe to.
         :param private_channels: A list of private channels to subscribe to.
+        :param json_decoder: The JSON decoder for incoming frames ('auto', 'orjson', 'msgspec' or 'json').
         :param handler_dispatcher: The handler dispatcher service to handle incoming messages.
+        :param recorder: The recorder that tees received frames to disk.
+        :param tracer: The tracer that follows received frames through the pipeline.
+        :param metrics: The metrics registry counting received messages per channel.
         """
         super().__init__()
 
@@ -96,4 +112,9 @@ class BitflyerLightningWsclient(Stream):
         self.__api_secret = api_secret
         self.public_channels = public_channels
         self.private_channels = private_channels
-        self.handler_dispatcher = handler_dispatcher
\ No newline at end of file
+        self.handler_dispatcher = handler_dispatcher
+        self.recorder = recorder
+        self.tracer = tracer
+        self._messages = metrics.counter('websocket_messages_total', 'The WebSocket messages received.', ['channel'])
+        self._message_counters = {}
+        self._loads = json_codec.get_loads(json_decoder)
\ No newline at end of file
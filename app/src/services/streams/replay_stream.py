@@ -0,0 +1,116 @@
+from typing import List, Literal
+import random
+import time
+import asyncio
+from dependency_injector.wiring import inject, Provide
+from services import handler_dispatcher, json_codec, tracer
+from services.clock import ReplayClock
+from services.recorder import SegmentReader, list_segments
+from services.tracer import current_trace
+from services.streams.stream import Stream
+
+class ReplayStream(Stream):
+    """
+    A stream that replays recorded segments through the handler dispatcher.
+    Frames are streamed from memory-mapped segments one chunk at a time and dispatched in recorded order,
+    so multi-day captures never have to fit in memory. Pacing is 'realtime', 'speed' (realtime scaled by
+    `speed`) or 'fast' (as fast as the handlers allow). Each frame is dispatched directly rather than
+    through the per-channel queues, as is every message the handlers submit while replaying (the
+    dispatcher is `inline`), and the random generators are seeded. The `ReplayClock` is set to
+    each frame's receive timestamp before it is dispatched, and the simulated exchange's latencies and the
+    traces run on it, so a replay is deterministic whatever its pace; inference runs inline when replaying.
+    """
+    mode: Literal['realtime', 'speed', 'fast']
+    replayed_count: int = 0
+
+    async def run(self) -> None:
+        """
+        Replay the recorded frames and return once all of them have been dispatched.
+        """
+        random.seed(self.seed)
+        try:
+            import numpy
+            numpy.random.seed(self.seed)
+        except ImportError:
+            pass
+
+        segments = list_segments(self.directory)
+        self.logger.system.info("Replaying %d segments from %s in %s mode.", len(segments), self.directory, self.mode)
+        self.handler_dispatcher.reset()
+        speed = self.speed if self.mode == 'speed' else 1.0
+        first_ts = None
+        started_at = time.monotonic_ns()
+
+        for path in segments:
+            with SegmentReader(path) as reader:
+                for received_at, channel, payload in reader.records(self.start_ts, self.end_ts, self.channels):
+                    while self.paused:
+                        await asyncio.sleep(1)
+                    if first_ts is None:
+                        first_ts = received_at
+                    if self.mode == 'fast':
+                        if self.replayed_count % self.yield_interval == 0:
+                            await asyncio.sleep(0)
+                    else:
+                        delay = (received_at - first_ts) / speed - (time.monotonic_ns() - started_at)
+                        if delay > 0:
+                            await asyncio.sleep(delay / 1e9)
+
+                    if self.clock.set(received_at):
+                        # Let the tasks woken by the timers run before the frame that follows them.
+                        await asyncio.sleep(0)
+                    params = self._loads(payload).get('params')
+                    if params is not None and 'message' in params:
+                        current_trace.set(self.tracer.start(channel, received_at))
+                        await self.handler_dispatcher.dispatch(params['message'], channel)
+                    self.replayed_count += 1
+
+        # Deliver what the simulated exchange still has in flight.
+        while self.clock.drain():
+            await asyncio.sleep(0)
+        elapsed = (time.monotonic_ns() - started_at) / 1e9
+        self.logger.system.info("Replay finished: %d frames in %.3fs.", self.replayed_count, elapsed)
+
+    @inject
+    def __init__(self,
+                 directory: str,
+                 mode: Literal['realtime', 'speed', 'fast'] = 'fast',
+                 speed: float = 1.0,
+                 seed: int = 0,
+                 start_ts: int = None,
+                 end_ts: int = None,
+                 channels: List[str] = None,
+                 yield_interval: int = 1000,
+                 json_decoder: str = 'auto',
+                 handler_dispatcher: handler_dispatcher.HandlerDispatcher = Provide['handler_dispatcher'],
+                 clock: ReplayClock = Provide['clock'],
+                 tracer: tracer.Tracer = Provide['tracer']):
+        """
+        Initialize the replay stream.
+        :param directory: The recording directory holding the segments.
+        :param mode: The pacing mode: 'realtime', 'speed' or 'fast'.
+        :param speed: The speed multiplier in 'speed' mode.
+        :param seed: The seed of the random generators.
+        :param start_ts: The earliest receive timestamp to replay, in ns.
+        :param end_ts: The latest receive timestamp to replay, in ns.
+        :param channels: If given, only these channels are replayed.
+        :param yield_interval: In 'fast' mode, the number of frames after which control is yielded to other tasks.
+        :param json_decoder: The JSON decoder for recorded frames ('auto', 'orjson', 'msgspec' or 'json').
+        :param handler_dispatcher: The handler dispatcher service to handle replayed messages.
+        :param clock: The clock set to the receive timestamp of each replayed frame.
+        :param tracer: The tracer starting a trace for each replayed frame.
+        """
+        super().__init__()
+
+        self.directory = directory
+        self.mode = mode
+        self.speed = speed
+        self.seed = seed
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.channels = set(channels) if channels else None
+        self.yield_interval = max(yield_interval, 1)
+        self.handler_dispatcher = handler_dispatcher
+        self.clock = clock
+        self.tracer = tracer
+        self._loads = json_codec.get_loads(json_decoder)
@@ -0,0 +1,152 @@
+from typing import Dict, List
+from collections import OrderedDict
+from contextvars import ContextVar
+import json
+from services.clock import Clock
+from services.latency_histogram import LatencyHistogram
+
+class Trace:
+    """
+    The timestamps of one market data message on its way from the socket to an order.
+    """
+    __slots__ = ('tracer', 'channel', 'received_at', 'last_at', 'order_requested_at')
+
+    def stamp(self, stage: str, now: int = None) -> None:
+        """
+        Record that the message reached a stage.
+        :param stage: The stage name.
+        :param now: The `time.monotonic_ns()` at which the stage was reached; defaults to the current time.
+                    Ignored on a simulated clock, on which no time passes while the message is handled.
+        """
+        if now is None or self.tracer.clock.simulated:
+            now = self.tracer.clock.monotonic_ns()
+        self.tracer._record(stage, now - self.last_at, now - self.received_at)
+        self.last_at = now
+        if stage == 'order_request':
+            self.order_requested_at = now
+
+    def __init__(self, tracer: 'Tracer', channel: str, received_at: int):
+        self.tracer = tracer
+        self.channel = channel
+        self.received_at = received_at
+        self.last_at = received_at
+        self.order_requested_at = None
+
+# The trace of the message being handled. Queue workers set it per message, and tasks created while
+# handling the message inherit it, so stages far from the socket can stamp without threading it through.
+current_trace: ContextVar[Trace] = ContextVar('current_trace', default=None)
+
+class Tracer:
+    """
+    Measures where the tick-to-trade time goes.
+    A trace is started when a frame is received and is stamped with the clock's `monotonic_ns()` at every stage:
+    decode, dispatch, buffer append, feature update, feature extraction, get_action, action, and the create_order request
+    and response. The order's ORDER and EXECUTION acks are correlated by acceptance ID. Every stamp is
+    recorded in two histograms: the time since the previous stage and the time since the frame was received.
+    During a replay the clock is the `ReplayClock`, so the traces measure the simulated latencies.
+    """
+    stages: List[str] = ['decode', 'dispatch', 'buffer_append', 'feature_update', 'extract_features', 'get_action', 'action',
+                         'order_request', 'order_response', 'order_ack', 'execution_ack']
+
+    def start(self, channel: str, received_at: int) -> Trace | None:
+        """
+        Start a trace for a received frame, if tracing is enabled and the frame is sampled.
+        :param channel: The channel of the frame.
+        :param received_at: The clock's `monotonic_ns()` at which the frame was read from the socket.
+        :return: The trace, already stamped with the 'decode' stage, or None.
+        """
+        if not self.enabled:
+            return None
+        self._counter += 1
+        if self._counter < self.sample_interval:
+            return None
+        self._counter = 0
+        trace = Trace(self, channel, received_at)
+        trace.stamp('decode')
+        return trace
+
+    def stamp(self, stage: str, now: int = None) -> None:
+        """
+        Stamp the current trace, if any.
+        :param stage: The stage name.
+        :param now: The `time.monotonic_ns()` at which the stage was reached; defaults to the current time.
+        """
+        trace = current_trace.get()
+        if trace is not None:
+            trace.stamp(stage, now)
+
+    def bind(self, order_id: str) -> None:
+        """
+        Associate an accepted order with the current trace, so that its acks can be correlated.
+        :param order_id: The child_order_acceptance_id of the order.
+        """
+        trace = current_trace.get()
+        if trace is None or order_id is None:
+            return
+        self._orders[order_id] = trace
+        while len(self._orders) > self.max_orders:
+            self._orders.popitem(last=False)
+
+    def acknowledge(self, order_id: str, stage: str) -> None:
+        """
+        Record an ack for an order started by a traced message.
+        The stage histogram holds the time since the order was requested.
+        :param order_id: The child_order_acceptance_id of the order.
+        :param stage: 'order_ack' or 'execution_ack'.
+        """
+        trace = self._orders.get(order_id)
+        if trace is None:
+            return
+        now = self.clock.monotonic_ns()
+        self._record(stage, now - (trace.order_requested_at or trace.last_at), now - trace.received_at)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Summarize the histograms in microseconds.
+        :return: For each stage, the time since the previous stage ('stage') and since the frame was received ('since_receive').
+        """
+        return {
+            stage: {'stage': self._stage_histograms[stage].snapshot(), 'since_receive': self._receive_histograms[stage].snapshot()}
+            for stage in self._stage_histograms
+        }
+
+    def export(self, path: str) -> None:
+        """
+        Write the snapshot as JSON.
+        :param path: The destination file.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+    def reset(self) -> None:
+        for histogram in (*self._stage_histograms.values(), *self._receive_histograms.values()):
+            histogram.reset()
+
+    def _record(self, stage: str, stage_latency: int, receive_latency: int) -> None:
+        histogram = self._stage_histograms.get(stage)
+        if histogram is None:
+            histogram = self._stage_histograms[stage] = LatencyHistogram()
+            self._receive_histograms[stage] = LatencyHistogram()
+        histogram.record(stage_latency)
+        self._receive_histograms[stage].record(receive_latency)
+
+    def __init__(self,
+                 enabled: bool = True,
+                 sample_interval: int = 1,
+                 max_orders: int = 1000,
+                 clock: Clock = None):
+        """
+        Initialize the tracer.
+        :param enabled: Whether traces are started at all.
+        :param sample_interval: Trace one of every `sample_interval` received frames.
+        :param max_orders: The number of recent orders kept for ack correlation.
+        :param clock: The clock the stages are timed with; the wall clock by default.
+        """
+        self.enabled = enabled
+        self.clock = clock or Clock()
+        self.sample_interval = max(sample_interval, 1)
+        self.max_orders = max_orders
+        self._counter = self.sample_interval - 1
+        self._orders: OrderedDict[str, Trace] = OrderedDict()
+        self._stage_histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in self.stages}
+        self._receive_histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in self.stages}
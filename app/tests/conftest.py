@@ -0,0 +1,39 @@
+import os
+import sys
+import types
+import logging
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+@pytest.fixture
+def logger():
+    """
+    A stand-in for the `Logger` service that writes through the standard logging module, so that the
+    services under test need no log files.
+    """
+    return types.SimpleNamespace(system=logging.getLogger('System'),
+                                 transaction=logging.getLogger('Transaction'),
+                                 action=logging.getLogger('Action'))
+
+@pytest.fixture
+def metrics(logger):
+    """
+    A metrics registry that serves no endpoint.
+    """
+    from services.metrics import MetricsRegistry
+    return MetricsRegistry(enabled=False, logger=logger)
+
+@pytest.fixture
+def container(logger, metrics):
+    """
+    A container that provides the test logger and metrics to the modules that inject them, such as the
+    exceptions and the instrumented locks.
+    """
+    from dependency_injector import containers, providers
+    container = containers.DynamicContainer()
+    container.logger = providers.Object(logger)
+    container.metrics = providers.Object(metrics)
+    container.wire(modules=['exceptions', 'services.metrics'])
+    yield container
+    container.unwire()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from services.data_buffer import BoardDataBuffer
+
+def snapshot(index):
+    return {'mid_price': float(index),
+            'bids': [{'price': index - 0.5, 'size': 1.0}, {'price': index - 1.5, 'size': 2.0}],
+            'asks': [{'price': index + 0.5, 'size': 3.0}]}
+
+def test_the_window_is_the_latest_snapshots_in_order_across_wraparounds():
+    buffer = BoardDataBuffer(max_size=4, depth=2)
+    for index in range(11):
+        buffer.append(snapshot(index))
+        window = buffer.get_data()
+        expected = np.arange(max(0, index - 3), index + 1, dtype=float)
+        assert len(buffer) == len(expected)
+        np.testing.assert_array_equal(window['mid_price'], expected)
+        np.testing.assert_array_equal(window['best_bid'], expected - 0.5)
+        np.testing.assert_array_equal(window['bid_prices'][:, 1], expected - 1.5)
+        assert buffer.get_latest()['mid_price'] == index
+
+def test_missing_levels_are_padded():
+    buffer = BoardDataBuffer(max_size=4, depth=2)
+    buffer.append(snapshot(1))
+    latest = buffer.get_latest()
+    assert np.isnan(latest['ask_prices'][1])
+    assert latest['ask_sizes'][1] == 0.0
+
+def test_views_are_read_only_and_copies_survive_later_appends():
+    buffer = BoardDataBuffer(max_size=3, depth=2)
+    for index in range(3):
+        buffer.append(snapshot(index))
+    view = buffer.get_data()['mid_price']
+    copy = buffer.get_data(copy=True)['mid_price']
+    with pytest.raises(ValueError):
+        view[0] = 0.0
+    for index in range(3, 6):
+        buffer.append(snapshot(index))
+    np.testing.assert_array_equal(copy, [0.0, 1.0, 2.0])
+
+def test_state_dict_restores_the_window():
+    buffer = BoardDataBuffer(max_size=4, depth=2)
+    for index in range(6):
+        buffer.append(snapshot(index))
+    restored = BoardDataBuffer(max_size=4, depth=2)
+    restored.load_state_dict(buffer.state_dict())
+    restored.append(snapshot(6))
+    np.testing.assert_array_equal(restored.get_data()['mid_price'], [3.0, 4.0, 5.0, 6.0])
+    with pytest.raises(ValueError):
+        BoardDataBuffer(max_size=5, depth=2).load_state_dict(buffer.state_dict())
@@ -0,0 +1,43 @@
+import asyncio
+from services.channel_queue import ChannelQueue
+
+def test_conflate_keeps_only_the_latest_message():
+    async def run():
+        queue = ChannelQueue('board', policy='conflate')
+        for item in range(3):
+            assert await queue.put(item)
+        assert len(queue) == 1
+        assert await queue.get() == 2
+        assert len(queue) == 0
+        # A waiting consumer is woken by the next message.
+        consumer = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        await queue.put(3)
+        assert await consumer == 3
+        assert queue.get_stats() == {'policy': 'conflate', 'depth': 0, 'high_water_mark': 1, 'enqueued': 4, 'dropped': 2}
+    asyncio.run(run())
+
+def test_drop_delivers_in_order_and_drops_what_does_not_fit():
+    async def run():
+        queue = ChannelQueue('diffs', policy='drop', maxsize=2)
+        assert [await queue.put(item) for item in range(3)] == [True, True, False]
+        assert queue.overflowing
+        assert [await queue.get(), await queue.get()] == [0, 1]
+        assert await queue.put(3)
+        assert not queue.overflowing
+        assert await queue.get() == 3
+        assert queue.get_stats() == {'policy': 'drop', 'depth': 0, 'high_water_mark': 2, 'enqueued': 4, 'dropped': 1}
+    asyncio.run(run())
+
+def test_fifo_makes_the_producer_wait_when_full():
+    async def run():
+        queue = ChannelQueue('executions', policy='fifo', maxsize=1)
+        await queue.put(0)
+        producer = asyncio.ensure_future(queue.put(1))
+        await asyncio.sleep(0)
+        assert not producer.done()
+        assert await queue.get() == 0
+        assert await producer
+        assert await queue.get() == 1
+        assert queue.dropped_count == 0
+    asyncio.run(run())
@@ -0,0 +1,85 @@
+import asyncio
+import types
+import pytest
+from dependency_injector import providers
+from services.local_board import LocalBoard, PriceLadder
+
+def levels(*pairs):
+    return [{'price': price, 'size': size} for price, size in pairs]
+
+class HeldExchangeClient:
+    """
+    Serves a fixed board once released, so that diffs can arrive while a resync is fetching it.
+    """
+    async def get_board(self, symbol: str) -> dict:
+        self.requests += 1
+        await self.released.wait()
+        return self.board
+
+    def __init__(self, board: dict):
+        self.board = board
+        self.requests = 0
+        self.released = asyncio.Event()
+
+@pytest.fixture
+def wire(container):
+    def wire(exchange_client):
+        container.exchange_client = providers.Object(exchange_client)
+        container.recorder = providers.Object(types.SimpleNamespace(enabled=False))
+        container.config = providers.Object({'crypto_currency_code': 'FX_BTC_JPY'})
+        container.wire(modules=['services.local_board'])
+    return wire
+
+def test_price_ladder_keeps_levels_sorted_best_first():
+    bids = PriceLadder(descending=True)
+    for price, size in ((100.0, 1.0), (102.0, 2.0), (101.0, 3.0)):
+        bids.set(price, size)
+    bids.set(102.0, 0.0)
+    bids.set(99.0, 0.0)
+    assert bids.depth(5) == [(101.0, 3.0), (100.0, 1.0)]
+    assert (bids.best(), bids.size_at(100.0), bids.cumulative_size(100.0)) == (101.0, 1.0, 4.0)
+    asks = PriceLadder(descending=False)
+    asks.set(103.0, 1.0)
+    asks.set(102.0, 2.0)
+    assert asks.depth(1) == [(102.0, 2.0)]
+    assert asks.cumulative_size(102.5) == 2.0
+
+def test_a_crossed_book_resyncs_and_replays_the_diffs_received_meanwhile(logger, wire):
+    async def run():
+        exchange_client = HeldExchangeClient({'mid_price': 100.5, 'bids': levels((100.0, 1.0)), 'asks': levels((101.0, 1.0))})
+        wire(exchange_client)
+        board = LocalBoard(resync_interval=0.0, logger=logger)
+        board.seed({'mid_price': 100.5, 'bids': levels((100.0, 1.0)), 'asks': levels((101.0, 1.0))})
+        assert board.apply({'bids': levels((100.5, 1.0))})
+
+        assert not board.apply({'bids': levels((101.5, 1.0))})
+        assert not board.ready
+        await asyncio.sleep(0)
+        assert exchange_client.requests == 1
+        # Diffs received while the board is fetched are replayed on top of it.
+        assert not board.apply({'asks': levels((100.8, 2.0))})
+        exchange_client.released.set()
+        await board._resync_task
+
+        assert board.ready and board.resync_count == 1
+        assert (board.best_bid, board.best_ask) == (100.0, 100.8)
+        assert board.to_snapshot(levels=1) == {'mid_price': 100.5, 'bids': levels((100.0, 1.0)), 'asks': levels((100.8, 2.0))}
+    asyncio.run(run())
+
+def test_an_invalidation_during_a_resync_triggers_another_one(logger, wire):
+    async def run():
+        exchange_client = HeldExchangeClient({'mid_price': 100.5, 'bids': levels((100.0, 1.0)), 'asks': levels((101.0, 1.0))})
+        wire(exchange_client)
+        board = LocalBoard(resync_interval=0.0, logger=logger)
+        assert not board.apply({'bids': levels((100.0, 2.0))})
+        await asyncio.sleep(0)
+        # A reconnection while the board is fetched means diffs are missing from the replay.
+        board.invalidate()
+        exchange_client.released.set()
+        await board._resync_task
+        assert not board.ready
+
+        assert not board.apply({'bids': levels((100.0, 3.0))})
+        await board._resync_task
+        assert board.ready and board.resync_count == 2 and exchange_client.requests == 2
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+import pytest
+from services.netting_engine import NettingEngine
+
+def lots(engine, side):
+    return [(lot.price, lot.size) for lot in engine.lots(side)]
+
+def test_an_execution_offsets_the_oldest_lots_first_and_partially():
+    engine = NettingEngine()
+    engine.add('BUY', 100.0, 0.3)
+    engine.add('BUY', 110.0, 0.2)
+    # Closes the whole first lot and 0.1 of the second.
+    pnl = engine.add('SELL', 120.0, 0.4)
+    assert pnl == pytest.approx(20.0 * 0.3 + 10.0 * 0.1)
+    assert lots(engine, 'BUY') == [(110.0, 0.1)]
+    assert engine.net_size == 0.1
+    assert engine.average_price == pytest.approx(110.0)
+    assert engine.unrealized_pnl(115.0) == pytest.approx(0.5)
+
+def test_the_remainder_of_an_execution_opens_an_opposite_lot():
+    engine = NettingEngine()
+    engine.add('SELL', 100.0, 0.1, open_date='2024-01-01')
+    pnl = engine.add('BUY', 90.0, 0.3, open_date='2024-01-02')
+    assert pnl == pytest.approx(1.0)
+    assert lots(engine, 'SELL') == []
+    assert [(lot.price, lot.size, lot.open_date) for lot in engine.lots('BUY')] == [(90.0, 0.2, '2024-01-02')]
+    assert engine.net_size == 0.2
+    assert engine.realized_pnl == pytest.approx(1.0)
+
+def test_offsets_leave_no_dust_and_reset_the_cost_basis_when_flat():
+    engine = NettingEngine()
+    engine.add('BUY', 100.0, 0.1)
+    engine.add('BUY', 101.0, 0.2)
+    engine.add('SELL', 102.0, 0.1)
+    engine.add('SELL', 102.0, 0.2)
+    assert len(engine) == 0
+    assert (engine.net_size, engine.average_price, engine.unrealized_pnl(200.0)) == (0.0, 0.0, 0.0)
+    assert engine.realized_pnl == pytest.approx(0.2 + 0.2)
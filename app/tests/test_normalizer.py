@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from services.normalizer import Normalizer
+
+def features(rows=300, size=4, seed=0):
+    generator = np.random.default_rng(seed)
+    x = generator.normal(loc=[0.0, 10.0, -5.0, 100.0], scale=[1.0, 2.0, 0.5, 30.0], size=(rows, size))
+    # Features go missing now and then, and one is missing for a while.
+    x[generator.random((rows, size)) < 0.05] = np.nan
+    x[:20, 3] = np.nan
+    return x
+
+@pytest.mark.parametrize('method', Normalizer.methods)
+def test_observe_then_transform_matches_update_and_transform_many(method):
+    rows = features()
+    updated, observed, batched = Normalizer(method), Normalizer(method), Normalizer(method)
+    expected = np.array([updated.update(row).copy() for row in rows])
+    for index, row in enumerate(rows):
+        observed.observe(row)
+        # Only some of the vectors are read, as on the live path.
+        if index % 7 == 0:
+            np.testing.assert_array_equal(observed.transform(row), expected[index])
+    np.testing.assert_array_equal(batched.transform_many(rows), expected)
+    assert not np.isnan(expected).any()
+
+def test_welford_matches_the_sample_statistics_of_the_past():
+    rows = features()
+    normalizer = Normalizer('welford', min_count=10, clip=100.0)
+    outputs = [normalizer.update(row).copy() for row in rows]
+    for index in (5, 50, 299):
+        past = rows[:index + 1, 0]
+        past = past[~np.isnan(past)]
+        if len(past) < 10:
+            assert outputs[index][0] == 0.0
+        elif not np.isnan(rows[index, 0]):
+            assert outputs[index][0] == pytest.approx((rows[index, 0] - past.mean()) / past.std(ddof=1))
+    stats = normalizer.get_stats()
+    assert stats['count'][3] == np.count_nonzero(~np.isnan(rows[:, 3]))
+
+def test_quantile_tracks_the_median_and_interquartile_range():
+    rows = features(rows=5000)
+    normalizer = Normalizer('quantile')
+    normalizer.transform_many(rows)
+    stats = normalizer.get_stats()
+    for feature in range(rows.shape[1]):
+        column = rows[:, feature][~np.isnan(rows[:, feature])]
+        low, median, high = np.percentile(column, [25, 50, 75])
+        assert stats['center'][feature] == pytest.approx(median, abs=0.05 * (high - low))
+        assert stats['scale'][feature] == pytest.approx(high - low, rel=0.05)
+
+def test_values_are_clipped_and_constant_features_stay_finite():
+    normalizer = Normalizer('welford', clip=3.0)
+    for _ in range(10):
+        normalizer.update(np.array([1.0, 0.0]))
+    normalizer.update(np.array([1.0, 0.1]))
+    assert normalizer.transform(np.array([1.0, 1e9])).tolist() == [0.0, 3.0]
+
+def test_a_frozen_state_round_trips_and_is_no_longer_updated(tmp_path):
+    rows = features()
+    normalizer = Normalizer('ewm', alpha=0.05)
+    normalizer.transform_many(rows[:200])
+    path = str(tmp_path / 'normalizer.npz')
+    normalizer.save(path)
+
+    loaded = Normalizer(frozen=True, state_path=path)
+    assert (loaded.method, loaded.alpha, loaded.size) == ('ewm', 0.05, 4)
+    before = loaded.get_stats()
+    frozen = loaded.transform_many(rows[200:])
+    assert loaded.get_stats() == before
+    np.testing.assert_array_equal(frozen, normalizer.transform(rows[200:]))
+    with pytest.raises(ValueError):
+        loaded.observe(np.zeros(3))
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from services.order_book import Order, OrderBook
+
+@pytest.fixture
+def order_book(container):
+    return OrderBook(archive_size=2, archive_age=None)
+
+def order(acceptance_id, size=1.0, product_code='FX_BTC_JPY', **fields):
+    return Order(product_code=product_code, side='BUY', child_order_type='LIMIT', price=100.0, size=size,
+                 child_order_acceptance_id=acceptance_id, **fields)
+
+def test_partial_fills_keep_the_order_live_until_its_size_is_filled(order_book):
+    async def run():
+        await order_book.add(order('JRF1', size=0.3, child_order_id='JOR1'))
+        partial = await order_book.execute('JOR1', 0.1)
+        assert (partial.child_order_state, partial.executed_size, partial.outstanding_size) == ('ACTIVE', 0.1, 0.2)
+        # The remainder is rounded to 8 decimals, so 0.1 + 0.2 leaves no dust behind.
+        filled = await order_book.execute('JRF1', 0.2)
+        assert (filled.child_order_state, filled.executed_size, filled.outstanding_size) == ('COMPLETED', 0.3, 0.0)
+        assert await order_book.get_orders() == []
+        assert await order_book.get_order('JRF1') is filled
+        # Executions of terminal orders are ignored.
+        assert await order_book.execute('JRF1', 0.1) is None
+    asyncio.run(run())
+
+def test_terminal_orders_are_archived_up_to_the_retention_count(order_book):
+    async def run():
+        for acceptance_id in ('JRF1', 'JRF2', 'JRF3'):
+            await order_book.add(order(acceptance_id))
+        await order_book.cancel('JRF1')
+        await order_book.execute('JRF2')
+        await order_book.expire('JRF3')
+        assert [(archived.child_order_acceptance_id, archived.child_order_state) for archived in await order_book.get_archived_orders()] \
+            == [('JRF2', 'COMPLETED'), ('JRF3', 'EXPIRED')]
+        assert await order_book.get_order('JRF1') is None
+        assert len(order_book) == 0
+    asyncio.run(run())
+
+def test_pending_orders_are_reconciled_by_their_order_event(order_book):
+    async def run():
+        assert await order_book.add_pending(order('JRF1'))
+        assert [pending.child_order_acceptance_id for pending in await order_book.get_orders('PENDING')] == ['JRF1']
+        await order_book.add(order('JRF1', child_order_id='JOR1'))
+        assert await order_book.get_orders('PENDING') == []
+        assert (await order_book.get_order('JOR1')).child_order_state == 'ACTIVE'
+        # An order whose events were handled first is not added back as PENDING.
+        await order_book.execute('JRF1')
+        assert not await order_book.add_pending(order('JRF1'))
+    asyncio.run(run())
+
+def test_cancel_all_only_cancels_the_given_product(order_book):
+    async def run():
+        await order_book.add(order('JRF1'))
+        await order_book.add(order('JRF2', product_code='BTC_JPY'))
+        canceled = await order_book.cancel_all('FX_BTC_JPY')
+        assert [(canceled_order.child_order_acceptance_id, canceled_order.child_order_state) for canceled_order in canceled] == [('JRF1', 'CANCELED')]
+        assert [live.child_order_acceptance_id for live in await order_book.get_orders('ACTIVE')] == ['JRF2']
+    asyncio.run(run())
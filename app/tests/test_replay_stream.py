@@ -0,0 +1,76 @@
+import os
+import json
+import asyncio
+from message_handlers.message_handler import MessageHandler
+from services.clock import ReplayClock
+from services.handler_dispatcher import HandlerDispatcher
+from services.recorder import SegmentWriter
+from services.streams.replay_stream import ReplayStream
+from services.tracer import Tracer
+
+class DiffHandler(MessageHandler):
+    """
+    Applies diffs to a book and signals the book channel, as the board diff handler does.
+    """
+    channel_names = ['diffs']
+    queue_policy = 'drop'
+
+    async def handle_message(self, data, channel):
+        for level in data['bids']:
+            self.book[level['price']] = level['size']
+        await self.dispatcher.submit(None, 'book')
+
+    def __init__(self, book, logger):
+        super().__init__(config={}, logger=logger)
+        self.book = book
+        self.dispatcher: HandlerDispatcher = None
+
+class BookHandler(MessageHandler):
+    """
+    Records the book it is signalled with, as the board handler feeds it to the agent.
+    """
+    channel_names = ['book']
+    queue_policy = 'conflate'
+
+    async def handle_message(self, data, channel):
+        self.seen.append(sorted(self.book.items()))
+
+    def __init__(self, book, logger):
+        super().__init__(config={}, logger=logger)
+        self.book = book
+        self.seen = []
+
+def record_capture(directory, frames: int) -> None:
+    writer = SegmentWriter(os.path.join(directory, 'market-0.seg'), codec='zlib')
+    records = []
+    for i in range(frames):
+        message = {'bids': [{'price': 100 + i % 7, 'size': i}]}
+        records.append((1_000_000_000 + i * 1_000_000, b'diffs', json.dumps({'params': {'channel': 'diffs', 'message': message}}).encode()))
+    writer.append_chunk(records)
+    writer.close()
+
+def replay(directory, mode: str, logger) -> list:
+    async def run():
+        book = {}
+        diff_handler, book_handler = DiffHandler(book, logger), BookHandler(book, logger)
+        dispatcher = HandlerDispatcher(handlers=[diff_handler, book_handler], logger=logger, inline=True)
+        diff_handler.dispatcher = dispatcher
+        clock = ReplayClock()
+        stream = ReplayStream(directory, mode=mode, speed=100.0, yield_interval=10, json_decoder='json',
+                              handler_dispatcher=dispatcher, clock=clock, tracer=Tracer(enabled=False, clock=clock))
+        stream.logger = logger
+        workers = asyncio.ensure_future(dispatcher.run())
+        await stream.run()
+        workers.cancel()
+        return book_handler.seen
+    return asyncio.run(run())
+
+def test_replay_signals_every_frame_in_order(tmp_path, logger):
+    record_capture(str(tmp_path), 200)
+    seen = replay(str(tmp_path), 'fast', logger)
+    assert len(seen) == 200
+    assert seen[0] == [(100, 0)]
+
+def test_replays_of_a_capture_are_identical(tmp_path, logger):
+    record_capture(str(tmp_path), 200)
+    assert replay(str(tmp_path), 'fast', logger) == replay(str(tmp_path), 'speed', logger) == replay(str(tmp_path), 'fast', logger)
@@ -0,0 +1,82 @@
+import time
+import asyncio
+import pytest
+from services.request_scheduler import Priority, RequestScheduler, TokenBucket
+
+def scheduler(metrics, logger, limits, reserves=None) -> RequestScheduler:
+    return RequestScheduler(limits=limits, reserves=reserves or {}, metrics=metrics, logger=logger)
+
+def test_exhausted_bucket_does_not_block_other_buckets(metrics, logger):
+    async def run():
+        s = scheduler(metrics, logger, {'ip': [500, 300], 'small_orders': [1, 60]}, {'order': 0.0, 'read': 0.2})
+        sent = []
+
+        async def request(name):
+            sent.append(name)
+            return name
+
+        await s.submit(Priority.ORDER, ('ip', 'small_orders'), lambda: request('order 1'))
+        # The small order bucket is empty for the next minute; the second order waits for it.
+        waiting = asyncio.ensure_future(s.submit(Priority.ORDER, ('ip', 'small_orders'), lambda: request('order 2')))
+        await asyncio.sleep(0)
+        started_at = time.monotonic()
+        result = await asyncio.wait_for(s.submit(Priority.READ, ('ip',), lambda: request('read')), 1.0)
+        assert result == 'read'
+        assert time.monotonic() - started_at < 0.5
+        assert sent == ['order 1', 'read']
+        assert s.get_headroom()['waiting']['order'] == 1
+        waiting.cancel()
+    asyncio.run(run())
+
+def test_token_bucket_refills_continuously_up_to_its_capacity():
+    bucket = TokenBucket(capacity=10, period=5.0)
+    now = bucket._updated_at
+    bucket.take(now, 10.0)
+    assert bucket.available(now) == 0.0
+    assert bucket.wait_time(now, 3.0) == pytest.approx(1.5)
+    assert bucket.available(now + 1.0) == pytest.approx(2.0)
+    assert bucket.wait_time(now + 1.0, 1.0) == 0.0
+    assert bucket.available(now + 60.0) == 10.0
+
+def test_reserves_keep_tokens_for_more_urgent_classes(metrics, logger):
+    async def run():
+        s = scheduler(metrics, logger, {'ip': [10, 3600]}, {'cancel': 0.0, 'read': 0.5})
+        sent = []
+
+        async def request(name):
+            sent.append(name)
+            return name
+
+        # Reads may only draw the bucket down to half of its capacity.
+        reads = [asyncio.ensure_future(s.submit(Priority.READ, ('ip',), lambda index=index: request(f'read {index}'))) for index in range(7)]
+        await asyncio.sleep(0.01)
+        assert sent == [f'read {index}' for index in range(5)]
+        assert s.get_headroom()['waiting']['read'] == 2
+        # The reserve is left for cancels.
+        assert await asyncio.wait_for(s.submit(Priority.CANCEL, ('ip',), lambda: request('cancel')), 0.5) == 'cancel'
+        assert s.get_headroom()['buckets']['ip']['available'] == pytest.approx(4.0, abs=0.01)
+        for read in reads:
+            read.cancel()
+    asyncio.run(run())
+
+def test_identical_waiting_reads_are_coalesced(metrics, logger):
+    async def run():
+        s = scheduler(metrics, logger, {'ip': [1, 3600]})
+        sent = []
+
+        async def request(name):
+            sent.append(name)
+            return name
+
+        await s.submit(Priority.READ, ('ip',), lambda: request('first'))
+        # The bucket is empty, so both reads wait and the second joins the first.
+        s.buckets['ip']._tokens = 0.0
+        first = asyncio.ensure_future(s.submit(Priority.READ, ('ip',), lambda: request('positions'), coalesce_key=('positions',)))
+        second = asyncio.ensure_future(s.submit(Priority.READ, ('ip',), lambda: request('positions again'), coalesce_key=('positions',)))
+        await asyncio.sleep(0)
+        assert s.coalesced_count == 1
+        s.buckets['ip']._tokens = 1.0
+        s._wakeup.set()
+        assert await asyncio.wait_for(asyncio.gather(first, second), 0.5) == ['positions', 'positions']
+        assert sent == ['first', 'positions']
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+import exceptions
+from services.clock import ReplayClock
+from services.tracer import Tracer
+from services.exchange_clients.simulated_exchange_client import SimulatedExchangeClient
+
+def board(best_bid, best_ask, size=1.0):
+    return {'mid_price': (best_bid + best_ask) / 2,
+            'bids': [{'price': best_bid, 'size': size}],
+            'asks': [{'price': best_ask, 'size': size}]}
+
+@pytest.fixture
+def client():
+    clock = ReplayClock()
+    client = SimulatedExchangeClient(tracer=Tracer(enabled=False, clock=clock), clock=clock,
+                                     config={'crypto_currency_code': 'FX_BTC_JPY', 'legal_currency_code': 'JPY'})
+    client.events = []
+    client._emit = client.events.extend
+    client.on_board(board(100.0, 101.0))
+    return client
+
+def event_types(client):
+    return [(event['event_type'], event['side']) for event in client.events]
+
+def test_ifd_places_the_second_leg_once_the_first_is_completed(client):
+    asyncio.run(client.create_parent_order('FX_BTC_JPY', 'IFD', [
+        {'condition_type': 'LIMIT', 'side': 'BUY', 'price': 99.0, 'size': 1.0},
+        {'condition_type': 'LIMIT', 'side': 'SELL', 'price': 103.0, 'size': 1.0},
+    ]))
+    assert event_types(client) == [('ORDER', 'BUY')]
+
+    client.on_board(board(98.0, 99.0, size=0.4))
+    assert event_types(client)[1:] == [('EXECUTION', 'BUY')]
+
+    client.on_board(board(98.0, 99.0))
+    assert event_types(client)[2:] == [('EXECUTION', 'BUY'), ('ORDER', 'SELL')]
+    assert [order.side for order in client.engine.get_orders('ACTIVE')] == ['SELL']
+
+def test_oco_cancels_the_other_leg_once_one_executes(client):
+    asyncio.run(client.create_parent_order('FX_BTC_JPY', 'OCO', [
+        {'condition_type': 'LIMIT', 'side': 'SELL', 'price': 103.0, 'size': 1.0},
+        {'condition_type': 'LIMIT', 'side': 'BUY', 'price': 98.0, 'size': 1.0},
+    ]))
+    client.on_board(board(103.0, 104.0, size=0.5))
+    assert event_types(client) == [('ORDER', 'SELL'), ('ORDER', 'BUY'), ('EXECUTION', 'SELL'), ('CANCEL', 'BUY')]
+    # The executed leg keeps resting for its remainder.
+    assert [(order.side, order.outstanding_size) for order in client.engine.get_orders('ACTIVE')] == [('SELL', 0.5)]
+
+def test_ifdoco_with_a_marketable_first_leg_places_the_oco_at_once(client):
+    asyncio.run(client.create_parent_order('FX_BTC_JPY', 'IFDOCO', [
+        {'condition_type': 'MARKET', 'side': 'BUY', 'size': 1.0},
+        {'condition_type': 'LIMIT', 'side': 'SELL', 'price': 103.0, 'size': 1.0},
+        {'condition_type': 'LIMIT', 'side': 'SELL', 'price': 99.0, 'size': 1.0},
+    ]))
+    # The second OCO leg is marketable, so it executes as it is placed and the first is canceled.
+    assert event_types(client) == [('ORDER', 'BUY'), ('EXECUTION', 'BUY'), ('ORDER', 'SELL'), ('ORDER', 'SELL'),
+                                   ('EXECUTION', 'SELL'), ('CANCEL', 'SELL')]
+    assert client.account.net_size == 0.0
+
+def test_unsupported_legs_are_rejected(client, container):
+    with pytest.raises(exceptions.LogicException):
+        asyncio.run(client.create_parent_order('FX_BTC_JPY', 'SIMPLE', [
+            {'condition_type': 'STOP', 'side': 'SELL', 'trigger_price': 95.0, 'size': 1.0},
+        ]))